@@ -0,0 +1,66 @@
+import asyncio
+import json
+import threading
+import time
+
+
+class AuditJournal:
+    """บันทึกผลอนุมัติ/ปฏิเสธลงดิสก์ทันที แล้วค่อยทยอยส่งขึ้นชีท log เป็นชุด (append_rows)"""
+
+    def __init__(self, conn, batch_size=100):
+        self.conn = conn
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._flush_lock = asyncio.Lock()  # flush ได้ทีละงาน (loop พื้นหลัง, /rebuild_stats, ตอนปิดบอท)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS audit_journal ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " row TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self.flushed = 0
+        self.flush_errors = 0
+
+    def append(self, row):
+        with self._lock:
+            cur = self.conn.execute(
+                "INSERT INTO audit_journal (row, created_at) VALUES (?, ?)",
+                (json.dumps(row, ensure_ascii=False), time.time())
+            )
+        return cur.lastrowid
+
+    def pending(self, limit=None):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, row FROM audit_journal ORDER BY id LIMIT ?",
+                (limit or self.batch_size,)
+            ).fetchall()
+        return [(entry_id, json.loads(row)) for entry_id, row in rows]
+
+    def mark_flushed(self, entry_ids):
+        # pending() คืนแถวเก่าสุดเรียงตาม id จึงลบช่วง id <= ตัวสุดท้ายได้ในคำสั่งเดียว
+        with self._lock:
+            self.conn.execute("DELETE FROM audit_journal WHERE id <= ?", (max(entry_ids),))
+        self.flushed += len(entry_ids)
+
+    def backlog(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM audit_journal").fetchone()[0]
+
+    async def flush(self, sheets, worksheet):
+        # 🔄 ส่งทีละชุดจนหมด ถ้าชีทล้มเหลว แถวยังอยู่ในไฟล์ รอบหน้าค่อยส่งใหม่
+        # (ถ้าโปรเซสตายหลังส่งแต่ก่อนลบ แถวนั้นจะถูกส่งซ้ำ = at-least-once)
+        # ถือ lock ตลอดรอบ: ถ้าสองงาน flush พร้อมกันจะอ่านชุดเดียวกันแล้วส่งแถวซ้ำขึ้นชีท
+        total = 0
+        async with self._flush_lock:
+            while True:
+                batch = self.pending()
+                if not batch:
+                    return total
+                try:
+                    await sheets.append_rows(worksheet, [row for _, row in batch])
+                except Exception:
+                    self.flush_errors += 1
+                    raise
+                self.mark_flushed([entry_id for entry_id, _ in batch])
+                total += len(batch)
@@ -0,0 +1,408 @@
+import asyncio
+import collections
+import itertools
+import json
+import random
+import re
+import threading
+import time
+
+import discord
+import gspread
+import requests
+
+# 🧪 ตัวแทน gspread และ discord.py สำหรับวัดประสิทธิภาพแบบออฟไลน์
+# จำลอง latency และ 429 ได้ตามที่ตั้งค่า และนับจำนวนการเรียก API ทุกครั้ง
+
+
+class Counters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = collections.Counter()
+
+    def add(self, key, n=1):
+        with self._lock:
+            self.counts[key] += n
+
+    def snapshot(self):
+        with self._lock:
+            return collections.Counter(self.counts)
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+
+
+class LatencyProfile:
+    def __init__(self, latency=0.2, jitter=0.5, rate_429=0.0, retry_after=1.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        with self._lock:
+            return self.latency * self._random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def throttled(self):
+        with self._lock:
+            return self._random.random() < self.rate_429
+
+
+def make_api_error(code=429, message="Quota exceeded for quota metric 'Read requests'"):
+    response = requests.Response()
+    response.status_code = code
+    response._content = json.dumps({"error": {"code": code, "message": message, "status": "RESOURCE_EXHAUSTED"}}).encode()
+    return gspread.exceptions.APIError(response)
+
+
+# ─── Google Sheets ──────────────────────────────────────────────────────────
+
+
+class FakeSheetsBackend:
+    def __init__(self, profile, counters):
+        self.profile = profile
+        self.counters = counters
+
+    def call(self, op):
+        # gspread เป็น blocking I/O จึงจำลองด้วย time.sleep (รันใน thread pool ของ AsyncSheets)
+        self.counters.add(f"sheets.{op}")
+        time.sleep(self.profile.sample())
+        if self.profile.throttled():
+            self.counters.add("sheets.429")
+            raise make_api_error()
+
+
+class FakeWorksheet:
+    def __init__(self, backend, title, rows):
+        self.backend = backend
+        self.title = title
+        self.rows = rows
+
+    def col_values(self, col):
+        self.backend.call("col_values")
+        return [row[col - 1] if len(row) >= col else "" for row in self.rows]
+
+    def get_all_values(self):
+        self.backend.call("get_all_values")
+        return [list(row) for row in self.rows]
+
+    def get(self, range_name=None):
+        self.backend.call("get")
+        start = 1
+        match = re.match(r"[A-Z]+(\d+)", range_name or "")
+        if match:
+            start = int(match.group(1))
+        return [list(row) for row in self.rows[start - 1:]]
+
+    def append_row(self, values, **kwargs):
+        self.backend.call("append_row")
+        self.rows.append(list(values))
+
+    def append_rows(self, values, **kwargs):
+        self.backend.call("append_rows")
+        self.rows.extend(list(row) for row in values)
+
+
+class FakeSpreadsheet:
+    def __init__(self, backend, sheets):
+        self.backend = backend
+        self._worksheets = {title: FakeWorksheet(backend, title, rows) for title, rows in sheets.items()}
+
+    def worksheets(self, exclude_hidden=False):
+        self.backend.call("worksheets")
+        return list(self._worksheets.values())
+
+    def worksheet(self, title):
+        self.backend.call("worksheet")
+        return self._worksheets[title]
+
+    def values_batch_get(self, ranges, params=None):
+        self.backend.call("values_batch_get")
+        value_ranges = []
+        for range_name in ranges:
+            title, cells = range_name.rsplit("!", 1)
+            title = title.strip("'").replace("''", "'")
+            first, last = (ord(part[0]) - ord("A") for part in cells.split(":"))
+            rows = [row[first:last + 1] for row in self._worksheets[title].rows]
+            value_ranges.append({"range": range_name, "values": rows})
+        return {"valueRanges": value_ranges}
+
+
+def build_spreadsheet(backend, quest_sheets, quests_per_sheet, log_sheet_name):
+    # ✅ ข้อมูลตัวอย่าง: ชีทเควส + ชีท Role_* ที่จับคู่เควสกับ Role + ชีท log
+    sheets = {log_sheet_name: [["timestamp", "player", "sheet", "quest", "status", "submitted_by"]]}
+    role_ids = itertools.count(900_000)
+    roles = {}
+    for sheet_name in quest_sheets:
+        titles = [f"No_{i} (เควส {sheet_name} #{i})" for i in range(1, quests_per_sheet + 1)]
+        sheets[sheet_name] = [["quest"]] + [[title] for title in titles]
+        role_sheet = "Role_Beginner" if sheet_name == "BeginnerQuests" else f"Role_{sheet_name}"
+        rows = [["quest", "role_id"]]
+        for title in titles:
+            role_id = next(role_ids)
+            roles[role_id] = f"{sheet_name}:{title.split('(')[0].strip()}"
+            rows.append([title, str(role_id)])
+        sheets[role_sheet] = rows
+    return FakeSpreadsheet(backend, sheets), roles
+
+
+# ─── Discord ────────────────────────────────────────────────────────────────
+
+
+class FakeRest:
+    def __init__(self, profile, counters):
+        self.profile = profile
+        self.counters = counters
+
+    async def call(self, op):
+        # discord.py รอ retry_after แล้วยิงซ้ำเองเมื่อโดน 429 จึงจำลองเป็นการเรียกซ้ำ + เวลารอ
+        self.counters.add(f"discord.{op}")
+        await asyncio.sleep(self.profile.sample())
+        while self.profile.throttled():
+            self.counters.add("discord.429")
+            self.counters.add(f"discord.{op}")
+            await asyncio.sleep(self.profile.retry_after + self.profile.sample())
+
+
+class FakeRole:
+    def __init__(self, role_id, name, default=False):
+        self.id = role_id
+        self.name = name
+        self._default = default
+
+    def is_default(self):
+        return self._default
+
+    def __repr__(self):
+        return f"<FakeRole {self.name}>"
+
+
+class FakeMember:
+    def __init__(self, rest, guild, user_id, name):
+        self.rest = rest
+        self.guild = guild
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.mention = f"<@{user_id}>"
+        self.roles = [guild.default_role]
+        self.dms = []
+
+    async def edit(self, roles=None, reason=None, **kwargs):
+        await self.rest.call("member_edit")
+        if roles is not None:
+            self.roles = [self.guild.default_role] + [role for role in roles if not role.is_default()]
+        return self
+
+    async def add_roles(self, *roles, reason=None):
+        for role in roles:
+            await self.rest.call("add_roles")
+            if role not in self.roles:
+                self.roles.append(role)
+
+    async def remove_roles(self, *roles, reason=None):
+        for role in roles:
+            await self.rest.call("remove_roles")
+            if role in self.roles:
+                self.roles.remove(role)
+
+    async def send(self, content=None, embed=None, embeds=None, **kwargs):
+        await self.rest.call("dm_send")
+        self.dms.append(embed or embeds or content)
+
+
+class FakeGuild:
+    def __init__(self, rest, guild_id, role_names, gateway_cache_ratio=0.0, seed=None):
+        self.rest = rest
+        self.id = guild_id
+        self.default_role = FakeRole(guild_id, "@everyone", default=True)
+        self._roles = {role_id: FakeRole(role_id, name) for role_id, name in role_names.items()}
+        self._members = {}
+        self._gateway_cached = set()
+        self.gateway_cache_ratio = gateway_cache_ratio
+        self._random = random.Random(seed)
+
+    @property
+    def roles(self):
+        return [self.default_role, *self._roles.values()]
+
+    def get_role(self, role_id):
+        return self._roles.get(role_id)
+
+    def add_member(self, user_id, name):
+        member = FakeMember(self.rest, self, user_id, name)
+        self._members[user_id] = member
+        if self._random.random() < self.gateway_cache_ratio:
+            self._gateway_cached.add(user_id)
+        return member
+
+    def get_member(self, user_id):
+        return self._members.get(user_id) if user_id in self._gateway_cached else None
+
+    async def fetch_member(self, user_id):
+        await self.rest.call("fetch_member")
+        member = self._members.get(user_id)
+        if member is None:
+            raise discord.NotFound(_FakeHTTPResponse(404), "Unknown Member")
+        return member
+
+
+class FakeClient:
+    # แทน discord.Client ของ worker.py ที่ login แบบ REST อย่างเดียว (ไม่มี cache ของ gateway)
+    def __init__(self, rest, guilds):
+        self.rest = rest
+        self.guilds = {guild.id: guild for guild in guilds}
+
+    async def fetch_guild(self, guild_id):
+        await self.rest.call("fetch_guild")
+        return self.guilds[guild_id]
+
+    async def fetch_user(self, user_id):
+        await self.rest.call("fetch_user")
+        for guild in self.guilds.values():
+            user = guild._members.get(user_id)
+            if user is not None:
+                return user
+        raise discord.NotFound(_FakeHTTPResponse(404), "Unknown User")
+
+
+class _FakeHTTPResponse:
+    def __init__(self, status):
+        self.status = status
+        self.reason = "Not Found"
+
+
+class FakeMessage:
+    _ids = itertools.count(1)
+
+    def __init__(self, rest, channel, content=None, embed=None, view=None):
+        self.rest = rest
+        self.channel = channel
+        self.id = next(self._ids)
+        self.content = content
+        self.embed = embed
+        self.view = view
+
+    async def edit(self, content=None, embed=None, view=None, **kwargs):
+        await self.rest.call("message_edit")
+        self.content = content if content is not None else self.content
+        self.embed = embed if embed is not None else self.embed
+        self.view = view
+        return self
+
+
+class FakeChannel:
+    def __init__(self, rest, channel_id):
+        self.rest = rest
+        self.id = channel_id
+        self.messages = []
+
+    async def send(self, content=None, embed=None, view=None, **kwargs):
+        await self.rest.call("channel_send")
+        message = FakeMessage(self.rest, self, content, embed, view)
+        self.messages.append(message)
+        return message
+
+    async def fetch_message(self, message_id):
+        await self.rest.call("fetch_message")
+        for message in self.messages:
+            if message.id == message_id:
+                return message
+        raise discord.NotFound(_FakeHTTPResponse(404), "Unknown Message")
+
+    def get_partial_message(self, message_id):
+        # ไม่เรียก REST เหมือนของจริง ถ้าไม่มีข้อความนี้ edit จะได้ NotFound
+        for message in self.messages:
+            if message.id == message_id:
+                return message
+        return _MissingMessage(self.rest, message_id)
+
+
+class _MissingMessage:
+    def __init__(self, rest, message_id):
+        self.rest = rest
+        self.id = message_id
+
+    async def edit(self, **kwargs):
+        await self.rest.call("message_edit")
+        raise discord.NotFound(_FakeHTTPResponse(404), "Unknown Message")
+
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.kind = None
+        self.kwargs = None
+        self.modal = None
+        self.acked_after = None
+
+    def is_done(self):
+        return self.kind is not None
+
+    async def _ack(self, kind, **kwargs):
+        if self.kind is not None:
+            raise discord.InteractionResponded(self.interaction)
+        self.kind = kind
+        self.kwargs = kwargs
+        await self.interaction.rest.call("interaction_response")
+        self.acked_after = time.perf_counter() - self.interaction.started
+
+    async def defer(self, ephemeral=False, thinking=False):
+        await self._ack("defer", ephemeral=ephemeral, thinking=thinking)
+
+    async def send_message(self, content=None, **kwargs):
+        await self._ack("send_message", content=content, **kwargs)
+
+    async def edit_message(self, **kwargs):
+        await self._ack("edit_message", **kwargs)
+
+    async def send_modal(self, modal):
+        self.modal = modal
+        await self._ack("send_modal")
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        await self.interaction.rest.call("followup_send")
+        self.sent.append(dict(content=content, **kwargs))
+
+
+class FakeNamespace:
+    def __init__(self, **values):
+        self.__dict__.update(values)
+
+    def __getattr__(self, name):
+        return None
+
+
+_interaction_ids = itertools.count(1)
+
+
+class FakeInteraction:
+    def __init__(self, rest, user, guild, message=None, **namespace):
+        self.rest = rest
+        self.id = next(_interaction_ids)
+        self.user = user
+        self.guild = guild
+        self.guild_id = guild.id
+        self.message = message
+        self.namespace = FakeNamespace(**namespace)
+        self.created_at = discord.utils.utcnow()
+        self.started = time.perf_counter()
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.edits = []
+
+    async def edit_original_response(self, **kwargs):
+        await self.rest.call("edit_original_response")
+        self.edits.append(kwargs)
+        if self.message is not None:
+            self.message.content = kwargs.get("content", self.message.content)
+            self.message.view = kwargs.get("view")
@@ -0,0 +1,350 @@
+import argparse
+import asyncio
+import collections
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# ✅ รันได้ทั้ง `python -m bench.run_bench` และ `python bench/run_bench.py`
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bench.fakes import (  # noqa: E402
+    Counters, LatencyProfile, FakeSheetsBackend, FakeRest, FakeGuild, FakeChannel, FakeClient,
+    FakeInteraction, build_spreadsheet
+)
+
+LOG_SHEET = "QuestLog"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="จำลองผู้เล่น/แอดมินพร้อมกันกับ Sheets และ Discord ปลอม แล้ววัด latency")
+    parser.add_argument("--players", type=int, default=200, help="จำนวนผู้เล่นที่ส่งเควสพร้อมกัน")
+    parser.add_argument("--admins", type=int, default=5, help="จำนวนแอดมินที่พิจารณาพร้อมกัน")
+    parser.add_argument("--quests-per-sheet", type=int, default=40)
+    parser.add_argument("--approve-ratio", type=float, default=0.8)
+    parser.add_argument("--sheets-latency", type=float, default=0.25, help="วินาทีต่อการเรียก Sheets")
+    parser.add_argument("--sheets-429", type=float, default=0.0, help="โอกาสที่ Sheets ตอบ 429 (0-1)")
+    parser.add_argument("--discord-latency", type=float, default=0.08, help="วินาทีต่อการเรียก Discord REST")
+    parser.add_argument("--discord-429", type=float, default=0.0, help="โอกาสที่ Discord ตอบ 429 (0-1)")
+    parser.add_argument("--discord-retry-after", type=float, default=1.0)
+    parser.add_argument("--gateway-cache-ratio", type=float, default=0.0, help="สัดส่วนสมาชิกที่อยู่ใน cache ของ gateway")
+    parser.add_argument("--review-mode", choices=("messages", "board"), default="messages",
+                        help="messages = ข้อความต่อคำร้อง, board = กระดานคิวเดียวในห้องแอดมิน")
+    parser.add_argument("--board-debounce", type=float, default=0.5, help="วินาทีที่รอรวมการแก้กระดาน (โหมด board)")
+    parser.add_argument("--bulk", action="store_true", help="แอดมินอนุมัติทีละหัวข้อด้วย /bulk_approve แทนการกดปุ่มทีละคำร้อง")
+    parser.add_argument("--dm-window", type=float, default=0.5, help="วินาทีที่รอรวม DM ผลพิจารณาของผู้เล่นเดียวกัน")
+    parser.add_argument("--dm-per-minute", type=int, default=6000, help="เพดาน DM ต่อนาทีของตัวส่ง DM")
+    parser.add_argument("--guilds", type=int, default=1, help="จำนวนกิลด์ในโปรเซสเดียว (แต่ละกิลด์มีสเปรดชีตและห้องของตัวเอง)")
+    parser.add_argument("--process-mode", choices=("single", "gateway"), default="single",
+                        help="gateway = ส่งงานแก้ Role/DM เข้าคิวแล้วให้ worker ในโปรเซสเดียวกันรับไปทำ")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="พิมพ์ผลเป็น JSON")
+    parser.add_argument("--verbose", action="store_true", help="แสดงข้อความ log ของบอทระหว่างจำลอง")
+    return parser.parse_args(argv)
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def drain(fast_ack, deena):
+    # รอจนงานเบื้องหลัง (ส่งต่อคำร้อง, อนุมัติ, แก้กระดาน) ทำเสร็จหมด
+    while fast_ack._background_tasks:
+        await asyncio.gather(*list(fast_ack._background_tasks), return_exceptions=True)
+    for guild in deena.GUILDS.values():
+        if guild.board_updates is not None:
+            await guild.board_updates.flush()
+    await deena.NOTIFIER.flush()
+
+
+def write_guilds_config(count):
+    # 🏘️ หลายกิลด์: สร้างไฟล์ GUILDS_CONFIG ชั่วคราว (id สมมติ ห้องของแต่ละกิลด์ไม่ซ้ำกัน)
+    path = os.path.join(tempfile.mkdtemp(prefix="deena-bench-guilds-"), "guilds.json")
+    guilds = [
+        {
+            "guild_id": 5_000 + index, "channel_id": 6_000 + index, "admin_channel_id": 7_000 + index,
+            "sheet_id": f"bench-sheet-{index}", "sheet_name": LOG_SHEET,
+        }
+        for index in range(count)
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"guilds": guilds}, f)
+    return path
+
+
+async def run(args):
+    os.environ.setdefault("DEENA_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="deena-bench-"), "bench.db"))
+    if args.guilds > 1:
+        os.environ["GUILDS_CONFIG"] = write_guilds_config(args.guilds)
+    os.environ["REVIEW_MODE"] = args.review_mode
+    os.environ["BOARD_DEBOUNCE"] = os.environ["BOARD_MIN_INTERVAL"] = str(args.board_debounce)
+    os.environ["DM_MERGE_WINDOW"] = str(args.dm_window)
+    os.environ["DM_PER_MINUTE"] = str(args.dm_per_minute)
+    os.environ["PROCESS_MODE"] = args.process_mode
+    import bot as deena
+    import fast_ack
+    import notifier
+
+    rng = random.Random(args.seed)
+    counters = Counters()
+    sheets_backend = FakeSheetsBackend(
+        LatencyProfile(args.sheets_latency, rate_429=args.sheets_429, seed=args.seed), counters
+    )
+    rest = FakeRest(
+        LatencyProfile(args.discord_latency, rate_429=args.discord_429, retry_after=args.discord_retry_after, seed=args.seed),
+        counters
+    )
+
+    # ✅ ต่อบอทเข้ากับตัวแทน (ทำตอนเริ่ม จึงไม่นับรวมในผล) แต่ละกิลด์มีสเปรดชีต, Role และห้องแอดมินของตัวเอง
+    fake_guilds = []
+    admin_channels = {}
+    for state in deena.GUILDS.values():
+        spreadsheet, role_names = build_spreadsheet(
+            sheets_backend, state.config.current.topic_names, args.quests_per_sheet, LOG_SHEET
+        )
+        fake_guilds.append(FakeGuild(rest, state.id, role_names, args.gateway_cache_ratio, seed=args.seed))
+        admin_channels[state.settings.admin_channel_id] = FakeChannel(rest, state.settings.admin_channel_id)
+        # ทุกคำขอ Sheets ผ่าน SHEETS.call เหมือนบอทจริง (โดน 429 ก็ลองใหม่ตามตัวคุมโควตา)
+        state.spreadsheet = spreadsheet
+        state.sheet = await deena.SHEETS.call(spreadsheet.worksheet, LOG_SHEET)
+        await deena.SHEETS.call(state.catalog.load, spreadsheet)
+        await deena.SHEETS.call(state.role_index.rebuild, spreadsheet, cost=2)
+    guilds_by_id = {guild.id: guild for guild in fake_guilds}
+    deena.bot.get_channel = admin_channels.get
+    deena.bot.get_guild = guilds_by_id.get
+    counters.reset()
+
+    acks = collections.defaultdict(list)
+    interactions = 0
+
+    def track(handler, interaction):
+        nonlocal interactions
+        interactions += 1
+        if interaction.response.acked_after is not None:
+            acks[handler].append(interaction.response.acked_after)
+
+    # 👥 ผู้เล่น: กดหัวข้อ → เลือกเควส → กรอกฟอร์ม
+    async def player(index):
+        guild = fake_guilds[index % len(fake_guilds)]
+        state = deena.GUILDS[guild.id]
+        user = guild.add_member(10_000 + index, f"player{index}")
+        topic = rng.choice(state.config.current.topic_names)
+        panel = deena.SheetSelectView(state)
+        button = next(item for item in panel.children if getattr(item, "sheet_name", None) == topic)
+
+        interaction = FakeInteraction(rest, user, guild)
+        await button.callback(interaction)
+        track("sheet_button", interaction)
+        picker = (interaction.response.kwargs or {}).get("view")
+        if picker is None and interaction.followup.sent:
+            picker = interaction.followup.sent[-1].get("view")
+        if picker is None:
+            return
+        dropdown = picker.children[0]
+        dropdown._values = [rng.choice(dropdown.options).value]
+
+        interaction = FakeInteraction(rest, user, guild)
+        await dropdown.callback(interaction)
+        track("quest_dropdown", interaction)
+        modal = interaction.response.modal
+        modal.player_name._value = f"นักโทษ{index}"
+
+        interaction = FakeInteraction(rest, user, guild)
+        await modal.on_submit(interaction)
+        track("quest_form", interaction)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(player(i) for i in range(args.players)))
+    await drain(fast_ack, deena)
+    submit_elapsed = time.perf_counter() - started
+    submit_counts = counters.snapshot()
+    submit_interactions = interactions
+    counters.reset()
+
+    # 🛡️ แอดมิน: ไล่กดอนุมัติ/ปฏิเสธคำร้องที่เข้ามาในห้องแอดมิน
+    queue = asyncio.Queue()
+    for guild in fake_guilds:
+        state = deena.GUILDS[guild.id]
+        if state.board is not None:
+            # โหมดกระดาน: ทุกคำร้องกดจากข้อความกระดานเดียว (ปุ่มของหน้าถัดไปสร้างจาก id เหมือนที่ dynamic item ทำ)
+            board_message = state.board.message
+            for submission in state.submissions.pending_page(0, 1_000_000):
+                queue.put_nowait((guild, board_message, [deena.ApproveButton(submission.id), deena.RejectButton(submission.id)]))
+        else:
+            for message in list(admin_channels[state.settings.admin_channel_id].messages):
+                if message.view is not None:
+                    queue.put_nowait((guild, message, [item for item in message.view.children]))
+    decisions = queue.qsize()
+
+    if args.bulk:
+        # 🗂️ /bulk_approve หัวข้อละครั้ง แอดมินแต่ละคนรับไปคนละหัวข้อ
+        topics = asyncio.Queue()
+        for guild in fake_guilds:
+            for topic in deena.GUILDS[guild.id].config.current.topic_names:
+                topics.put_nowait((guild, topic))
+        queue = asyncio.Queue()
+
+    def admin_member(guild, index):
+        # แอดมินคนเดียวกันเป็นสมาชิกของทุกกิลด์ (เพิ่มครั้งแรกที่ต้องใช้)
+        return guild._members.get(1_000 + index) or guild.add_member(1_000 + index, f"admin{index}")
+
+    async def bulk_admin(index):
+        while not topics.empty():
+            guild, topic = topics.get_nowait()
+            interaction = FakeInteraction(rest, admin_member(guild, index), guild)
+            await deena.bulk_approve.callback(interaction, topic=topic)
+            track("bulk_approve", interaction)
+
+    async def admin(index):
+        while not queue.empty():
+            guild, message, (approve_button, reject_button) = queue.get_nowait()
+            button = approve_button if rng.random() < args.approve_ratio else reject_button
+            interaction = FakeInteraction(rest, admin_member(guild, index), guild, message=message)
+            await button.callback(interaction)
+            track("approve" if button is approve_button else "reject", interaction)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(admin(i) for i in range(args.admins)), *(bulk_admin(i) for i in range(args.admins) if args.bulk))
+    await drain(fast_ack, deena)
+    review_elapsed = time.perf_counter() - started
+    review_counts = counters.snapshot()
+    counters.reset()
+
+    # 🏗️ โหมด gateway: worker รับงานที่ค้างในคิวไปทำจนหมด (แยกนับจากช่วงพิจารณา)
+    worker_elapsed = None
+    if deena.JOBS is not None:
+        import job_queue
+        import worker
+        started = time.perf_counter()
+        runner = worker.Worker(FakeClient(rest, fake_guilds), deena.JOBS)
+        task = asyncio.create_task(job_queue.run_worker(
+            deena.JOBS, {"role_sync": runner.role_sync, "dm": runner.dm}, "bench", poll=0.05
+        ))
+        while deena.JOBS.backlog():
+            await asyncio.sleep(0.05)
+        task.cancel()
+        worker_elapsed = time.perf_counter() - started
+    worker_counts = counters.snapshot()
+    counters.reset()
+
+    # 📤 ส่ง journal ที่ค้างขึ้นชีท log (ที่บอทจริงทำใน flush_journal)
+    flush_error = None
+    try:
+        for state in deena.GUILDS.values():
+            await state.journal.flush(deena.SHEETS, state.sheet)
+    except Exception as e:
+        flush_error = repr(e)
+    flush_counts = counters.snapshot()
+    deena.SHEETS.shutdown()
+
+    def sheets_total(counts):
+        return sum(n for key, n in counts.items() if key.startswith("sheets.") and key != "sheets.429")
+
+    def discord_calls(counts):
+        return {key[len("discord."):]: n for key, n in sorted(counts.items()) if key.startswith("discord.")}
+
+    review_discord = discord_calls(review_counts)
+    worker_discord = discord_calls(worker_counts)
+    # โหมด gateway งาน Role/DM ย้ายไป worker: นับรวมด้วย ไม่อย่างนั้นตัวเลขต่อการพิจารณาจะต่ำกว่าที่ใช้จริง
+    review_rest = sum(
+        n for calls in (review_discord, worker_discord) for op, n in calls.items() if op not in ("429", "interaction_response")
+    )
+    return {
+        "review_mode": args.review_mode,
+        "process_mode": args.process_mode,
+        "guilds": len(deena.GUILDS),
+        "players": args.players,
+        "admins": args.admins,
+        "decisions": decisions,
+        "submit_seconds": round(submit_elapsed, 3),
+        "review_seconds": round(review_elapsed, 3),
+        "worker_seconds": round(worker_elapsed, 3) if worker_elapsed is not None else None,
+        "ack_ms": {
+            handler: {
+                "n": len(samples),
+                "p50": round(percentile(samples, 0.50) * 1000, 1),
+                "p99": round(percentile(samples, 0.99) * 1000, 1),
+                "max": round(max(samples) * 1000, 1),
+            }
+            for handler, samples in sorted(acks.items())
+        },
+        "sheets_calls": {
+            "submit_phase": sheets_total(submit_counts),
+            "review_phase": sheets_total(review_counts),
+            "journal_flush": sheets_total(flush_counts),
+            "per_interaction": round(
+                (sheets_total(submit_counts) + sheets_total(review_counts) + sheets_total(flush_counts))
+                / max(1, interactions), 3
+            ),
+            "throttled_429": submit_counts["sheets.429"] + review_counts["sheets.429"] + flush_counts["sheets.429"],
+            "journal_backlog": sum(state.journal.backlog() for state in deena.GUILDS.values()),
+            "journal_flush_error": flush_error,
+        },
+        "discord_rest": {
+            "submit_phase": discord_calls(submit_counts),
+            "review_phase": review_discord,
+            "worker_phase": worker_discord,
+            "per_approval": round(review_rest / max(1, decisions), 2),
+        },
+        "dm": {
+            "sent": notifier.DM_SENT.value(outcome="sent"),
+            "failed": notifier.DM_SENT.value(outcome="failed"),
+            "merged": notifier.DM_MERGED.value(),
+        },
+        "interactions": {"submit": submit_interactions, "review": interactions - submit_interactions},
+    }
+
+
+def print_report(result):
+    print(f"👥 ผู้เล่น {result['players']} คน, 🛡️ แอดมิน {result['admins']} คน, พิจารณา {result['decisions']} คำร้อง "
+          f"(โหมด {result['review_mode']}, {result['process_mode']}, {result['guilds']} กิลด์)")
+    print(f"⏱️ ช่วงส่งเควส {result['submit_seconds']}s, ช่วงพิจารณา {result['review_seconds']}s"
+          + (f", worker {result['worker_seconds']}s" if result["worker_seconds"] is not None else ""))
+    print("\nเวลาตอบรับ interaction (ms)")
+    for handler, stats in result["ack_ms"].items():
+        print(f"  {handler:<16} n={stats['n']:<5} p50={stats['p50']:<8} p99={stats['p99']:<8} max={stats['max']}")
+    sheets = result["sheets_calls"]
+    print("\nการเรียก Google Sheets")
+    print(f"  ส่งเควส={sheets['submit_phase']} พิจารณา={sheets['review_phase']} flush journal={sheets['journal_flush']} "
+          f"429={sheets['throttled_429']} → {sheets['per_interaction']} ครั้ง/interaction")
+    if sheets["journal_backlog"]:
+        print(f"  ❗ journal ค้าง {sheets['journal_backlog']} แถว: {sheets['journal_flush_error']}")
+    rest = result["discord_rest"]
+    print("\nการเรียก Discord REST")
+    print(f"  ช่วงส่งเควส: {rest['submit_phase']}")
+    print(f"  ช่วงพิจารณา: {rest['review_phase']}")
+    if rest["worker_phase"]:
+        print(f"  worker: {rest['worker_phase']}")
+    print(f"  → {rest['per_approval']} ครั้ง/การพิจารณา รวม worker (ไม่นับการตอบ interaction)")
+    dm = result["dm"]
+    print(f"\nDM ผลพิจารณา: ส่ง {dm['sent']} ข้อความ, รวมเข้าข้อความอื่น {dm['merged']} ผล, ไม่สำเร็จ {dm['failed']}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    import tracing
+    tracing.setup_logging("INFO" if args.verbose else "CRITICAL")
+    bot_output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    try:
+        with bot_output:
+            result = asyncio.run(run(args))
+    finally:
+        tracing.shutdown_logging()
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print_report(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+import discord
+
+log = logging.getLogger(__name__)
+
+
+def digest(payload):
+    # 🔑 hash ของข้อมูลที่จะส่งให้ Discord ใช้ตัดสินว่าเนื้อหาเปลี่ยนหรือไม่ (ไม่ต้องเรียก API เพื่อเทียบ)
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode()).hexdigest()
+
+
+def message_digest(content=None, embed=None, view=None, **_):
+    return digest({
+        "content": content,
+        "embed": embed.to_dict() if embed else None,
+        "components": view.to_components() if view else None,
+    })
+
+
+class PinnedMessage:
+    """ข้อความเดียวที่บอทแก้ซ้ำ (กระดานสถิติ, คิวคำร้อง) จำ message id ไว้ใน SnapshotStore จึงใช้ข้อความเดิมหลังรีสตาร์ท"""
+
+    def __init__(self, snapshots, name):
+        self.snapshots = snapshots
+        self.name = name
+        self.message = None
+        self._saved, _ = snapshots.load(name)
+
+    @property
+    def message_id(self):
+        if self.message is not None:
+            return self.message.id
+        return (self._saved or {}).get("message_id")
+
+    async def upsert(self, channel, **kwargs):
+        # ✅ แก้ข้อความเดิมผ่าน PartialMessage (ไม่ต้อง fetch ก่อน) ถ้าข้อความถูกลบไปแล้วค่อยส่งใหม่
+        if self.message is None and self._saved and self._saved.get("channel_id") == channel.id:
+            self.message = channel.get_partial_message(self._saved["message_id"])
+        if self.message is not None:
+            try:
+                self.message = await self.message.edit(**kwargs) or self.message
+                return self.message
+            except discord.NotFound:
+                self.message = None
+        self.message = await channel.send(**kwargs)
+        self._saved = {"channel_id": channel.id, "message_id": self.message.id}
+        self.snapshots.save(self.name, self._saved)
+        return self.message
+
+    async def publish(self, channel, **kwargs):
+        # ✅ เหมือน upsert แต่ไม่แก้ข้อความถ้าเนื้อหาเท่ากับที่ส่งไว้ครั้งก่อน (เทียบ hash ที่จำไว้)
+        # คืน (message, changed) ข้อความเดิมยังต้องมีอยู่จริง ตรวจด้วย GET ครั้งเดียวแทนการแก้
+        fingerprint = message_digest(**kwargs)
+        saved = self._saved or {}
+        if saved.get("fingerprint") == fingerprint and saved.get("channel_id") == channel.id:
+            try:
+                if self.message is None:
+                    self.message = await channel.fetch_message(saved["message_id"])
+                return self.message, False
+            except discord.NotFound:
+                self.message = None
+        message = await self.upsert(channel, **kwargs)
+        self._saved["fingerprint"] = fingerprint
+        self.snapshots.save(self.name, self._saved)
+        return message, True
+
+
+class ReviewBoard(PinnedMessage):
+    """กระดานคิวคำร้องในห้องแอดมิน (REVIEW_MODE=board) จำหน้าที่แสดงอยู่ไว้ด้วย"""
+    page = 0
+
+
+class Debouncer:
+    """รวมการสั่งอัปเดตที่มาติดๆ กันเป็นครั้งเดียว: รอ delay วินาทีหลังครั้งแรก และเว้นระหว่างรอบอย่างน้อย min_interval
+    N ครั้งที่มาพร้อมกันจึงเหลือการเรียก callback ไม่เกิน 1 ครั้งต่อ min_interval วินาที"""
+
+    def __init__(self, callback, delay=2.0, min_interval=5.0):
+        self.callback = callback
+        self.delay = delay
+        self.min_interval = min_interval
+        self._dirty = False
+        self._task = None
+        self._last_run = float("-inf")
+        self.triggers = 0
+        self.runs = 0
+
+    def trigger(self):
+        self.triggers += 1
+        self._dirty = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=f"debounce:{getattr(self.callback, '__name__', 'callback')}")
+
+    async def _run(self):
+        while self._dirty:
+            await asyncio.sleep(max(self.delay, self._last_run + self.min_interval - time.monotonic()))
+            # สั่งเพิ่มระหว่าง callback ทำงาน → _dirty เป็น True อีกครั้ง วนรอบถัดไป
+            self._dirty = False
+            self._last_run = time.monotonic()
+            self.runs += 1
+            try:
+                await self.callback()
+            except Exception as e:
+                log.warning("❗ อัปเดต %s ไม่สำเร็จ: %s", getattr(self.callback, "__name__", "callback"), e)
+
+    async def flush(self):
+        # รอจนรอบที่ค้างอยู่ทำเสร็จ (ใช้ตอนปิดบอทและใน bench)
+        if self._task is not None:
+            await self._task
+
+    def cancel(self):
+        if self._task is not None:
+            self._task.cancel()
@@ -1,46 +1,415 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
 from dotenv import load_dotenv
 import os
-import gspread
+import asyncio
+import collections
+import functools
+import io
+import json
+import logging
+import re
+import time
 from google.oauth2.service_account import Credentials
 from datetime import datetime
 
 from myserver import server_on
+from quest_config import ConfigError, Topic, export_config
+from sheets_io import AsyncSheets, SheetsUnavailable
+from sheets_quota import PRIORITY_REFRESH
+from members import MemberResolver
+from submission_store import APPROVED, REJECTED
+from submission_guard import UserThrottle
+from decision_store import unique_decisions
+from guilds import Guild, GuildSettings, SheetsPool, load_settings
+from board import Debouncer, digest
+from notifier import DMDispatcher, Notice, MemberMissing
+from job_queue import JobQueue
+from startup import STARTUP
+import fast_ack
+import metrics
+import storage
+import tracing
+from tracing import span
+
+log = logging.getLogger("deena")
 
 # ตั้งค่าเชื่อม Google Sheet จาก .env
 load_dotenv()
 
 SCOPE = ['https://www.googleapis.com/auth/spreadsheets']
-service_account_info = {
-    "type": "service_account",
-    "project_id": os.getenv("GOOGLE_PROJECT_ID"),
-    "private_key_id": os.getenv("GOOGLE_PRIVATE_KEY_ID"),
-    "private_key": os.getenv("GOOGLE_PRIVATE_KEY").replace("\\n", "\n"),
-    "client_email": os.getenv("GOOGLE_CLIENT_EMAIL"),
-    "client_id": os.getenv("GOOGLE_CLIENT_ID"),
-    "auth_uri": os.getenv("GOOGLE_AUTH_URI"),
-    "token_uri": os.getenv("GOOGLE_TOKEN_URI"),
-    "auth_provider_x509_cert_url": os.getenv("GOOGLE_AUTH_PROVIDER_CERT_URL"),
-    "client_x509_cert_url": os.getenv("GOOGLE_CLIENT_CERT_URL"),
-    "universe_domain": os.getenv("GOOGLE_UNIVERSE_DOMAIN")
-}
 
-CREDS = Credentials.from_service_account_info(service_account_info, scopes=SCOPE)
-GC = gspread.authorize(CREDS)
+# ✅ ทุกคำสั่ง Sheets จาก handler ต้องผ่าน SHEETS (thread pool + timeout) ห้ามเรียกตรงใน event loop
+SHEETS_TIMEOUT = float(os.getenv("SHEETS_TIMEOUT", "15"))
+SHEETS_WORKERS = int(os.getenv("SHEETS_WORKERS", "4"))
+# 🚦 โควตาต่อนาทีตั้งให้ตรงกับโปรเจกต์ Google (ค่าเริ่มต้น 60 อ่าน / 60 เขียน ต่อผู้ใช้ต่อนาที)
+# ทุกกิลด์ใช้ service account เดียวกัน โควตาจึงเป็นก้อนเดียวใช้ร่วมกัน
+SHEETS = AsyncSheets(
+    max_workers=SHEETS_WORKERS,
+    timeout=SHEETS_TIMEOUT,
+    reads_per_minute=int(os.getenv("SHEETS_READS_PER_MINUTE", "60")),
+    writes_per_minute=int(os.getenv("SHEETS_WRITES_PER_MINUTE", "60")),
+    max_retries=int(os.getenv("SHEETS_MAX_RETRIES", "4")),
+    breaker_threshold=int(os.getenv("SHEETS_BREAKER_THRESHOLD", "5")),
+    breaker_cooldown=float(os.getenv("SHEETS_BREAKER_COOLDOWN", "30")),
+)
 
-# ✅ จากนี้ค่อยเรียกใช้ SHEET_ID และเปิด worksheet
 SHEET_ID = os.getenv("GOOGLE_SHEET_ID")
 SHEET_NAME = os.getenv("GOOGLE_SHEET_NAME")
-sheet = GC.open_by_key(SHEET_ID).worksheet(SHEET_NAME)
 
-load_dotenv()
+
+def service_account_credentials():
+    service_account_info = {
+        "type": "service_account",
+        "project_id": os.getenv("GOOGLE_PROJECT_ID"),
+        "private_key_id": os.getenv("GOOGLE_PRIVATE_KEY_ID"),
+        "private_key": os.getenv("GOOGLE_PRIVATE_KEY").replace("\\n", "\n"),
+        "client_email": os.getenv("GOOGLE_CLIENT_EMAIL"),
+        "client_id": os.getenv("GOOGLE_CLIENT_ID"),
+        "auth_uri": os.getenv("GOOGLE_AUTH_URI"),
+        "token_uri": os.getenv("GOOGLE_TOKEN_URI"),
+        "auth_provider_x509_cert_url": os.getenv("GOOGLE_AUTH_PROVIDER_CERT_URL"),
+        "client_x509_cert_url": os.getenv("GOOGLE_CLIENT_CERT_URL"),
+        "universe_domain": os.getenv("GOOGLE_UNIVERSE_DOMAIN")
+    }
+    return Credentials.from_service_account_info(service_account_info, scopes=SCOPE)
+
+
+# ✅ เชื่อม Google เบื้องหลังใน setup_hook (warm_up_sheets) ไม่ใช่ตอน import
+# client ตัวเดียว (authorize ตอนใช้ครั้งแรก) ใช้ร่วมทุกกิลด์ ระหว่างนี้ให้บริการจากสำเนาในเครื่อง
+SHEETS_POOL = SheetsPool(service_account_credentials, timeout=SHEETS_TIMEOUT, pool_size=SHEETS_WORKERS)
+
+# ✅ กิลด์เดียว (ค่าเดิม): แก้ ID ตรงนี้หรือตั้งใน .env
+GUILD_ID = 1360583634481975327  # ← ใส่ Server ID ของคุณตรงนี้
+CHANNEL_ID = 1374778866903814214  # 👈 แก้เป็น ID ของห้องจริงใน Discord
+ADMIN_CHANNEL_ID = 1368302479841693786  # 👈 เปลี่ยนเป็นห้องแอดมินจริง
+STATS_CHANNEL_ID = int(os.getenv("STATS_CHANNEL_ID", "0"))
+
+# 🏘️ หลายกิลด์ในโปรเซสเดียว: GUILDS_CONFIG ชี้ไฟล์ JSON/YAML {"guilds": [{guild_id, channel_id, admin_channel_id,
+# stats_channel_id, sheet_id, sheet_name, quest_config, db_path}, ...]} แต่ละกิลด์มีสเปรดชีต ห้อง และชุดเควสของตัวเอง
+GUILD_SETTINGS = load_settings(
+    os.getenv("GUILDS_CONFIG") or None,
+    GuildSettings(
+        GUILD_ID, CHANNEL_ID, ADMIN_CHANNEL_ID, STATS_CHANNEL_ID, SHEET_ID, SHEET_NAME,
+        os.getenv("QUEST_CONFIG") or None, storage.DB_PATH
+    )
+)
+
+CATALOG_TTL = int(os.getenv("QUEST_CATALOG_TTL", "300"))
+
+# 📋 โหมดกระดาน (REVIEW_MODE=board): ห้องแอดมินมีข้อความเดียวแสดงคิวคำร้องแบบแบ่งหน้า
+# แทนการส่งข้อความใหม่ต่อคำร้องและต่อผลพิจารณา การแก้กระดานถูก debounce/รวมเป็นครั้งเดียว
+REVIEW_MODE = os.getenv("REVIEW_MODE", "messages")
+
+# ✅ สถานะแยกต่อกิลด์ (ดู guilds.Guild): สำเนาชีท, ค่าตั้ง, แคชเควส, ดัชนี Role, คำร้อง, journal, ผลพิจารณา, สถิติ
+# ทั้งหมดอ่านจาก SQLite ของกิลด์ตอนเริ่ม ไม่มี network I/O
+GUILDS = {
+    settings.guild_id: Guild(
+        settings,
+        catalog_ttl=CATALOG_TTL,
+        pending_ttl=float(os.getenv("PENDING_TTL", "86400")),
+        review_board=REVIEW_MODE == "board"
+    )
+    for settings in GUILD_SETTINGS
+}
+for _guild in GUILDS.values():
+    if _guild.journal.backlog():
+        log.info("🔄 กิลด์ %s มีผลพิจารณาที่ยังไม่ได้ส่งขึ้นชีท %s รายการ จะส่งต่อให้อัตโนมัติ", _guild.id, _guild.journal.backlog())
+
+# ✅ ลงทะเบียนคำสั่ง slash แยกทุกกิลด์ (sync รายกิลด์เร็วกว่าคำสั่ง global)
+COMMAND_GUILDS = [discord.Object(id=guild_id) for guild_id in GUILDS]
+
+
+def guild_state(guild_id):
+    # คืน None ถ้าเป็นกิลด์ที่ไม่ได้ตั้งค่าไว้ (หรือเป็น DM)
+    return GUILDS.get(guild_id)
+
+
+def interaction_guild(interaction):
+    # คำสั่ง slash ลงทะเบียนเฉพาะกิลด์ใน GUILDS จึงหาเจอเสมอ
+    return GUILDS[interaction.guild_id]
+
+
+def connect_sheets(guild):
+    # เป็น HTTP แบบ blocking ต้องเรียกผ่าน SHEETS.call เท่านั้น
+    guild.connect(SHEETS_POOL)
+
+
+# ✅ แคช Member (gateway → TTL/LRU → REST) ลดการเรียก guild.fetch_member คีย์เป็น (กิลด์, ผู้ใช้) ใช้ร่วมทุกกิลด์
+# ใช้กับ DM ผลพิจารณา งานแก้ Role ดึงสดด้วย MEMBERS.fetch (Member ในแคชอาจมี Role เก่า)
+MEMBERS = MemberResolver(ttl=int(os.getenv("MEMBER_CACHE_TTL", "300")))
+
+# 🛑 จำกัดความถี่การส่งต่อผู้ใช้ (รวมทุกกิลด์) ส่วนกันส่งคำร้องซ้ำอยู่ใน Guild.pending
+THROTTLE = UserThrottle(
+    burst=int(os.getenv("SUBMIT_BURST", "3")),
+    interval=float(os.getenv("SUBMIT_INTERVAL", "20"))
+)
+SUBMISSIONS_REJECTED = metrics.Counter(
+    "deena_submissions_rejected_total", "Submissions refused before reaching the admin channel", ("reason",)
+)
+
+# 🏗️ PROCESS_MODE=gateway: โปรเซสนี้แค่ตอบ interaction และบันทึกลง SQLite ส่วนงานช้า
+# (ส่ง journal ขึ้นชีท, แก้ Role, DM) ให้ worker.py ทำจากคิว JOBS (รันได้หลายโปรเซส)
+# ค่าเริ่มต้น single = ทำทุกอย่างในโปรเซสเดียวเหมือนเดิม
+PROCESS_MODE = os.getenv("PROCESS_MODE", "single")
+JOBS = JobQueue(storage.connect()) if PROCESS_MODE == "gateway" else None
+
 TOKEN = os.getenv("DISCORD_TOKEN")
 
+JOURNAL_BACKLOG_LIMIT = int(os.getenv("JOURNAL_BACKLOG_LIMIT", "500"))
+
+
+def readiness():
+    # 🩺 สถานะสำหรับ /readyz (แยกรายกิลด์ ทุกกิลด์ต้องพร้อมจึงถือว่าพร้อม)
+    guilds = {
+        str(guild.id): {
+            "quest_catalog": guild.catalog.loaded,
+            "serving_snapshot": guild.catalog.from_snapshot,
+            "sheets_connected": guild.spreadsheet is not None,
+            "journal_backlog": guild.journal.backlog(),
+            "pending_submissions": guild.submissions.pending_count(),
+        }
+        for guild in GUILDS.values()
+    }
+    return {
+        "checks": {
+            "gateway": bot.is_ready() and not bot.is_closed(),
+            "quest_catalog": all(g["quest_catalog"] for g in guilds.values()),
+            "journal_backlog": all(g["journal_backlog"] < JOURNAL_BACKLOG_LIMIT for g in guilds.values()),
+        },
+        "sheets_breaker": SHEETS.breaker.state,
+        "sheets_pool": SHEETS_POOL.stats(),
+        "startup": STARTUP.summary(),
+        "gateway_latency": bot.latency if bot.is_ready() else None,
+        "shards": bot.shard_count,
+        "guilds": guilds,
+        "process_mode": PROCESS_MODE,
+        "jobs": JOBS.counts() if JOBS is not None else None,
+    }
+
+
+def apply_config(guild, config):
+    # 🔄 หัวข้อและกฎแทนที่ Role มีผลทันที ส่วนเควส/Role จากค่าตั้งใช้เมื่อยังไม่ได้อ่านจากชีทจริงเท่านั้น
+    # (ข้อมูลชีทล่าสุดชนะเสมอ) ทุกอย่างอ่านจาก SQLite/ไฟล์ในเครื่อง ปุ่ม/ค้นหาใช้ได้ตั้งแต่ล็อกอินเสร็จ
+    catalog, role_index = guild.catalog, guild.role_index
+    catalog.set_sheets(config.topic_names)
+    role_index.set_rules(config.supersede)
+    if config.quests is not None and (not catalog.loaded or catalog.from_snapshot):
+        catalog.restore(config.quests)
+        log.info("💾 กิลด์ %s ใช้รายการเควสจาก %s (%s รายการ)", guild.id, config.source, catalog.stats()['quests'])
+    if config.roles is not None and (not role_index.loaded or role_index.from_snapshot):
+        role_index.restore(dict(config.roles))
+        log.info("💾 กิลด์ %s ใช้ดัชนี Role จาก %s (%s รายการ)", guild.id, config.source, role_index.stats()['quests'])
+
+
+async def reload_config(guild):
+    # ⚙️ ตรวจไฟล์ใหม่ทั้งหมดก่อน ถ้าผิดจะ raise โดยค่าเดิมยังใช้งานต่อ
+    # ปุ่มหัวข้อเป็น dynamic item (SheetButton) หัวข้อใหม่กดได้ทันทีโดยไม่ต้องลงทะเบียน view ใหม่
+    config = guild.config.load()
+    apply_config(guild, config)
+    if bot.published:
+        await publish_panel(guild)  # แก้ panel เฉพาะเมื่อหัวข้อ/label เปลี่ยนจริง
+    log.info("⚙️ กิลด์ %s โหลดค่าตั้งใหม่จาก %s", guild.id, config.source, extra={"fields": config.stats()})
+    return config
+
+
+def stage_name(name, guild):
+    # ชื่อขั้นตอนใน STARTUP: บอทกิลด์เดียวใช้ชื่อเดิม หลายกิลด์ต่อท้ายด้วย guild id
+    return name if len(GUILDS) == 1 else f"{name}:{guild.id}"
+
+
+async def warm_up_sheets(guild):
+    # 🚀 เชื่อม Google → โหลดรายการเควสและดัชนี Role พร้อมกัน (ทำงานคู่กับการล็อกอิน gateway)
+    # open_by_key + worksheet = 2 คำขอ, ดัชนี Role = worksheets + batchGet = 2 คำขอ
+    await STARTUP.stage(stage_name("sheets_connect", guild), SHEETS.call(connect_sheets, guild, cost=2))
+    catalog, roles, decisions = await asyncio.gather(
+        STARTUP.stage(stage_name("quest_catalog", guild), SHEETS.call(reload_catalog, guild, priority=PRIORITY_REFRESH)),
+        STARTUP.stage(stage_name("role_index", guild), SHEETS.call(reload_role_index, guild, priority=PRIORITY_REFRESH, cost=2)),
+        STARTUP.stage(stage_name("decision_sync", guild), SHEETS.call(sync_decision_log, guild, priority=PRIORITY_REFRESH)),
+        return_exceptions=True
+    )
+    if isinstance(catalog, Exception):
+        log.warning("❗ กิลด์ %s โหลดรายการเควสจากชีทไม่สำเร็จ: %s", guild.id, catalog)
+    else:
+        log.info("✅ กิลด์ %s โหลดรายการเควส %s รายการจาก %s ชีท", guild.id, guild.catalog.stats()['quests'], len(guild.catalog.sheet_names))
+    if isinstance(roles, Exception):
+        log.warning("❗ กิลด์ %s สร้างดัชนี Role ไม่สำเร็จ: %s", guild.id, roles)
+    else:
+        log.info("✅ กิลด์ %s ดัชนี Role %s รายการ", guild.id, guild.role_index.stats()['quests'])
+    if isinstance(decisions, Exception):
+        log.warning("❗ กิลด์ %s ซิงก์ผลพิจารณาจากชีท log ไม่สำเร็จ: %s", guild.id, decisions)
+    else:
+        log.info("✅ กิลด์ %s ซิงก์ผลพิจารณาจากชีท log ถึงแถว %s (ใหม่ %s รายการ)", guild.id, guild.decisions.log_row, decisions)
+
+
+async def connect_guild(guild):
+    try:
+        await warm_up_sheets(guild)
+    except Exception as e:
+        # ❗ ไม่ทำให้บอทล่ม: ให้บริการจากสำเนาต่อไป แล้ว refresh_catalog จะลองเชื่อมใหม่
+        log.warning("❗ กิลด์ %s เชื่อม Google Sheet ไม่สำเร็จ จะลองใหม่อัตโนมัติ: %s", guild.id, e)
+
+
+async def startup():
+    try:
+        # ทุกกิลด์เชื่อมพร้อมกัน (คิวโควตาของ SHEETS เป็นตัวกำหนดจังหวะ) กิลด์ที่ล่มไม่ขวางกิลด์อื่น
+        await asyncio.gather(*(connect_guild(guild) for guild in GUILDS.values()))
+    finally:
+        STARTUP.finish()
+        summary = STARTUP.summary()
+        log.info("🚀 เริ่มระบบเสร็จใน %s วินาที", summary["total_seconds"], extra={"fields": summary["stages"]})
+
+
+# 🧩 AUTO_SHARD=1: ใช้ AutoShardedBot (Discord กำหนดจำนวน shard) เมื่อบอทอยู่หลายกิลด์จนเกินขีดของ shard เดียว
+AUTO_SHARD = os.getenv("AUTO_SHARD", "0") == "1"
+
+
+class DeenaBot(commands.AutoShardedBot if AUTO_SHARD else commands.Bot):
+    web_runner = None
+    startup_task = None
+    published = False  # sync คำสั่ง + ส่ง panel แล้วในโปรเซสนี้
+
+    async def setup_hook(self):
+        started = time.perf_counter()
+        for guild in GUILDS.values():
+            apply_config(guild, guild.config.load())
+            guild.pending.load(guild.submissions.pending_keys())
+        STARTUP.record("config_load", time.perf_counter() - started)
+        started = time.perf_counter()
+        for guild in GUILDS.values():
+            guild.stats.rebuild(guild.decisions.iter_for_stats())
+        STARTUP.record("stats_rebuild", time.perf_counter() - started)
+        # ✅ health server รันใน event loop ของบอท และปิดพร้อมบอท
+        self.web_runner = await server_on(readiness, port=int(os.getenv("PORT", "8080")))
+        # 🚀 ไม่ await: setup_hook ต้องจบก่อนบอทจะเริ่มเชื่อม gateway
+        self.startup_task = asyncio.create_task(startup(), name="startup")
+        refresh_catalog.start()
+        if JOBS is None:
+            flush_journal.start()  # โหมด gateway: worker เป็นผู้ส่ง journal ขึ้นชีท
+        sync_decisions.start()
+        if any(guild.settings.stats_channel_id for guild in GUILDS.values()):
+            refresh_stats_board.start()
+
+    async def close(self):
+        refresh_catalog.cancel()
+        flush_journal.cancel()
+        sync_decisions.cancel()
+        refresh_stats_board.cancel()
+        for guild in GUILDS.values():
+            if guild.board_updates is not None:
+                guild.board_updates.cancel()
+        # ส่ง DM ที่รอรวมอยู่ให้หมดก่อนตัดการเชื่อมต่อ
+        await NOTIFIER.flush()
+        if self.startup_task:
+            self.startup_task.cancel()
+        if JOBS is None:
+            for guild in GUILDS.values():
+                if guild.sheet is None:
+                    continue
+                try:
+                    # ส่ง journal ที่ค้างขึ้นชีทเป็นครั้งสุดท้าย (ที่ส่งไม่ทันจะถูกส่งต่อตอนเปิดรอบหน้า)
+                    await guild.journal.flush(SHEETS, guild.sheet)
+                except Exception as e:
+                    log.warning(
+                        "❗ กิลด์ %s ส่งผลพิจารณาขึ้นชีทก่อนปิดไม่สำเร็จ (ค้าง %s รายการ): %s",
+                        guild.id, guild.journal.backlog(), e
+                    )
+        if self.web_runner:
+            await self.web_runner.cleanup()
+        await super().close()
+        SHEETS.shutdown()
+
+
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix="!", intents=intents)
+bot = DeenaBot(command_prefix="!", intents=intents)
+
+
+def per_guild(read):
+    # 📊 ค่าของทุกกิลด์ในรูป {(guild id,): ค่า} สำหรับ Gauge ที่มี label guild
+    return lambda: {(str(guild.id),): read(guild) for guild in GUILDS.values()}
+
+
+# 📊 ตัววัดสถานะบอท อ่านตอนถูก scrape ที่ /metrics (ไม่มีต้นทุนบน hot path)
+metrics.instrument_discord_http(bot.http)
+metrics.Gauge("deena_gateway_latency_seconds", "Discord gateway heartbeat latency", lambda: bot.latency if bot.is_ready() else None)
+metrics.Gauge("deena_guilds", "Guilds served by this process", lambda: len(GUILDS))
+metrics.Gauge("deena_quest_catalog_quests", "Quests held in the catalog cache", per_guild(lambda g: g.catalog.stats()["quests"]), ("guild",))
+metrics.Gauge(
+    "deena_quest_catalog_age_seconds", "Seconds since the catalog was last loaded",
+    per_guild(lambda g: g.catalog.stats()["age_seconds"]), ("guild",)
+)
+metrics.Gauge(
+    "deena_quest_catalog_from_snapshot", "1 while the catalog is served from the local snapshot",
+    per_guild(lambda g: int(g.catalog.from_snapshot)), ("guild",)
+)
+metrics.Gauge(
+    "deena_sheets_connected", "1 once the guild's spreadsheet is open",
+    per_guild(lambda g: int(g.spreadsheet is not None)), ("guild",)
+)
+metrics.Gauge("deena_sheets_pool_spreadsheets", "Spreadsheets opened through the shared Sheets client", lambda: SHEETS_POOL.stats()["spreadsheets"])
+metrics.Gauge(
+    "deena_quest_catalog_lookups_total", "Catalog lookups by result",
+    lambda: {
+        key: value for guild in GUILDS.values()
+        for key, value in (((str(guild.id), "hit"), guild.catalog.hits), ((str(guild.id), "miss"), guild.catalog.misses))
+    },
+    ("guild", "result"), kind="counter"
+)
+metrics.Gauge(
+    "deena_quest_catalog_refreshes_total", "Catalog refreshes by outcome",
+    lambda: {
+        key: value for guild in GUILDS.values()
+        for key, value in (((str(guild.id), "ok"), guild.catalog.refreshes), ((str(guild.id), "error"), guild.catalog.refresh_errors))
+    },
+    ("guild", "outcome"), kind="counter"
+)
+metrics.Gauge("deena_role_index_quests", "Quests mapped to a role", per_guild(lambda g: g.role_index.stats()["quests"]), ("guild",))
+metrics.Gauge(
+    "deena_member_lookups_total", "Member lookups by source",
+    lambda: {
+        ("gateway",): MEMBERS.gateway_hits, ("cache",): MEMBERS.cache_hits,
+        ("rest",): MEMBERS.rest_calls, ("not_found",): MEMBERS.not_found,
+    },
+    ("source",), kind="counter"
+)
+metrics.Gauge("deena_member_cache_size", "Members held in the TTL/LRU cache", lambda: MEMBERS.stats()["size"])
+metrics.Gauge(
+    "deena_journal_backlog", "Decisions journaled locally but not yet written to Sheets",
+    per_guild(lambda g: g.journal.backlog()), ("guild",)
+)
+metrics.Gauge(
+    "deena_journal_flushed_total", "Decisions written to the log sheet",
+    per_guild(lambda g: g.journal.flushed), ("guild",), kind="counter"
+)
+metrics.Gauge(
+    "deena_pending_submissions", "Submissions waiting for review",
+    per_guild(lambda g: g.submissions.pending_count()), ("guild",)
+)
+metrics.Gauge(
+    "deena_pending_index_size", "Entries in the in-memory duplicate-submission index",
+    per_guild(lambda g: len(g.pending)), ("guild",)
+)
+metrics.Gauge("deena_submit_throttle_users", "Users tracked by the submission throttle", lambda: len(THROTTLE))
+metrics.Gauge("deena_job_backlog", "Jobs waiting for or held by a worker (gateway mode)", lambda: JOBS.backlog() if JOBS is not None else None)
+metrics.Gauge("deena_dm_queued", "Decisions waiting to be merged into a result DM", lambda: NOTIFIER.queued())
+metrics.Gauge("deena_dm_failures", "Result DMs recorded as undeliverable", lambda: NOTIFIER.failure_count())
+metrics.Gauge("deena_background_tasks", "Background tasks still running", fast_ack.pending_tasks)
+metrics.Gauge("deena_sheets_in_flight", "Sheets calls currently running", lambda: SHEETS.in_flight)
+metrics.Gauge(
+    "deena_sheets_quota_tokens", "Sheets quota tokens currently available",
+    lambda: {("read",): SHEETS.read_quota.available(), ("write",): SHEETS.write_quota.available()}, ("quota",)
+)
+metrics.Gauge(
+    "deena_sheets_quota_waiting", "Sheets calls queued for a quota token",
+    lambda: {("read",): SHEETS.read_quota.waiting(), ("write",): SHEETS.write_quota.waiting()}, ("quota",)
+)
+metrics.Gauge(
+    "deena_sheets_breaker_open", "1 while the Sheets circuit breaker refuses calls",
+    lambda: int(not SHEETS.healthy)
+)
+metrics.Gauge("deena_sheets_breaker_trips_total", "Times the Sheets circuit breaker opened", lambda: SHEETS.breaker.trips, kind="counter")
 
 # ✅ สร้าง Modal (ฟอร์มกรอกข้อมูล)
 class QuestFormModal(discord.ui.Modal):
@@ -52,7 +421,63 @@ class QuestFormModal(discord.ui.Modal):
         self.add_item(self.player_name)
 
     async def on_submit(self, interaction: discord.Interaction):
-        admin_channel = bot.get_channel(ADMIN_CHANNEL_ID)
+        guild = guild_state(interaction.guild_id)
+        if guild is None:
+            await fast_ack.send_message(interaction, "quest_form", "❗ เซิร์ฟเวอร์นี้ยังไม่ได้ตั้งค่าระบบเควส", ephemeral=True)
+            return
+        # 🛑 ตรวจส่งซ้ำ/ส่งถี่ก่อน (ในหน่วยความจำ ไม่แตะ Sheets หรือห้องแอดมิน)
+        key = guild.pending.key(interaction.user.id, self.sheet_name, self.quest_title)
+        if not guild.pending.claim(key):
+            SUBMISSIONS_REJECTED.inc(reason="duplicate")
+            await fast_ack.send_message(
+                interaction, "quest_form", f"⚠️ คุณส่งเควส `{self.quest_title}` ไปแล้ว กรุณารอผลการพิจารณา", ephemeral=True
+            )
+            return
+        wait = THROTTLE.acquire(interaction.user.id)
+        if wait:
+            guild.pending.release(key)
+            SUBMISSIONS_REJECTED.inc(reason="throttled")
+            await fast_ack.send_message(
+                interaction, "quest_form", f"⏳ ส่งคำร้องถี่เกินไป กรุณารออีก {wait:.0f} วินาที", ephemeral=True
+            )
+            return
+
+        # ✅ ยืนยันกับผู้เล่นก่อน แล้วค่อยส่งคำร้องเข้าห้องแอดมินเบื้องหลัง
+        confirm_embed = discord.Embed(
+            title="📋 ส่งคำร้องเรียบร้อย !",
+            description=("โปรดรอการตอบกลับทางข้อความส่วนตัวของคุณ หากไม่ได้รับการตอบกลับหรือเพิ่มยศต่างๆ กรุณาติดต่อผู้คุมโดยทันที !"),
+            color=discord.Color.blurple()
+        )
+        confirm_embed.add_field(name="📂 หัวข้อเควส", value=self.sheet_name, inline=False)
+        confirm_embed.add_field(name="🎯 รายการเควส", value=self.quest_title, inline=False)
+
+        await fast_ack.send_message(interaction, "quest_form", embed=confirm_embed, ephemeral=True)
+        fast_ack.spawn(self.forward_to_admins(guild, interaction, key), name="quest_form")
+
+    async def forward_to_admins(self, guild, interaction: discord.Interaction, key):
+        try:
+            forwarded = await self._forward_to_admins(guild, interaction)
+        except Exception:
+            guild.pending.release(key)  # ส่งต่อไม่สำเร็จ ให้ผู้เล่นส่งใหม่ได้
+            await self.report_failure(interaction)
+            raise
+        if not forwarded:
+            guild.pending.release(key)
+            await self.report_failure(interaction)
+
+    async def report_failure(self, interaction: discord.Interaction):
+        # ❗ ผู้เล่นได้ข้อความ "ส่งคำร้องเรียบร้อย" ไปแล้ว ต้องบอกว่าคำร้องไม่ถึงแอดมิน ไม่อย่างนั้นจะรอผลที่ไม่มีวันมา
+        try:
+            await interaction.followup.send(
+                f"❌ ส่งคำร้องเควส `{self.quest_title}` ไม่สำเร็จ กรุณาส่งใหม่อีกครั้ง หากยังไม่ได้กรุณาติดต่อผู้คุม",
+                ephemeral=True
+            )
+        except discord.HTTPException as e:
+            log.warning("❗ แจ้งผู้เล่นว่าส่งคำร้องไม่สำเร็จไม่ได้: %s", e)
+
+    async def _forward_to_admins(self, guild, interaction: discord.Interaction):
+        # คืน False ถ้าไม่มีห้องแอดมินให้ส่ง (คำร้องไม่ถูกบันทึก)
+        admin_channel = bot.get_channel(guild.settings.admin_channel_id)
         if admin_channel:
             embed = discord.Embed(
                 title="📥 มีคำร้องส่งเควสใหม่",
@@ -65,94 +490,137 @@ class QuestFormModal(discord.ui.Modal):
                 color=discord.Color.blue()
             )
             discord_user = interaction.user.mention  # 👈 เก็บชื่อ Discord ผู้ส่งเควส
-            view = ApprovalButtons(self.player_name.value, self.sheet_name, self.quest_title, discord_user)
-            await admin_channel.send(embed=embed, view=view)
-
-        confirm_embed = discord.Embed(
-            title="📋 ส่งคำร้องเรียบร้อย !",
-            description=("โปรดรอการตอบกลับทางข้อความส่วนตัวของคุณ หากไม่ได้รับการตอบกลับหรือเพิ่มยศต่างๆ กรุณาติดต่อผู้คุมโดยทันที !"),
-            color=discord.Color.blurple()
-        )
-        confirm_embed.add_field(name="📂 หัวข้อเควส", value=self.sheet_name, inline=False)
-        confirm_embed.add_field(name="🎯 รายการเควส", value=self.quest_title, inline=False)
-
-        await interaction.response.send_message(embed=confirm_embed, ephemeral=True)
+            submission = guild.submissions.create(interaction.user.id, discord_user, self.player_name.value, self.sheet_name, self.quest_title)
+            embed.set_footer(text=f"คำร้อง #{submission.id}")  # ใช้อ้างอิงใน /bulk_approve ids
+            if guild.board is not None:
+                # 📋 โหมดกระดาน: ไม่ส่งข้อความใหม่ แค่สั่งอัปเดตกระดานคิว (รวมหลายคำร้องเป็นการแก้ครั้งเดียว)
+                guild.board_updates.trigger()
+                return True
+            try:
+                message = await admin_channel.send(embed=embed, view=ApprovalButtons(submission.id))
+            except Exception:
+                guild.submissions.discard(submission.id)  # ไม่มีข้อความให้แอดมินกด ไม่ให้ค้างในคิว/ยอดรอพิจารณา
+                raise
+            guild.submissions.set_message(submission.id, admin_channel.id, message.id)
+            return True
+        log.warning("❗ ไม่พบห้องแอดมินของกิลด์ %s คำร้องของ %s (%s) ไม่ถูกส่งต่อ", guild.id, self.player_name.value, self.quest_title)
+        return False
 
 
 
 # 👇 วางต่อจาก QuestFormModal (ก่อน QuestPanelView)
 
 class SheetSelectView(discord.ui.View):
-    def __init__(self):
+    def __init__(self, guild):
         super().__init__(timeout=None)
-        sheets = [
-            "BeginnerQuests",
-            "ProcessQuests",
-            "LaborQuests_Lv1",
-            "LaborQuests_Lv2",
-            "LaborQuests_Lv3",
-            "MOONLOCK Lv.1"
-        ]
-        for sheet_name in sheets:
-            button = SheetButton(sheet_name)
-
-            if sheet_name == "BeginnerQuests":
-                button.row = 0
-            elif sheet_name == "ProcessQuests":
-                button.row = 1
-            elif sheet_name == "MOONLOCK Lv.1":
-                button.row = 2
-            elif sheet_name in ["LaborQuests_Lv1", "LaborQuests_Lv2", "LaborQuests_Lv3"]:
-                button.row = 3  # ✅ อยู่แถวล่างสุด (แนวนอน)
-            self.add_item(button)
-
-
-class SheetButton(discord.ui.Button):
-    def __init__(self, sheet_name: str):
-        # 🔽 กำหนดสีของปุ่มให้สื่อความหมายมากขึ้น
-        if sheet_name == "BeginnerQuests":
-            style = discord.ButtonStyle.primary      # 🔵 เริ่มต้น
-        elif sheet_name == "ProcessQuests":
-            style = discord.ButtonStyle.danger       # 🔴 กระบวนการ (ขั้นท้าทาย)
-        elif "LaborQuests" in sheet_name:
-            style = discord.ButtonStyle.success      # ✅ เควสแรงงาน
-        elif "MOONLOCK Lv.1" in sheet_name:
-            style = discord.ButtonStyle.secondary    # ⚫ เควสพลังงาน
-        else:
-            style = discord.ButtonStyle.primary      # fallback เป็นน้ำเงิน
-
-        # 🏷️ เพิ่มอีโมจิหรือจัด label ให้สะดุดตา (ไม่บังคับ)
-        label = {
-            "BeginnerQuests": "🧭 เควสเริ่มต้น",
-            "ProcessQuests": "⚙️ PROCESS",
-            "LaborQuests_Lv1": "🔧 อาชีพ Lv.1",
-            "LaborQuests_Lv2": "🔨 อาชีพ Lv.2",
-            "LaborQuests_Lv3": "⛏️ อาชีพ Lv.3",
-            "MOONLOCK Lv.1": "🌕 MOONLOCK Lv.1"
-        }.get(sheet_name, sheet_name)
-
-        super().__init__(label=label, style=style, custom_id=f"sheet_{sheet_name}")
-        self.sheet_name = sheet_name
+        # ✅ หัวข้อ, label, สี และแถวของปุ่มมาจากค่าตั้งของกิลด์ เพิ่ม/แก้หัวข้อไม่ต้องแก้โค้ด
+        for topic in guild.config.current.topics:
+            self.add_item(SheetButton(topic))
+        self.stop()  # ปุ่มเป็น dynamic item ไม่ต้องให้ discord.py ถือ View ไว้
 
 
+class SheetButton(discord.ui.DynamicItem[discord.ui.Button], template=r"sheet_(?P<name>.+)"):
+    # ✅ dynamic item: ชื่อหัวข้ออยู่ใน custom_id และหากิลด์จาก interaction panel ของทุกกิลด์ (หัวข้อต่างกันได้)
+    # จึงกดได้ต่อหลังรีสตาร์ทหรือหลังโหลดค่าตั้งใหม่ โดยไม่ต้องลงทะเบียน view ต่อกิลด์
+    def __init__(self, topic):
+        super().__init__(discord.ui.Button(
+            label=topic.label,
+            style=getattr(discord.ButtonStyle, topic.style),
+            custom_id=f"sheet_{topic.name}",
+            row=topic.row
+        ))
+        self.sheet_name = topic.name
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(Topic(match["name"], item.label, "primary", None))
+
     async def callback(self, interaction: discord.Interaction):
-        rows = GC.open_by_key(SHEET_ID).worksheet(self.sheet_name).col_values(1)
-        if len(rows) < 2:
-            await interaction.response.send_message("ไม่มีรายการเควสในชีทนี้", ephemeral=True)
+        guild = guild_state(interaction.guild_id)
+        if guild is None:
+            await fast_ack.send_message(interaction, "sheet_button", "❗ เซิร์ฟเวอร์นี้ยังไม่ได้ตั้งค่าระบบเควส", ephemeral=True)
+            return
+        quests = guild.catalog.get(self.sheet_name)
+        if quests is not None:
+            # ✅ ทางหลัก: ตอบจากแคชได้ทันที
+            await fast_ack.send_message(interaction, "sheet_button", **self.quest_picker(quests))
+            return
+
+        # ❗ แคชไม่มีชีทนี้ (เช่นโหลดตอนเริ่มไม่สำเร็จ) defer ก่อนแล้วค่อยอ่านจากชีทตรงๆ
+        await fast_ack.defer(interaction, "sheet_button", ephemeral=True, thinking=True)
+        if guild.spreadsheet is None:
+            await interaction.followup.send("⏳ ระบบกำลังเชื่อมต่อ Google Sheet กรุณาลองใหม่อีกครั้งในอีกสักครู่", ephemeral=True)
             return
+        try:
+            worksheet = await SHEETS.worksheet(guild.spreadsheet, self.sheet_name)
+            rows = await SHEETS.col_values(worksheet, 1)
+        except SheetsUnavailable:
+            await interaction.followup.send("⏳ Google Sheet ไม่พร้อมใช้งานชั่วคราว กรุณาลองใหม่อีกครั้งในอีกสักครู่", ephemeral=True)
+            return
+        except Exception as e:
+            log.warning("❗ อ่านรายการเควสจากชีท %s ไม่สำเร็จ: %s", self.sheet_name, e)
+            await interaction.followup.send("❌ โหลดรายการเควสไม่สำเร็จ กรุณาลองใหม่อีกครั้ง", ephemeral=True)
+            return
+        quests = [q for q in rows[1:] if q.strip()]
+        guild.catalog.put(self.sheet_name, quests)
+        await interaction.followup.send(**self.quest_picker(quests))
+
+    def quest_picker(self, quests):
+        if not quests:
+            return {"content": "ไม่มีรายการเควสในชีทนี้", "ephemeral": True}
+        view = QuestPickerView(self.sheet_name, quests)
+        return {"content": view.content(), "view": view, "ephemeral": True}
+
+
+# ✅ Select ของ Discord ใส่ได้ 25 ตัวเลือกต่อหน้า เควสที่เกินจึงแบ่งหน้าแทนการตัดทิ้ง
+QUESTS_PER_PAGE = 25
+
+
+class QuestPickerView(discord.ui.View):
+    def __init__(self, sheet_name, quests, page=0):
+        super().__init__()
+        self.sheet_name = sheet_name
+        self.quests = quests
+        self.pages = max(1, -(-len(quests) // QUESTS_PER_PAGE))
+        self.page = max(0, min(page, self.pages - 1))
+
+        self.add_item(QuestDropdown(sheet_name, quests, self.page))
+        if self.pages > 1:
+            self.add_item(QuestPageButton("◀ ก่อนหน้า", self.page - 1, disabled=self.page == 0))
+            self.add_item(QuestPageButton("ถัดไป ▶", self.page + 1, disabled=self.page == self.pages - 1))
+
+    def content(self):
+        text = f"เลือกรายการเควสจากหัวข้อ {self.sheet_name}"
+        if self.pages > 1:
+            text += f" (หน้า {self.page + 1}/{self.pages} · พิมพ์ค้นหาได้ด้วยคำสั่ง /quest)"
+        return text
+
+
+class QuestPageButton(discord.ui.Button):
+    def __init__(self, label, target_page, disabled=False):
+        super().__init__(label=label, style=discord.ButtonStyle.secondary, disabled=disabled, row=1)
+        self.target_page = target_page
+
+    async def callback(self, interaction: discord.Interaction):
+        view = QuestPickerView(self.view.sheet_name, self.view.quests, self.target_page)
+        await fast_ack.edit_message(interaction, "quest_page", content=view.content(), view=view)
 
-        view = discord.ui.View()
-        view.add_item(QuestDropdown(self.sheet_name, rows[1:]))
-        await interaction.response.send_message(f"เลือกรายการเควสจากหัวข้อ {self.sheet_name}", view=view, ephemeral=True)
 
 class QuestDropdown(discord.ui.Select):
-    def __init__(self, sheet_name, options_list):
-        options = [discord.SelectOption(label=opt[:100]) for opt in options_list[:25]]
+    def __init__(self, sheet_name, quests, page=0):
+        start = page * QUESTS_PER_PAGE
+        # value = ลำดับเควสในชีท ตอนเลือกจึงได้ชื่อเต็มแม้ชื่อยาวเกิน 100 ตัวอักษร
+        options = [
+            discord.SelectOption(label=title[:100], value=str(position))
+            for position, title in enumerate(quests[start:start + QUESTS_PER_PAGE], start)
+        ]
         super().__init__(placeholder="เลือกเควสที่ต้องการ", options=options, custom_id=f"dropdown_{sheet_name}")
+        self.sheet_name = sheet_name
+        self.quests = quests
 
     async def callback(self, interaction: discord.Interaction):
-        selected_quest = self.values[0]
-        await interaction.response.send_modal(QuestFormModal(self.custom_id.split("_", 1)[1], selected_quest))
+        selected_quest = self.quests[int(self.values[0])]
+        await fast_ack.send_modal(interaction, "quest_dropdown", QuestFormModal(self.sheet_name, selected_quest))
 
 
 # ✅ ปุ่มที่ใช้แสดง Modal
@@ -162,200 +630,1009 @@ class QuestPanelView(discord.ui.View):
         await interaction.response.send_modal(QuestFormModal(...))  # ต้องส่ง sheet_name ให้ด้วยหรือสร้าง logic แยกกรณี N/A
 
 class ApprovalButtons(discord.ui.View):
-    def __init__(self, player_name, sheet_name, quest_title, submitted_by):
+    # ✅ ปุ่มไม่เก็บ state ในหน่วยความจำ: id คำร้องอยู่ใน custom_id และถูก dispatch ผ่าน
+    # ApproveButton/RejectButton ที่ลงทะเบียนด้วย bot.add_dynamic_items ตอนเริ่มบอท
+    def __init__(self, submission_id):
         super().__init__(timeout=None)
-        self.player_name = player_name
-        self.sheet_name = sheet_name
-        self.quest_title = quest_title
-        self.submitted_by = submitted_by
-
-    @discord.ui.button(label="✅ Approve", style=discord.ButtonStyle.success, custom_id="approve_button")
-    async def approve(self, interaction: discord.Interaction, button: discord.ui.Button):
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        sheet.append_row([
-            timestamp,
-            self.player_name,
-            self.sheet_name,
-            self.quest_title,
-            "อนุมัติ",
-            self.submitted_by
-        ])
+        self.add_item(ApproveButton(submission_id))
+        self.add_item(RejectButton(submission_id))
+        self.stop()  # ไม่ต้องให้ discord.py ถือ View นี้ไว้ต่อข้อความ
 
-        try:
-            spreadsheets = GC.open_by_key(SHEET_ID)
-            worksheets = spreadsheets.worksheets()
-
-            role_id = None
-            for ws in worksheets:
-                if ws.title.startswith("Role_"):
-                    data = ws.get_all_values()
-                    for row in data[1:]:
-                        quest_key = row[0].split("(")[0].strip()
-                        if quest_key == self.quest_title.split("(")[0].strip():
-                            role_id = int(row[1])
-                            break
-                if role_id:
-                    break
-
-            if role_id:
-                guild = interaction.guild
-                role = guild.get_role(role_id)
 
-                try:
-                    user_id = int(self.submitted_by.strip("<@!>"))  # แปลง mention เป็น user_id
-                    member = await guild.fetch_member(user_id)
-                except Exception as e:
-                    print(f"❗ แปลงหรือดึงผู้เล่นล้มเหลว: {e}")
-                    member = None
-
-                if member and role:
-                    # ✅ เงื่อนไขลบ Role เมื่อได้รับ Lv3 เท่านั้น
-                    if self.sheet_name == "LaborQuests_Lv3":
-                        remove_sheets = ["Role_LaborQuests_Lv1", "Role_LaborQuests_Lv2"]
-                        for sheet_title in remove_sheets:
-                            try:
-                                ws = spreadsheets.worksheet(sheet_title)
-                                rows = ws.get_all_values()[1:]
-                                for row in rows:
-                                    try:
-                                        old_role_id = int(row[1])
-                                        old_role = discord.utils.get(guild.roles, id=old_role_id)
-                                        if old_role and old_role in member.roles:
-                                            await member.remove_roles(old_role)
-                                            print(f"🗑 ลบ Role {old_role.name} ออกจาก {member.display_name}")
-                                    except Exception as e:
-                                        print(f"❗ อ่าน Role ID ผิดพลาดจาก {sheet_title}: {e}")
-                            except Exception as e:
-                                print(f"❗ ลบ Role จากชีท {sheet_title} ไม่สำเร็จ: {e}")
-
-                    # ✅ ลบ Role เบื้องต้น No_1 ถึง No_4 ถ้าได้รับ No_5
-                    if self.sheet_name == "BeginnerQuests" and self.quest_title.startswith("No_5"):
-                        try:
-                            ws = spreadsheets.worksheet("Role_Beginner")
-                            rows = ws.get_all_values()[1:]
-                            for row in rows:
-                                quest_label = row[0].split("(")[0].strip()
-                                if quest_label.startswith("No_") and not quest_label.startswith("No_5"):
-                                    try:
-                                        old_role_id = int(row[1])
-                                        old_role = discord.utils.get(guild.roles, id=old_role_id)
-                                        if old_role and old_role in member.roles:
-                                            await member.remove_roles(old_role)
-                                            print(f"🗑 ลบ Role {old_role.name} ออกจาก {member.display_name}")
-                                    except Exception as e:
-                                        print(f"❗ อ่าน Role ID ผิดพลาดใน Role_Beginner: {e}")
-                        except Exception as e:
-                            print(f"❗ ลบ Role จาก Role_Beginner ไม่สำเร็จ: {e}")
-
-                    # ✅ เพิ่ม Role ใหม่
-                    await member.add_roles(role)
-                    print(f"✅ เพิ่ม Role {role.name} ให้ {member.display_name}")
-
-                    # ✅ เพิ่ม Role ใหม่
-                    await member.add_roles(role)
-                    print(f"✅ เพิ่ม Role {role.name} ให้ {member.display_name}")
-                else:
-                    print("❗ ไม่พบสมาชิกหรือ Role")
+async def claim_submission(interaction, submission_id, status, handler):
+    # ✅ ตอบรับทันที (defer) งานหนักทั้งหมดไปทำเบื้องหลังแล้วค่อยแก้ข้อความทีหลัง
+    # เลขคำร้องไม่ซ้ำภายในกิลด์ (SQLite ของกิลด์) จึงหาคำร้องจากกิลด์ของ interaction
+    guild = guild_state(interaction.guild_id)
+    submission = guild.submissions.get(submission_id) if guild else None
+    if submission is None:
+        await fast_ack.send_message(interaction, handler, "❗ ไม่พบคำร้องนี้ในระบบ", ephemeral=True)
+        return None, None
+    if not guild.submissions.decide(submission_id, status, interaction.user.id):
+        await fast_ack.send_message(interaction, handler, "⚠️ คำร้องนี้ถูกพิจารณาไปแล้ว", ephemeral=True)
+        return None, None
+    guild.pending.release(guild.pending.key(submission.user_id, submission.sheet_name, submission.quest_title))
+    await fast_ack.defer(interaction, handler)
+    return guild, submission
+
+
+class ApproveButton(discord.ui.DynamicItem[discord.ui.Button], template=r"approve:(?P<id>[0-9]+)"):
+    def __init__(self, submission_id: int, label="✅ Approve", row=None):
+        super().__init__(discord.ui.Button(
+            label=label, style=discord.ButtonStyle.success, custom_id=f"approve:{submission_id}"
+        ), row=row)
+        self.submission_id = submission_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(int(match["id"]))
+
+    async def callback(self, interaction: discord.Interaction):
+        guild, submission = await claim_submission(interaction, self.submission_id, APPROVED, "approve")
+        if submission:
+            fast_ack.spawn(finish_approve(guild, interaction, submission), name="approve")
+
+
+class RejectButton(discord.ui.DynamicItem[discord.ui.Button], template=r"reject:(?P<id>[0-9]+)"):
+    def __init__(self, submission_id: int, label="❌ Reject", row=None):
+        super().__init__(discord.ui.Button(
+            label=label, style=discord.ButtonStyle.danger, custom_id=f"reject:{submission_id}"
+        ), row=row)
+        self.submission_id = submission_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(int(match["id"]))
+
+    async def callback(self, interaction: discord.Interaction):
+        guild, submission = await claim_submission(interaction, self.submission_id, REJECTED, "reject")
+        if submission:
+            fast_ack.spawn(finish_reject(guild, interaction, submission), name="reject")
+
+
+def record_decision(guild, interaction: discord.Interaction, submission, status):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    guild.journal.append([
+        timestamp,
+        submission.player_name,
+        submission.sheet_name,
+        submission.quest_title,
+        "อนุมัติ" if status == APPROVED else "ไม่อนุมัติ",
+        submission.submitted_by,
+        interaction.user.mention  # 👈 ผู้พิจารณา (ใช้นับสถิติแอดมินตอนสร้างใหม่จากชีท)
+    ])
+    if guild.decisions.record(
+        timestamp, submission.user_id, submission.player_name, submission.sheet_name, submission.quest_title,
+        status, interaction.user.id
+    ):
+        guild.stats.add(submission.user_id, submission.sheet_name, status, interaction.user.id)
+
+
+async def finish_approve(guild, interaction: discord.Interaction, submission):
+    # ⏱️ ทุกขั้นตอนถูกจับเวลาเป็น span ภายใต้ trace id ของ interaction (ดูได้ว่าเวลาหมดไปกับส่วนไหน)
+    with span("approve", submission=submission.id, guild=guild.id):
+        with span("journal_append"):
+            record_decision(guild, interaction, submission, APPROVED)
+        if JOBS is not None:
+            enqueue_role_sync(guild.id, submission.user_id, [submission])
+        else:
+            await grant_quest_role(guild, interaction, submission)
+
+        on_board = is_board_message(guild, interaction)
+        if on_board:
+            guild.board_updates.trigger()
+        else:
+            with span("message_edit"):
+                await interaction.edit_original_response(
+                    content=f"✅ เควสของ {submission.player_name} ({submission.quest_title}) ได้รับการอนุมัติแล้วโดย {interaction.user.mention}",
+                    view=None
+                )
+
+        # ✅ ส่ง DM ไปยังผู้เล่น (เข้าคิวเบื้องหลัง ไม่รอการส่ง)
+        notify_player(interaction, submission, APPROVED)
+
+        # ✅ แจ้งผลไปยังแอดมิน (โหมดกระดานไม่ต้อง: คำร้องหายจากคิวเองเมื่อกระดานอัปเดต)
+        if not on_board:
+            await notify_admins(
+                guild,
+                f"✅ เควสของ **{submission.player_name}**: `{submission.quest_title}` ได้รับการอนุมัติโดย {interaction.user.mention}"
+            )
+
+
+def enqueue_role_sync(guild_id, user_id, submissions):
+    # 📮 โหมด gateway: worker รวมงานของสมาชิกคนเดียวกัน (group_key) แล้วแก้ Role ครั้งเดียว
+    JOBS.enqueue(
+        "role_sync",
+        {"guild_id": guild_id, "user_id": user_id, "quests": [submission.quest_title for submission in submissions]},
+        group_key=f"{guild_id}:{user_id}",
+        dedupe_key=f"role_sync:{guild_id}:{submissions[0].id}"
+    )
+
+
+async def edit_member_roles(guild, user_id, new_roles, reason):
+    # 🎭 ดึง Member สด → คำนวณ Role สุดท้ายตาม role_rules.json → member.edit ครั้งเดียว (ไม่ว่าเพิ่ม/ลบกี่ Role)
+    # ทั้งหมดอยู่ใต้ lock ของ (กิลด์, ผู้ใช้): อนุมัติคนเดียวกันพร้อมกัน คนหลังจะเห็น Role ที่คนแรกเพิ่งเพิ่ม ไม่ทับกัน
+    # คืน (member, Role ที่ถูกลบ) / (member, None) ถ้ามี Role ครบแล้ว / (None, None) ถ้าไม่พบสมาชิก
+    async with MEMBERS.lock(guild.id, user_id):
+        with span("member_fetch"):
+            member = await MEMBERS.fetch(guild, user_id)
+        if member is None:
+            return None, None
+        final_roles = GUILDS[guild.id].role_index.final_roles(member.roles, new_roles)
+        if final_roles is None:
+            return member, None
+        final_ids = {role.id for role in final_roles}
+        removed = [role for role in member.roles if not role.is_default() and role.id not in final_ids]
+        with span("role_edit", roles=len(new_roles), removed=len(removed)):
+            await member.edit(roles=final_roles, reason=reason)
+        return member, removed
+
+
+def quest_roles(guild, quest_titles):
+    # 🎭 Role ของเควสที่ผ่าน ตัด Role ที่ถูก Role อื่นในชุดเดียวกันแทนที่ (เช่นผ่าน Lv.1 และ Lv.2 พร้อมกัน)
+    # guild คือ discord.Guild ดัชนี Role มาจากกิลด์ของมัน
+    role_index = GUILDS[guild.id].role_index
+    roles = {}
+    for quest_title in quest_titles:
+        role_id = role_index.lookup(quest_title)
+        role = guild.get_role(role_id) if role_id else None
+        if role is None:
+            log.warning("❗ ไม่พบ Role ของเควส %s", quest_title)
+            continue
+        roles[role.id] = role
+    superseded = set().union(*(role_index.superseded_by(role_id) for role_id in roles))
+    return [role for role_id, role in roles.items() if role_id not in superseded]
+
+
+async def grant_quest_role(state, interaction: discord.Interaction, submission):
+    try:
+        with span("role_lookup") as fields:
+            role_id = state.role_index.lookup(submission.quest_title)
+            fields["role_id"] = role_id
+
+        if role_id:
+            guild = interaction.guild
+            role = guild.get_role(role_id)
+
+            member = None
+            if role:
+                member, removed = await edit_member_roles(guild, submission.user_id, [role], f"อนุมัติเควส {submission.quest_title}")
+            if member is None:
+                log.warning("❗ ไม่พบสมาชิกหรือ Role")
+            elif removed is None:
+                log.info("ℹ️ %s มี Role %s อยู่แล้ว", member.display_name, role.name)
             else:
-                print("❗ ไม่พบ Role ที่ตรงกับชื่อเควส")
-        except Exception as e:
-            print(f"❌ เกิดข้อผิดพลาดในการเพิ่ม Role: {e}")
+                if removed:
+                    log.info("🗑 ลบ Role %s ออกจาก %s", ', '.join(r.name for r in removed), member.display_name)
+                log.info("✅ เพิ่ม Role %s ให้ %s", role.name, member.display_name)
+        else:
+            log.warning("❗ ไม่พบ Role ที่ตรงกับชื่อเควส")
+    except Exception as e:
+        log.error("❌ เกิดข้อผิดพลาดในการเพิ่ม Role: %s", e, exc_info=True)
 
-        await interaction.message.edit(
-            content=f"✅ เควสของ {self.player_name} ({self.quest_title}) ได้รับการอนุมัติแล้วโดย {interaction.user.mention}",
-            view=None
+
+def result_embed(notices):
+    # 📬 ผลเดียว = ข้อความเดิม หลายผลที่มาติดกันรวมเป็น embed เดียว (สีตามผลรวม)
+    if len(notices) == 1:
+        notice = notices[0]
+        if notice.status == APPROVED:
+            description = f"✅ เควสของคุณ `{notice.quest_title}` ในหัวข้อ `{notice.sheet_name}` ได้รับการอนุมัติแล้ว"
+        else:
+            description = f"❌ เควสของคุณ `{notice.quest_title}` ในหัวข้อ `{notice.sheet_name}` ถูกปฏิเสธ"
+        return discord.Embed(
+            title="📬 ผลการพิจารณาเควส",
+            description=description,
+            color=discord.Color.green() if notice.status == APPROVED else discord.Color.red()
         )
+    statuses = {notice.status for notice in notices}
+    lines = [
+        f"{'✅' if notice.status == APPROVED else '❌'} `{notice.quest_title}` ({notice.sheet_name})"
+        for notice in notices
+    ]
+    return discord.Embed(
+        title=f"📬 ผลการพิจารณาเควส ({len(notices)} รายการ)",
+        description="\n".join(lines),
+        color=discord.Color.green() if statuses == {APPROVED} else
+        discord.Color.red() if statuses == {REJECTED} else discord.Color.gold()
+    )
 
-        # ✅ ส่ง DM ไปยังผู้เล่น
-        try:
-            user_id = int(self.submitted_by.strip("<@!>"))  # แปลง mention เป็น user_id
-            member = await interaction.guild.fetch_member(user_id)
-            if member:
-                embed_dm = discord.Embed(
-                    title="📬 ผลการพิจารณาเควส",
-                    description=f"✅ เควสของคุณ `{self.quest_title}` ในหัวข้อ `{self.sheet_name}` ได้รับการอนุมัติแล้ว",
-                    color=discord.Color.green()
+
+async def deliver_results(user_id, notices):
+    with span("dm", user=user_id, notices=len(notices)):
+        guild = bot.get_guild(notices[0].guild_id)
+        member = await MEMBERS.resolve(guild, user_id) if guild else None
+        if member is None:
+            raise MemberMissing(f"ไม่พบสมาชิก {user_id}")
+        await member.send(embed=result_embed(notices))
+
+
+# 📬 DM ผลพิจารณาส่งเบื้องหลัง: รวมผลของผู้เล่นเดียวกันภายใน DM_MERGE_WINDOW วินาที
+# ส่งพร้อมกันไม่เกิน DM_CONCURRENCY และไม่เกิน DM_PER_MINUTE ต่อนาที (ลดการเปิด DM channel รัวๆ)
+NOTIFIER = DMDispatcher(
+    storage.connect(),
+    deliver_results,
+    window=float(os.getenv("DM_MERGE_WINDOW", "3")),
+    concurrency=int(os.getenv("DM_CONCURRENCY", "2")),
+    per_minute=int(os.getenv("DM_PER_MINUTE", "30")),
+)
+
+
+def notify_player(interaction: discord.Interaction, submission, status):
+    notice = Notice(interaction.guild_id, status, submission.sheet_name, submission.quest_title)
+    if JOBS is not None:
+        # 📮 โหมด gateway: worker รวม DM ของผู้เล่นคนเดียวกันที่ค้างในคิวเป็นข้อความเดียว
+        JOBS.enqueue(
+            "dm", {"user_id": submission.user_id, **notice._asdict()},
+            group_key=str(submission.user_id), dedupe_key=f"dm:{interaction.guild_id}:{submission.id}"
+        )
+        return
+    NOTIFIER.enqueue(submission.user_id, notice)
+
+
+async def notify_admins(guild, content):
+    admin_channel = bot.get_channel(guild.settings.admin_channel_id)
+    if admin_channel:
+        with span("admin_notify"):
+            await admin_channel.send(content)
+
+
+async def finish_reject(guild, interaction: discord.Interaction, submission):
+    with span("reject", submission=submission.id, guild=guild.id):
+        with span("journal_append"):
+            record_decision(guild, interaction, submission, REJECTED)
+
+        on_board = is_board_message(guild, interaction)
+        if on_board:
+            guild.board_updates.trigger()
+        else:
+            with span("message_edit"):
+                await interaction.edit_original_response(
+                    content=f"❌ เควสของ {submission.player_name} ({submission.quest_title}) ถูกปฏิเสธโดย {interaction.user.mention}",
+                    view=None
                 )
-                await member.send(embed=embed_dm)
-        except Exception as e:
-            print(f"❗ ไม่สามารถส่ง DM ให้ผู้เล่นได้: {e}")
+        # ✅ ส่ง DM ไปยังผู้เล่น (เข้าคิวเบื้องหลัง ไม่รอการส่ง)
+        notify_player(interaction, submission, REJECTED)
 
-        # ✅ แจ้งผลไปยังแอดมิน
-        admin_channel = bot.get_channel(ADMIN_CHANNEL_ID)
-        if admin_channel:
-            await admin_channel.send(
-                f"✅ เควสของ **{self.player_name}**: `{self.quest_title}` ได้รับการอนุมัติโดย {interaction.user.mention}"
+        # ✅ แจ้งผลการปฏิเสธเข้าแอดมินแชนแนล
+        if not on_board:
+            await notify_admins(
+                guild,
+                f"❌ เควสของ **{submission.player_name}**: `{submission.quest_title}` ถูกปฏิเสธโดย {interaction.user.mention}"
             )
 
-    @discord.ui.button(label="❌ Reject", style=discord.ButtonStyle.danger, custom_id="reject_button")
-    async def reject(self, interaction: discord.Interaction, button: discord.ui.Button):
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        sheet.append_row([
-            timestamp,
-            self.player_name,
-            self.sheet_name,
-            self.quest_title,
-            "ไม่อนุมัติ",
-            self.submitted_by
-        ])
-
-        await interaction.message.edit(
-            content=f"❌ เควสของ {self.player_name} ({self.quest_title}) ถูกปฏิเสธโดย {interaction.user.mention}",
-            view=None
+
+# 📋 กระดานคิวคำร้อง (REVIEW_MODE=board) แยกกิลด์ละข้อความ อยู่ใน Guild.board
+BOARD_PAGE_SIZE = 4  # แถวละ 1 คำร้อง (อนุมัติ/ปฏิเสธ) + แถวสุดท้ายเป็นปุ่มเปลี่ยนหน้า
+
+
+def is_board_message(guild, interaction):
+    return (
+        guild.board is not None and interaction.message is not None
+        and interaction.message.id == guild.board.message_id
+    )
+
+
+class BoardPageButton(discord.ui.DynamicItem[discord.ui.Button], template=r"board_page:(?P<page>[0-9]+)"):
+    def __init__(self, label, page: int, disabled=False):
+        super().__init__(discord.ui.Button(
+            label=label, style=discord.ButtonStyle.secondary, custom_id=f"board_page:{page}", disabled=disabled
+        ), row=BOARD_PAGE_SIZE)
+        self.page = page
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(item.label, int(match["page"]))
+
+    async def callback(self, interaction: discord.Interaction):
+        # เปลี่ยนหน้าด้วยการตอบ interaction (edit_message) ไม่มีการเรียก REST เพิ่ม
+        guild = guild_state(interaction.guild_id)
+        if guild is None or guild.board is None:
+            # กิลด์/โหมดกระดานถูกปิดไปแล้ว (ข้อความกระดานเก่า) ต้องตอบ interaction เสมอ ไม่อย่างนั้นแอดมินเห็น "This interaction failed"
+            await fast_ack.send_message(interaction, "board_page", "ℹ️ กระดานคิวนี้ไม่ได้ใช้งานแล้ว", ephemeral=True)
+            return
+        guild.board.page = self.page
+        embed, view = render_board(guild)
+        await fast_ack.edit_message(interaction, "board_page", embed=embed, view=view)
+
+
+def render_board(guild):
+    board = guild.board
+    total = guild.submissions.pending_count()
+    pages = max(1, -(-total // BOARD_PAGE_SIZE))
+    board.page = max(0, min(board.page, pages - 1))
+    submissions = guild.submissions.pending_page(board.page * BOARD_PAGE_SIZE, BOARD_PAGE_SIZE)
+
+    embed = discord.Embed(
+        title=f"📋 คำร้องรอพิจารณา ({total})",
+        description=None if submissions else "✅ ไม่มีคำร้องค้าง",
+        color=discord.Color.blue(),
+        timestamp=discord.utils.utcnow()
+    )
+    view = discord.ui.View(timeout=None)
+    for row, submission in enumerate(submissions):
+        embed.add_field(
+            name=f"#{submission.id} · {submission.sheet_name}",
+            value=(
+                f"👤 ชื่อนักโทษ: **{submission.player_name}**\n"
+                f"🙋‍♂️ ผู้ส่ง: {submission.submitted_by}\n"
+                f"🎯 เควส: {submission.quest_title}\n"
+                f"🕒 <t:{int(submission.created_at)}:R>"
+            ),
+            inline=False
+        )
+        view.add_item(ApproveButton(submission.id, label=f"✅ #{submission.id}", row=row))
+        view.add_item(RejectButton(submission.id, label=f"❌ #{submission.id}", row=row))
+    if pages > 1:
+        embed.set_footer(text=f"หน้า {board.page + 1}/{pages}")
+        view.add_item(BoardPageButton("◀ ก่อนหน้า", max(board.page - 1, 0), disabled=board.page == 0))
+        view.add_item(BoardPageButton("ถัดไป ▶", board.page + 1, disabled=board.page == pages - 1))
+    view.stop()  # ทุกปุ่มเป็น dynamic item ไม่ต้องให้ discord.py ถือ View ไว้
+    return embed, view
+
+
+async def publish_board(guild):
+    channel = bot.get_channel(guild.settings.admin_channel_id)
+    if channel is None:
+        log.warning("❗ ไม่พบห้องแอดมินของกิลด์ %s ไม่สามารถแสดงกระดานคำร้องได้", guild.id)
+        return
+    embed, view = render_board(guild)
+    with span("board_edit", guild=guild.id):
+        await guild.board.upsert(channel, embed=embed, view=view)
+
+
+for _guild in GUILDS.values():
+    if _guild.board is not None:
+        _guild.board_updates = Debouncer(
+            functools.update_wrapper(functools.partial(publish_board, _guild), publish_board),
+            delay=float(os.getenv("BOARD_DEBOUNCE", "2")),
+            min_interval=float(os.getenv("BOARD_MIN_INTERVAL", "5"))
         )
-        # ✅ ส่ง DM ไปยังผู้เล่น
+
+
+# ✅ ลงทะเบียนปุ่มแบบ dynamic: ปุ่มของคำร้องเก่าและ panel ของทุกกิลด์ใช้ได้ต่อหลังรีสตาร์ท
+bot.add_dynamic_items(SheetButton, ApproveButton, RejectButton, BoardPageButton)
+
+
+def reload_catalog(guild):
+    # รันผ่าน SHEETS.call เพราะ gspread เป็น HTTP แบบ blocking
+    quests = guild.catalog.load(guild.spreadsheet)
+    guild.snapshots.save("quest_catalog", quests)
+    return quests
+
+
+def reload_role_index(guild):
+    if guild.role_index.rebuild(guild.spreadsheet):
+        guild.snapshots.save("role_sheets", guild.role_index.snapshot())
+        log.info("🔄 กิลด์ %s ชีท Role เปลี่ยน สร้างดัชนีใหม่ (%s รายการ)", guild.id, guild.role_index.stats()['quests'])
+
+
+async def refresh_guild(guild):
+    if guild.config.changed():
         try:
-            user_id = int(self.submitted_by.strip("<@!>"))  # แปลง mention เป็น user_id
-            member = await interaction.guild.fetch_member(user_id)
-            if member:
-                embed_dm = discord.Embed(
-                    title="📬 ผลการพิจารณาเควส",
-                    description=f"❌ เควสของคุณ `{self.quest_title}` ในหัวข้อ `{self.sheet_name}` ถูกปฏิเสธ",
-                    color=discord.Color.red()
-                )
-                await member.send(embed=embed_dm)
+            await reload_config(guild)
         except Exception as e:
-            print(f"❗ ไม่สามารถส่ง DM ให้ผู้เล่นได้: {e}")
+            log.warning("❗ ไฟล์ตั้งค่าของกิลด์ %s ไม่ถูกต้อง ยังใช้ค่าเดิม: %s", guild.id, e)
+    if guild.spreadsheet is None:
+        # ❗ เชื่อม Google ตอนเริ่มไม่สำเร็จ ลองใหม่ทั้งชุด
+        try:
+            await warm_up_sheets(guild)
+        except Exception as e:
+            log.warning("❗ กิลด์ %s เชื่อม Google Sheet ไม่สำเร็จ: %s", guild.id, e)
+        return
+    if not guild.catalog.is_stale():
+        return
+    if not SHEETS.healthy:
+        return  # 💾 วงจรเปิดอยู่: ใช้รายการเควส/ดัชนี Role ในแคชไปก่อน
+    try:
+        await SHEETS.call(reload_catalog, guild, priority=PRIORITY_REFRESH)
+    except Exception as e:
+        log.warning("❗ กิลด์ %s รีเฟรชรายการเควสไม่สำเร็จ: %s", guild.id, e)
+    try:
+        await SHEETS.call(reload_role_index, guild, priority=PRIORITY_REFRESH, cost=2)
+    except Exception as e:
+        log.warning("❗ กิลด์ %s สร้างดัชนี Role ใหม่ไม่สำเร็จ: %s", guild.id, e)
 
-    # ✅ แจ้งผลการปฏิเสธเข้าแอดมินแชนแนล
-        admin_channel = bot.get_channel(ADMIN_CHANNEL_ID)
-        if admin_channel:
-            await admin_channel.send(
-                f"❌ เควสของ **{self.player_name}**: `{self.quest_title}` ถูกปฏิเสธโดย {interaction.user.mention}"
-        )
 
-        
-# ✅ Sync Slash Command
-GUILD_ID = 1360583634481975327  # ← ใส่ Server ID ของคุณตรงนี้
-CHANNEL_ID = 1374778866903814214  # 👈 แก้เป็น ID ของห้องจริงใน Discord
-ADMIN_CHANNEL_ID = 1368302479841693786  # 👈 เปลี่ยนเป็นห้องแอดมินจริง
+# 🔄 รีเฟรชแคชเควสและดัชนี Role เบื้องหลังเมื่อครบ TTL (ทุกกิลด์พร้อมกัน คิวโควตาของ SHEETS คุมจังหวะ)
+@tasks.loop(seconds=60)
+async def refresh_catalog():
+    if bot.startup_task and not bot.startup_task.done():
+        return
+    await asyncio.gather(*(refresh_guild(guild) for guild in GUILDS.values()))
 
-@bot.event
-async def on_ready():
-    print(f"ล็อกอินสำเร็จ: {bot.user}")
+
+async def flush_guild_journal(guild):
+    if guild.sheet is None or not guild.journal.backlog():
+        return  # ยังเชื่อม Google ไม่เสร็จ เก็บไว้ในไฟล์ก่อน
     try:
-        synced = await bot.tree.sync(guild=discord.Object(id=GUILD_ID))
-        print(f"✅ Slash commands synced to guild: {GUILD_ID} ({len(synced)} คำสั่ง)")
+        # ผลพิจารณาหลายรายการถูกส่งรวมเป็นชุด span นี้จึงไม่ผูกกับ interaction ใด (นับจำนวนแถวแทน)
+        with span("sheets_append", guild=guild.id) as fields:
+            flushed = fields["rows"] = await guild.journal.flush(SHEETS, guild.sheet)
+        if flushed:
+            log.info("📤 กิลด์ %s ส่งผลพิจารณาขึ้นชีท %s รายการ", guild.id, flushed)
+    except Exception as e:
+        log.warning("❗ กิลด์ %s ส่งผลพิจารณาขึ้นชีทไม่สำเร็จ (ค้าง %s รายการ): %s", guild.id, guild.journal.backlog(), e)
 
-        # ✅ ส่งปุ่มพร้อม embed เมื่อบอทออนไลน์
-        channel = bot.get_channel(CHANNEL_ID)
-        if channel:
-            view = SheetSelectView()
-            embed = discord.Embed(
-                title="ระบบจัดการภารกิจ DEENA",
-                description=("เลือกหัวข้อภารกิจที่ต้องการส่งคำร้องด้านล่างนี้\n"
-                    "เมื่อทำการส่งคำร้องแล้ว ผู้คุมจะทำการตรวจสอบความถูกต้อง\n"
-                    "หลังจากนั้นจะได้รับผลการพิจารณาทางข้อความส่วนตัวของคุณ"
-                ),
-                color=discord.Color.blurple()
+
+# 📤 ส่งผลพิจารณาที่ค้างในไฟล์ขึ้นชีท log ของแต่ละกิลด์ด้วย append_rows ครั้งละชุด
+@tasks.loop(seconds=float(os.getenv("JOURNAL_FLUSH_INTERVAL", "5")))
+async def flush_journal():
+    if not SHEETS.healthy:
+        return  # วงจรเปิดอยู่ เก็บไว้ในไฟล์ก่อน
+    await asyncio.gather(*(flush_guild_journal(guild) for guild in GUILDS.values()))
+
+
+def sync_decision_log(guild):
+    # รันผ่าน SHEETS.call (blocking) ผลที่เพิ่งเห็นครั้งแรกนับเข้าสถิติด้วย
+    added = guild.decisions.sync(guild.sheet)
+    for decided_at, user_id, player_name, sheet_name, quest_title, status, reviewer_id in added:
+        guild.stats.add(user_id, sheet_name, status, reviewer_id)
+    return len(added)
+
+
+# 🔄 ดึงแถวใหม่จากชีท log (เช่นที่แอดมินเพิ่มเอง) เข้าฐานข้อมูลในเครื่อง อ่านเฉพาะส่วนที่ยังไม่เคยเห็น
+@tasks.loop(seconds=float(os.getenv("DECISION_SYNC_INTERVAL", "300")))
+async def sync_decisions():
+    if not SHEETS.healthy:
+        return
+    if bot.startup_task and not bot.startup_task.done():
+        return  # warm_up_sheets ซิงก์รอบแรกให้แล้ว
+    for guild in GUILDS.values():
+        if guild.sheet is None:
+            continue
+        try:
+            added = await SHEETS.call(sync_decision_log, guild, priority=PRIORITY_REFRESH)
+            if added:
+                log.info("🔄 กิลด์ %s ซิงก์ผลพิจารณาจากชีท log เพิ่ม %s รายการ", guild.id, added)
+        except Exception as e:
+            log.warning("❗ กิลด์ %s ซิงก์ผลพิจารณาจากชีท log ไม่สำเร็จ: %s", guild.id, e)
+
+
+def _ratio(stats, counts):
+    rate = stats.approval_rate(counts)
+    return "-" if rate is None else f"{rate * 100:.0f}%"
+
+
+def stats_embed(guild):
+    # 📊 สรุปสถิติทั้งหมดของกิลด์จากตัวนับในหน่วยความจำ (ไม่อ่านชีท)
+    stats = guild.stats
+    totals = stats.totals
+    embed = discord.Embed(
+        title="📊 สถิติการส่งเควส",
+        description=(
+            f"✅ อนุมัติ {totals[APPROVED]} | ❌ ปฏิเสธ {totals[REJECTED]} | อัตราอนุมัติ {_ratio(stats, totals)}\n"
+            f"⏳ รอพิจารณา {guild.submissions.pending_count()}"
+        ),
+        color=discord.Color.gold(),
+        timestamp=discord.utils.utcnow()
+    )
+    topics = stats.topics()
+    topic_names = guild.config.current.topic_names
+    for sheet_name in [*topic_names, *sorted(set(topics) - set(topic_names))]:
+        counts = topics.get(sheet_name)
+        if counts:
+            embed.add_field(
+                name=f"📂 {sheet_name}",
+                value=f"✅ {counts[APPROVED]} | ❌ {counts[REJECTED]} | {_ratio(stats, counts)}",
+                inline=True
             )
-            await channel.send(embed=embed, view=view)
+    players = stats.top_players(10)
+    if players:
+        embed.add_field(
+            name="🏆 ผู้เล่นที่ผ่านเควสมากที่สุด",
+            value="\n".join(f"{rank}. <@{user_id}> — {count} เควส" for rank, (user_id, count) in enumerate(players, 1)),
+            inline=False
+        )
+    reviewers = stats.top_reviewers(5)
+    if reviewers:
+        embed.add_field(
+            name="🛡️ ผู้คุมที่พิจารณามากที่สุด",
+            value="\n".join(f"{rank}. <@{user_id}> — {count} คำร้อง" for rank, (user_id, count) in enumerate(reviewers, 1)),
+            inline=False
+        )
+    return embed
+
+
+# 📊 กระดานสถิติในห้อง stats_channel_id ของแต่ละกิลด์: แก้ข้อความเดิม (ไม่โพสต์ใหม่) และข้ามถ้าตัวเลขไม่เปลี่ยน
+@tasks.loop(seconds=float(os.getenv("STATS_BOARD_INTERVAL", "300")))
+async def refresh_stats_board():
+    for guild in GUILDS.values():
+        if guild.stats.version == guild.stats_board_version:
+            continue
+        channel = bot.get_channel(guild.settings.stats_channel_id)
+        if channel is None:
+            continue
+        try:
+            version = guild.stats.version
+            await guild.stats_board.upsert(channel, embed=stats_embed(guild))
+            guild.stats_board_version = version
+        except Exception as e:
+            log.warning("❗ กิลด์ %s อัปเดตกระดานสถิติไม่สำเร็จ: %s", guild.id, e)
+
+
+@refresh_stats_board.before_loop
+async def before_refresh_stats_board():
+    await bot.wait_until_ready()
+
+
+def progress_embed(guild, user, progress, pending):
+    # ✅ สรุปความคืบหน้าของผู้เล่น: เควสที่ผ่านแยกตามหัวข้อ + ที่รอพิจารณา + ที่ถูกปฏิเสธล่าสุด
+    approved = {}
+    rejected = []
+    for (sheet_name, quest_title), (status, decided_at) in progress.items():
+        if status == APPROVED:
+            approved.setdefault(sheet_name, []).append(quest_title)
         else:
-            print("❗ ไม่พบ Channel ID หรือบอทยังไม่มีสิทธิ์ในห้องนั้น")
+            rejected.append(f"{quest_title} · {sheet_name}")
+
+    embed = discord.Embed(
+        title=f"📜 ความคืบหน้าเควสของ {user.display_name}",
+        description=f"✅ ผ่านแล้ว {sum(len(q) for q in approved.values())} เควส | ⏳ รอพิจารณา {len(pending)} | ❌ ถูกปฏิเสธ {len(rejected)}",
+        color=discord.Color.blurple()
+    )
+    topic_names = guild.config.current.topic_names
+    for sheet_name in [*topic_names, *sorted(set(approved) - set(topic_names))]:
+        if sheet_name in approved:
+            embed.add_field(name=f"✅ {sheet_name}", value=_field_lines(approved[sheet_name]), inline=False)
+    if pending:
+        embed.add_field(
+            name="⏳ รอพิจารณา", value=_field_lines(f"{s.quest_title} · {s.sheet_name}" for s in pending), inline=False
+        )
+    if rejected:
+        embed.add_field(name="❌ ถูกปฏิเสธ (ส่งใหม่ได้)", value=_field_lines(rejected), inline=False)
+    return embed
+
+
+def _field_lines(lines, limit=1024):
+    # ค่า field ของ embed ยาวได้ไม่เกิน 1024 ตัวอักษร ส่วนที่เกินสรุปเป็นจำนวน
+    lines = list(lines)
+    text = ""
+    for shown, line in enumerate(lines):
+        more = f"\n… และอีก {len(lines) - shown} รายการ"
+        if len(text) + len(line) + 1 + len(more) > limit:
+            return text + more
+        text += ("\n" if text else "") + line
+    return text
+
 
+def format_catalog_stats(guild):
+    stats = guild.catalog.stats()
+    age = "-" if stats["age_seconds"] is None else f"{stats['age_seconds']:.0f} วินาที"
+    return (
+        f"📂 ชีท: {stats['sheets']} | 🎯 เควส: {stats['quests']}\n"
+        f"✅ hit: {stats['hits']} | ❗ miss: {stats['misses']}\n"
+        f"🔄 refresh: {stats['refreshes']} (ล้มเหลว {stats['refresh_errors']}) | อายุแคช: {age}"
+        f"{' 💾 (จากสำเนาในเครื่อง)' if stats['from_snapshot'] else ''}\n"
+        f"🏷️ ดัชนี Role: {guild.role_index.stats()['quests']} รายการ (สร้างใหม่ {guild.role_index.rebuilds} ครั้ง)\n"
+        f"⚙️ ค่าตั้ง: {guild.config.current.source} ({len(guild.config.current.topics)} หัวข้อ, โหลด {guild.config.reloads} ครั้ง)\n"
+        f"🚦 Sheets: วงจร {SHEETS.breaker.state} (ตัด {SHEETS.breaker.trips} ครั้ง) | "
+        f"โควตาอ่าน {SHEETS.read_quota.available():.0f} เขียน {SHEETS.write_quota.available():.0f} "
+        f"(ใช้ร่วม {len(GUILDS)} กิลด์, เปิดสเปรดชีต {SHEETS_POOL.stats()['spreadsheets']} ไฟล์)\n"
+        f"{format_member_stats()}"
+    )
+
+
+def format_member_stats():
+    stats = MEMBERS.stats()
+    rate = "-" if stats["hit_rate"] is None else f"{stats['hit_rate'] * 100:.0f}%"
+    return (
+        f"👥 Member: hit rate {rate} (gateway {stats['gateway_hits']}, แคช {stats['cache_hits']}, "
+        f"REST {stats['rest_calls']}, ไม่พบ {stats['not_found']}) | ขนาดแคช {stats['size']}"
+    )
+
+
+# ✅ คำสั่งแอดมิน: โหลดรายการเควสใหม่ทันที (หลังแก้ไขชีท)
+@bot.tree.command(name="reload_quests", description="โหลดรายการเควสและ Role จาก Google Sheet ใหม่", guilds=COMMAND_GUILDS)
+@app_commands.default_permissions(administrator=True)
+async def reload_quests(interaction: discord.Interaction):
+    guild = interaction_guild(interaction)
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    if guild.spreadsheet is None:
+        await interaction.followup.send("⏳ ยังเชื่อมต่อ Google Sheet ไม่สำเร็จ กรุณาลองใหม่อีกครั้ง", ephemeral=True)
+        return
+    try:
+        await SHEETS.call(reload_catalog, guild)
+        await SHEETS.call(reload_role_index, guild, cost=2)
     except Exception as e:
-        print(f"❌ Error syncing commands: {e}")
+        await interaction.followup.send(f"❌ โหลดรายการเควสไม่สำเร็จ: {e}", ephemeral=True)
+        return
+    await interaction.followup.send(f"✅ โหลดรายการเควสใหม่แล้ว\n{format_catalog_stats(guild)}", ephemeral=True)
+
+
+@bot.tree.command(name="reload_config", description="โหลดไฟล์ตั้งค่าหัวข้อ/เควส/Role ใหม่โดยไม่ต้องรีสตาร์ท", guilds=COMMAND_GUILDS)
+@app_commands.default_permissions(administrator=True)
+async def reload_config_command(interaction: discord.Interaction):
+    guild = interaction_guild(interaction)
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    try:
+        config = await reload_config(guild)
+    except (ConfigError, OSError, ValueError) as e:
+        await interaction.followup.send(f"❌ ค่าตั้งไม่ถูกต้อง (ยังใช้ค่าเดิม): {e}", ephemeral=True)
+        return
+    await interaction.followup.send(f"✅ ใช้ค่าตั้งจาก {config.source} แล้ว\n{format_catalog_stats(guild)}", ephemeral=True)
+
+
+@bot.tree.command(name="export_config", description="ส่งออกหัวข้อ/เควส/Role ปัจจุบันเป็นไฟล์ตั้งค่า", guilds=COMMAND_GUILDS)
+@app_commands.default_permissions(administrator=True)
+async def export_config_command(interaction: discord.Interaction):
+    # 📤 สำเนาจากชีทล่าสุดในหน่วยความจำ ใช้เป็นไฟล์ QUEST_CONFIG ให้บอทเริ่มได้โดยไม่ต้องรอ Google
+    guild = interaction_guild(interaction)
+    exported = export_config(guild.config.current, guild.catalog.snapshot(), guild.role_index.snapshot())
+    data = json.dumps(exported, ensure_ascii=False, indent=2).encode("utf-8")
+    await interaction.response.send_message(
+        "📤 ไฟล์ตั้งค่าปัจจุบัน (ตั้ง QUEST_CONFIG ให้ชี้ไฟล์นี้)",
+        file=discord.File(io.BytesIO(data), filename=f"quest_config-{guild.id}.json"),
+        ephemeral=True
+    )
+
+
+@bot.tree.command(name="quest_cache", description="ดูสถานะแคชรายการเควส", guilds=COMMAND_GUILDS)
+@app_commands.default_permissions(administrator=True)
+async def quest_cache(interaction: discord.Interaction):
+    await interaction.response.send_message(format_catalog_stats(interaction_guild(interaction)), ephemeral=True)
+
+
+# 🔍 ส่งเควสด้วยการพิมพ์ค้นหา (autocomplete จากดัชนีในหน่วยความจำ ไม่จำกัด 25 รายการแรก)
+@bot.tree.command(name="quest", description="ค้นหาเควสแล้วส่งคำร้อง", guilds=COMMAND_GUILDS)
+@app_commands.describe(quest="พิมพ์ชื่อเควสเพื่อค้นหา", topic="จำกัดเฉพาะหัวข้อ (ไม่บังคับ)")
+async def quest(interaction: discord.Interaction, quest: str, topic: str = None):
+    catalog = interaction_guild(interaction).catalog
+    resolved = catalog.resolve_ref(quest)
+    if resolved is None:
+        # พิมพ์เองโดยไม่เลือกจากรายการ: ใช้ผลค้นหาอันดับแรก
+        matches = catalog.search(quest, topic, limit=1)
+        resolved = (matches[0][0], matches[0][2]) if matches else None
+    if resolved is None:
+        await fast_ack.send_message(interaction, "quest_command", "❗ ไม่พบเควสนี้ กรุณาเลือกจากรายการที่แนะนำ", ephemeral=True)
+        return
+    sheet_name, quest_title = resolved
+    await fast_ack.send_modal(interaction, "quest_command", QuestFormModal(sheet_name, quest_title))
+
+
+async def topic_autocomplete(interaction: discord.Interaction, current: str):
+    # หัวข้อมาจากค่าตั้งปัจจุบันของกิลด์ (ใช้ autocomplete แทน choices จึงต่างกันได้ในแต่ละกิลด์โดยไม่ต้อง sync คำสั่งใหม่)
+    needle = current.casefold()
+    return [
+        app_commands.Choice(name=topic.name, value=topic.name)
+        for topic in interaction_guild(interaction).config.current.topics if needle in topic.name.casefold() or needle in topic.label.casefold()
+    ][:25]
+
+
+quest.autocomplete("topic")(topic_autocomplete)
+
+
+@quest.autocomplete("quest")
+async def quest_autocomplete(interaction: discord.Interaction, current: str):
+    topic = interaction.namespace.topic or None
+    catalog = interaction_guild(interaction).catalog
+    choices = []
+    for sheet_name, position, title in catalog.search(current, topic):
+        ref = catalog.quest_ref(sheet_name, position)
+        if ref is not None:
+            choices.append(app_commands.Choice(name=f"{title} · {sheet_name}"[:100], value=ref))
+    return choices
+
+
+# 📜 ดูเควสที่ผ่าน/รอ/ถูกปฏิเสธของตัวเอง (ตอบจาก SQLite ในเครื่อง ไม่อ่านชีท)
+@bot.tree.command(name="myquests", description="ดูความคืบหน้าเควสของคุณ", guilds=COMMAND_GUILDS)
+async def myquests(interaction: discord.Interaction):
+    guild = interaction_guild(interaction)
+    embed = progress_embed(
+        guild, interaction.user, guild.decisions.progress(interaction.user.id), guild.submissions.pending_for(interaction.user.id)
+    )
+    await fast_ack.send_message(interaction, "myquests", embed=embed, ephemeral=True)
+
+
+@bot.tree.command(name="player_quests", description="ดูความคืบหน้าเควสของสมาชิก", guilds=COMMAND_GUILDS)
+@app_commands.describe(member="สมาชิกที่ต้องการดู")
+@app_commands.default_permissions(administrator=True)
+async def player_quests(interaction: discord.Interaction, member: discord.Member):
+    guild = interaction_guild(interaction)
+    embed = progress_embed(guild, member, guild.decisions.progress(member.id), guild.submissions.pending_for(member.id))
+    await fast_ack.send_message(interaction, "player_quests", embed=embed, ephemeral=True)
+
+
+# 🗂️ พิจารณาหลายคำร้องในคำสั่งเดียว (ช่วงอีเวนต์): งานถูกรวมเป็นชุด
+# สถานะเปลี่ยนใน transaction เดียว, ชีท log ได้ append_rows ครั้งเดียวจาก flush_journal,
+# Role ของผู้เล่นคนเดียวกันรวมเป็น member.edit ครั้งเดียว, DM รวมต่อผู้เล่น และห้องแอดมินได้สรุปข้อความเดียว
+BULK_REVIEW_LIMIT = int(os.getenv("BULK_REVIEW_LIMIT", "100"))
+BULK_ROLE_CONCURRENCY = int(os.getenv("BULK_ROLE_CONCURRENCY", "4"))
+BULK_EDIT_CONCURRENCY = int(os.getenv("BULK_EDIT_CONCURRENCY", "5"))
+
+
+def parse_submission_ids(text):
+    if not text:
+        return None
+    ids = [int(part) for part in text.replace(",", " ").replace("#", " ").split() if part.isdigit()]
+    return ids or None
+
+
+async def grant_quest_roles(guild, submissions):
+    # 🎭 รวม Role ของทุกเควสที่ผ่านต่อผู้เล่น แล้วแก้ด้วย member.edit ครั้งเดียวต่อคน คืนจำนวนคนที่ Role เปลี่ยน
+    quests_by_user = collections.defaultdict(list)
+    for submission in submissions:
+        quests_by_user[submission.user_id].append(submission.quest_title)
+
+    slots = asyncio.Semaphore(BULK_ROLE_CONCURRENCY)
+
+    async def grant(user_id, quest_titles):
+        new_roles = quest_roles(guild, quest_titles)
+        if not new_roles:
+            return False
+        async with slots:
+            try:
+                member, removed = await edit_member_roles(guild, user_id, new_roles, f"อนุมัติเควส {len(new_roles)} รายการ")
+                if member is None:
+                    log.warning("❗ ไม่พบสมาชิก %s", user_id)
+                return removed is not None
+            except Exception as e:
+                log.error("❌ เพิ่ม Role ให้ %s ไม่สำเร็จ: %s", user_id, e)
+                return False
+
+    with span("role_edit_bulk", members=len(quests_by_user)):
+        results = await asyncio.gather(*(grant(user_id, quest_titles) for user_id, quest_titles in quests_by_user.items()))
+    return sum(results)
+
+
+async def close_review_messages(interaction: discord.Interaction, submissions, status):
+    # 🗒️ ข้อความคำร้องที่พิจารณาแล้วแก้เป็นผลพิจารณาและเอาปุ่มออก (เหมือนกดทีละข้อความ) ไม่ลบทิ้ง
+    # ห้องแอดมินยังเป็นประวัติว่าใครพิจารณาอะไร แก้พร้อมกันไม่เกิน BULK_EDIT_CONCURRENCY ข้อความ
+    # (ที่เกิน rate limit ของห้อง discord.py รอให้เอง) ทำหลังตอบแอดมินแล้ว จึงไม่หน่วงคำสั่ง
+    slots = asyncio.Semaphore(BULK_EDIT_CONCURRENCY)
+
+    async def close(submission):
+        channel = bot.get_channel(submission.channel_id) if submission.message_id else None
+        if channel is None:
+            return
+        if status == APPROVED:
+            content = f"✅ เควสของ {submission.player_name} ({submission.quest_title}) ได้รับการอนุมัติแล้วโดย {interaction.user.mention}"
+        else:
+            content = f"❌ เควสของ {submission.player_name} ({submission.quest_title}) ถูกปฏิเสธโดย {interaction.user.mention}"
+        async with slots:
+            try:
+                await channel.get_partial_message(submission.message_id).edit(content=content, view=None)
+            except discord.HTTPException as e:
+                # ข้อความถูกลบไปแล้ว: ข้ามได้ (กดปุ่มเดิมก็ได้ "ถูกพิจารณาไปแล้ว")
+                log.warning("❗ แก้ข้อความคำร้อง #%s ไม่สำเร็จ: %s", submission.id, e)
+
+    with span("review_messages_close", messages=len(submissions)):
+        await asyncio.gather(*(close(submission) for submission in submissions))
+
 
-server_on()
+def bulk_summary(interaction, submissions, status, granted):
+    verb = "อนุมัติ" if status == APPROVED else "ปฏิเสธ"
+    header = f"{'✅' if status == APPROVED else '❌'} {interaction.user.mention} {verb}คำร้อง {len(submissions)} รายการ"
+    if status == APPROVED:
+        header += " (ส่งงานเพิ่ม Role ให้ worker แล้ว)" if granted is None else f" (เพิ่ม Role ให้ {granted} คน)"
+    lines = [header]
+    for index, submission in enumerate(submissions):
+        line = f"• #{submission.id} **{submission.player_name}**: `{submission.quest_title}`"
+        if sum(map(len, lines)) + len(line) + 40 > 2000:
+            lines.append(f"… และอีก {len(submissions) - index} รายการ")
+            break
+        lines.append(line)
+    return "\n".join(lines)
 
-bot.run(os.getenv("DISCORD_TOKEN"))
+
+async def bulk_review(interaction: discord.Interaction, status, handler, topic, quest, ids):
+    submission_ids = parse_submission_ids(ids)
+    if not (topic or quest or submission_ids):
+        await fast_ack.send_message(interaction, handler, "❗ ระบุหัวข้อ, เควส หรือเลขคำร้องอย่างน้อยหนึ่งอย่าง", ephemeral=True)
+        return
+    guild = interaction_guild(interaction)
+    if quest:
+        # ค่าที่เลือกจาก autocomplete เป็น "#<เลขคำร้อง>" ของเควสนั้น (ชื่อเควสยาวเกิน 100 ตัวอักษรใส่ใน value ไม่ได้)
+        match = re.fullmatch(r"#(\d+)", quest)
+        reference = guild.submissions.get(int(match[1])) if match else None
+        if match and reference is None:
+            await fast_ack.send_message(interaction, handler, "❗ ไม่พบเควสที่เลือก กรุณาเลือกจากรายการใหม่", ephemeral=True)
+            return
+        if reference is not None:
+            topic, quest = topic or reference.sheet_name, reference.quest_title
+    candidates = guild.submissions.pending_matching(topic, quest, submission_ids, limit=BULK_REVIEW_LIMIT)
+    claimed = guild.submissions.decide_many([submission.id for submission in candidates], status, interaction.user.id)
+    submissions = [submission for submission in candidates if submission.id in claimed]
+    if not submissions:
+        await fast_ack.send_message(interaction, handler, "ℹ️ ไม่มีคำร้องที่รอพิจารณาตรงกับเงื่อนไข", ephemeral=True)
+        return
+    for submission in submissions:
+        guild.pending.release(guild.pending.key(submission.user_id, submission.sheet_name, submission.quest_title))
+    await fast_ack.defer(interaction, handler, ephemeral=True, thinking=True)
+    fast_ack.spawn(finish_bulk_review(guild, interaction, submissions, status), name=handler)
+
+
+async def finish_bulk_review(guild, interaction: discord.Interaction, submissions, status):
+    with span("bulk_review", decisions=len(submissions), status=status, guild=guild.id):
+        with span("journal_append", rows=len(submissions)):
+            # แถวทั้งหมดเข้า journal ในเครื่อง flush_journal รอบถัดไปส่งขึ้นชีทด้วย append_rows ครั้งเดียว
+            for submission in submissions:
+                record_decision(guild, interaction, submission, status)
+        granted = 0
+        if status == APPROVED and JOBS is not None:
+            by_user = collections.defaultdict(list)
+            for submission in submissions:
+                by_user[submission.user_id].append(submission)
+            for user_id, user_submissions in by_user.items():
+                enqueue_role_sync(guild.id, user_id, user_submissions)
+            granted = None
+        elif status == APPROVED:
+            granted = await grant_quest_roles(interaction.guild, submissions)
+        for submission in submissions:
+            notify_player(interaction, submission, status)
+
+        summary = bulk_summary(interaction, submissions, status, granted)
+        if guild.board is not None:
+            guild.board_updates.trigger()
+        else:
+            await notify_admins(guild, summary)
+        await interaction.followup.send(summary, ephemeral=True)
+        if guild.board is None:
+            await close_review_messages(interaction, submissions, status)
+
+
+async def pending_quest_autocomplete(interaction: discord.Interaction, current: str):
+    topic = interaction.namespace.topic or None
+    needle = current.casefold()
+    return [
+        app_commands.Choice(name=f"{quest_title} · {sheet_name} ({count})"[:100], value=f"#{first_id}")
+        for sheet_name, quest_title, count, first_id in interaction_guild(interaction).submissions.pending_quests()
+        if (topic is None or sheet_name == topic) and needle in quest_title.casefold()
+    ][:25]
+
+
+@bot.tree.command(name="bulk_approve", description="อนุมัติคำร้องที่รอพิจารณาหลายรายการพร้อมกัน", guilds=COMMAND_GUILDS)
+@app_commands.describe(topic="เฉพาะหัวข้อ", quest="เฉพาะเควส", ids="เลขคำร้อง คั่นด้วยจุลภาค เช่น 12,15,18")
+@app_commands.autocomplete(topic=topic_autocomplete, quest=pending_quest_autocomplete)
+@app_commands.default_permissions(administrator=True)
+async def bulk_approve(interaction: discord.Interaction, topic: str = None, quest: str = None, ids: str = None):
+    await bulk_review(interaction, APPROVED, "bulk_approve", topic, quest, ids)
+
+
+@bot.tree.command(name="bulk_reject", description="ปฏิเสธคำร้องที่รอพิจารณาหลายรายการพร้อมกัน", guilds=COMMAND_GUILDS)
+@app_commands.describe(topic="เฉพาะหัวข้อ", quest="เฉพาะเควส", ids="เลขคำร้อง คั่นด้วยจุลภาค เช่น 12,15,18")
+@app_commands.autocomplete(topic=topic_autocomplete, quest=pending_quest_autocomplete)
+@app_commands.default_permissions(administrator=True)
+async def bulk_reject(interaction: discord.Interaction, topic: str = None, quest: str = None, ids: str = None):
+    await bulk_review(interaction, REJECTED, "bulk_reject", topic, quest, ids)
+
+
+# 📊 สถิติรวมและอันดับ (ตอบจากตัวนับในหน่วยความจำ)
+@bot.tree.command(name="quest_stats", description="ดูสถิติการส่งเควสแยกตามหัวข้อ", guilds=COMMAND_GUILDS)
+@app_commands.default_permissions(administrator=True)
+async def quest_stats(interaction: discord.Interaction):
+    await fast_ack.send_message(interaction, "quest_stats", embed=stats_embed(interaction_guild(interaction)), ephemeral=True)
+
+
+@bot.tree.command(name="leaderboard", description="อันดับผู้เล่นที่ผ่านเควสมากที่สุด", guilds=COMMAND_GUILDS)
+async def leaderboard(interaction: discord.Interaction):
+    players = interaction_guild(interaction).stats.top_players(10)
+    lines = [f"{rank}. <@{user_id}> — {count} เควส" for rank, (user_id, count) in enumerate(players, 1)]
+    embed = discord.Embed(
+        title="🏆 อันดับผู้เล่นที่ผ่านเควสมากที่สุด",
+        description="\n".join(lines) or "ยังไม่มีข้อมูล",
+        color=discord.Color.gold()
+    )
+    await fast_ack.send_message(interaction, "leaderboard", embed=embed, ephemeral=True)
+
+
+# 🔄 คำสั่งแอดมิน: สร้างสถิติใหม่จากชีท log ทั้งชีท (อ่าน 1 ครั้ง แล้วไล่แถวรอบเดียว)
+@bot.tree.command(name="rebuild_stats", description="สร้างสถิติใหม่จากชีท log", guilds=COMMAND_GUILDS)
+@app_commands.default_permissions(administrator=True)
+async def rebuild_stats(interaction: discord.Interaction):
+    guild = interaction_guild(interaction)
+    await fast_ack.defer(interaction, "rebuild_stats", ephemeral=True, thinking=True)
+    if guild.sheet is None:
+        await interaction.followup.send("⏳ ยังเชื่อมต่อ Google Sheet ไม่สำเร็จ กรุณาลองใหม่อีกครั้ง", ephemeral=True)
+        return
+    try:
+        await guild.journal.flush(SHEETS, guild.sheet)  # ผลที่ยังค้างในเครื่องต้องขึ้นชีทก่อน ไม่อย่างนั้นจะหายจากสถิติ
+        rows = await SHEETS.get_all_values(guild.sheet)
+    except Exception as e:
+        await interaction.followup.send(f"❌ อ่านชีท log ไม่สำเร็จ: {e}", ephemeral=True)
+        return
+    decided = guild.stats.rebuild((d[1], d[3], d[5], d[6]) for d in unique_decisions(rows))
+    await interaction.followup.send(f"✅ สร้างสถิติใหม่จาก {len(rows)} แถว ({decided} ผลพิจารณา)", ephemeral=True)
+
+
+# ⏱️ คำสั่งแอดมิน: ดูเวลาตอบรับ interaction เทียบกับเส้นตาย 3 วินาทีของ Discord
+@bot.tree.command(name="ack_stats", description="ดูเวลาตอบรับ interaction ของแต่ละปุ่ม/ฟอร์ม", guilds=COMMAND_GUILDS)
+@app_commands.default_permissions(administrator=True)
+async def ack_stats(interaction: discord.Interaction):
+    summary = fast_ack.ACK_STATS.summary()
+    if not summary:
+        await interaction.response.send_message("ยังไม่มีข้อมูล", ephemeral=True)
+        return
+    lines = [
+        f"`{handler}` n={s['count']} p50={s['p50'] * 1000:.0f}ms p99={s['p99'] * 1000:.0f}ms "
+        f"max={s['max'] * 1000:.0f}ms เกิน {fast_ack.ACK_DEADLINE:.0f}s: {s['late']}"
+        for handler, s in sorted(summary.items())
+    ]
+    lines.append(f"🧵 งานเบื้องหลังที่ยังทำอยู่: {fast_ack.pending_tasks()}")
+    await interaction.response.send_message("\n".join(lines), ephemeral=True)
+
+
+@bot.tree.command(name="dm_failures", description="ดู DM แจ้งผลที่ส่งถึงผู้เล่นไม่สำเร็จ", guilds=COMMAND_GUILDS)
+@app_commands.default_permissions(administrator=True)
+async def dm_failures(interaction: discord.Interaction):
+    # 📋 ให้แอดมินแจ้งผลเองกับผู้เล่นที่ปิด DM หรือส่งไม่ผ่าน
+    failures = NOTIFIER.failures(limit=10, guild_id=interaction.guild_id)
+    if not failures:
+        await interaction.response.send_message("✅ ไม่มี DM ที่ส่งไม่สำเร็จ", ephemeral=True)
+        return
+    lines = [
+        f"<t:{int(failed_at)}:R> <@{user_id}>: " + ", ".join(f"`{n.quest_title}`" for n in notices) + f" — {error}"
+        for user_id, notices, error, failed_at in failures
+    ]
+    lines.append(
+        f"📬 รอรวมส่ง: {NOTIFIER.queued()} รายการ, "
+        f"ส่งไม่สำเร็จทั้งหมด: {NOTIFIER.failure_count(guild_id=interaction.guild_id)}"
+    )
+    await interaction.response.send_message("\n".join(lines), ephemeral=True)
+
+
+# 🧭 panel เลือกหัวข้อเควส: กิลด์ละข้อความในห้อง channel_id จำ message id ไว้ข้ามการรีสตาร์ท (Guild.panel)
+def panel_embed():
+    return discord.Embed(
+        title="ระบบจัดการภารกิจ DEENA",
+        description=("เลือกหัวข้อภารกิจที่ต้องการส่งคำร้องด้านล่างนี้\n"
+            "เมื่อทำการส่งคำร้องแล้ว ผู้คุมจะทำการตรวจสอบความถูกต้อง\n"
+            "หลังจากนั้นจะได้รับผลการพิจารณาทางข้อความส่วนตัวของคุณ"
+        ),
+        color=discord.Color.blurple()
+    )
+
+
+async def sync_commands(guild):
+    # 🔑 sync เฉพาะเมื่อชุดคำสั่งเปลี่ยน (เทียบ hash ของ payload กับที่ sync ครั้งก่อน) sync ถูกจำกัดความถี่หนัก
+    target = discord.Object(id=guild.id)
+    commands_payload = [command.to_dict(bot.tree) for command in bot.tree.get_commands(guild=target)]
+    synced_state = {"guild_id": guild.id, "hash": digest(commands_payload)}
+    if guild.snapshots.load("command_sync")[0] == synced_state:
+        log.info("✅ Slash commands ของกิลด์ %s ไม่เปลี่ยนแปลง ข้ามการ sync (%s คำสั่ง)", guild.id, len(commands_payload))
+        return
+    synced = await bot.tree.sync(guild=target)
+    guild.snapshots.save("command_sync", synced_state)
+    log.info("✅ Slash commands synced to guild: %s (%s คำสั่ง)", guild.id, len(synced))
+
+
+async def publish_panel(guild):
+    channel = bot.get_channel(guild.settings.channel_id)
+    if channel is None:
+        log.warning("❗ ไม่พบ Channel ID ของกิลด์ %s หรือบอทยังไม่มีสิทธิ์ในห้องนั้น", guild.id)
+        return
+    # ✅ แก้ข้อความเดิมเฉพาะเมื่อเนื้อหาเปลี่ยน ไม่ส่ง panel ใหม่ทุกครั้งที่บอทออนไลน์
+    message, changed = await guild.panel.publish(channel, embed=panel_embed(), view=SheetSelectView(guild))
+    log.info("✅ %s panel เลือกหัวข้อของกิลด์ %s (message %s)", "อัปเดต" if changed else "ใช้", guild.id, message.id)
+
+
+async def publish_guild(guild):
+    await sync_commands(guild)
+    await publish_panel(guild)
+    if guild.board is not None:
+        guild.board_updates.trigger()  # 📋 แสดงคิวคำร้องที่ค้างอยู่ (รวมที่ส่งมาระหว่างบอทออฟไลน์)
+
+
+@bot.event
+async def on_ready():
+    log.info("ล็อกอินสำเร็จ: %s (%s กิลด์, %s shard)", bot.user, len(GUILDS), bot.shard_count or 1)
+    # 🔄 on_ready เกิดซ้ำทุกครั้งที่ gateway เชื่อมใหม่ งานเผยแพร่ทำครั้งเดียวต่อโปรเซส
+    if bot.published:
+        log.info("🔄 เชื่อมต่อ gateway ใหม่ ไม่ต้อง sync คำสั่งหรือส่ง panel ซ้ำ")
+        return
+    bot.published = True
+    # กิลด์ที่ล้มเหลวไม่ขวางกิลด์อื่น
+    results = await asyncio.gather(*(publish_guild(guild) for guild in GUILDS.values()), return_exceptions=True)
+    for guild, result in zip(GUILDS.values(), results):
+        if isinstance(result, Exception):
+            # ลองใหม่ตอนเชื่อมต่อครั้งถัดไป (กิลด์ที่สำเร็จแล้วจะข้ามเองเพราะ hash ไม่เปลี่ยน)
+            bot.published = False
+            log.error("❌ Error syncing commands (กิลด์ %s): %s", guild.id, result, exc_info=result)
+
+
+if __name__ == "__main__":
+    # 📝 log ทั้งหมด (รวมของ discord.py) ผ่านคิวไปเขียนใน thread แยก ไม่บล็อก event loop
+    tracing.setup_logging(os.getenv("LOG_LEVEL", "INFO"), os.getenv("LOG_FORMAT", "text"))
+    try:
+        # ✅ การเชื่อม Google ย้ายไปทำใน setup_hook แล้ว (ไม่ขวางการล็อกอิน)
+        bot.run(TOKEN, log_handler=None)
+    finally:
+        tracing.shutdown_logging()
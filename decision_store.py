@@ -0,0 +1,129 @@
+import re
+import threading
+
+from submission_store import APPROVED, REJECTED
+
+# ชีท log: timestamp, ชื่อนักโทษ, หัวข้อ, เควส, สถานะ, ผู้ส่ง (mention), ผู้พิจารณา (mention, แถวเก่าไม่มี)
+LOG_STATUS = {"อนุมัติ": APPROVED, "ไม่อนุมัติ": REJECTED}
+MENTION = re.compile(r"<@!?(\d+)>")
+
+
+def parse_log_row(row):
+    # คืน (decided_at, user_id, player, sheet, quest, status, reviewer_id) หรือ None ถ้าไม่ใช่แถวผลพิจารณา (เช่นหัวตาราง)
+    if len(row) < 6:
+        return None
+    status = LOG_STATUS.get(row[4].strip())
+    match = MENTION.search(row[5])
+    if status is None or match is None:
+        return None
+    reviewer = MENTION.search(row[6]) if len(row) > 6 else None
+    return row[0], int(match.group(1)), row[1], row[2], row[3], status, int(reviewer.group(1)) if reviewer else None
+
+
+def unique_decisions(rows):
+    # ชีท log เป็น at-least-once (journal อาจส่งแถวซ้ำ) นับผลละครั้งด้วยคีย์เดียวกับ UNIQUE ของตาราง decisions
+    seen = set()
+    for decision in filter(None, map(parse_log_row, rows)):
+        key = (decision[0], decision[1], decision[3], decision[4], decision[5])
+        if key not in seen:
+            seen.add(key)
+            yield decision
+
+
+_INSERT = (
+    "INSERT OR IGNORE INTO decisions (decided_at, user_id, player_name, sheet_name, quest_title, status, reviewer_id)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+class DecisionStore:
+    """ผลอนุมัติ/ปฏิเสธทั้งหมดใน SQLite มีดัชนีตาม user id และเควส ใช้ตอบ /myquests โดยไม่อ่านชีท
+    ผลใหม่บันทึกทันทีตอนพิจารณา และซิงก์เพิ่มเติมจากชีท log ทีละส่วน (อ่านเฉพาะแถวที่ยังไม่เคยเห็น)"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._lock = threading.Lock()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS decisions ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " decided_at TEXT NOT NULL,"
+            " user_id INTEGER NOT NULL,"
+            " player_name TEXT NOT NULL,"
+            " sheet_name TEXT NOT NULL,"
+            " quest_title TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " reviewer_id INTEGER,"
+            # แถวเดียวกันที่มาทั้งจากบอทและจากชีท log นับครั้งเดียว
+            " UNIQUE (decided_at, user_id, sheet_name, quest_title, status))"
+        )
+        if "reviewer_id" not in {row[1] for row in self.conn.execute("PRAGMA table_info(decisions)")}:
+            self.conn.execute("ALTER TABLE decisions ADD COLUMN reviewer_id INTEGER")  # ฐานข้อมูลก่อนมีคอลัมน์ผู้พิจารณา
+        self.conn.execute("CREATE INDEX IF NOT EXISTS decisions_user_quest ON decisions (user_id, quest_title)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS decision_sync (id INTEGER PRIMARY KEY CHECK (id = 1), log_row INTEGER NOT NULL)")
+        self.synced_rows = 0
+
+    def record(self, decided_at, user_id, player_name, sheet_name, quest_title, status, reviewer_id=None):
+        # คืน True ถ้าเป็นผลใหม่ (False = เคยบันทึกแล้ว เช่นซิงก์มาจากชีทก่อน)
+        with self._lock:
+            cur = self.conn.execute(_INSERT, (decided_at, user_id, player_name, sheet_name, quest_title, status, reviewer_id))
+        return cur.rowcount == 1
+
+    @property
+    def log_row(self):
+        # แถวสุดท้ายของชีท log ที่ซิงก์แล้ว (0 = ยังไม่เคยซิงก์)
+        with self._lock:
+            row = self.conn.execute("SELECT log_row FROM decision_sync WHERE id = 1").fetchone()
+        return row[0] if row else 0
+
+    def sync(self, worksheet):
+        # 🔄 อ่านเฉพาะแถวถัดจากที่ซิงก์ล่าสุด (1 คำขอ) เป็น blocking ต้องเรียกผ่าน SHEETS.call
+        # คืนเฉพาะผลที่เพิ่งเพิ่ม (ไม่รวมที่บอทบันทึกไว้แล้ว) ให้ผู้เรียกนับสถิติต่อ
+        start = self.log_row + 1
+        rows = worksheet.get(f"A{start}:G")
+        added = []
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                for decision in filter(None, map(parse_log_row, rows)):
+                    if self.conn.execute(_INSERT, decision).rowcount == 1:
+                        added.append(decision)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO decision_sync (id, log_row) VALUES (1, ?)", (start - 1 + len(rows),)
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        self.synced_rows += len(rows)
+        return added
+
+    def progress(self, user_id):
+        # ✅ ผลล่าสุดของแต่ละเควสของผู้เล่น {(sheet, quest): (status, decided_at)} เรียงตามเวลาที่พิจารณา
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT sheet_name, quest_title, status, decided_at FROM decisions WHERE user_id = ? ORDER BY decided_at, id",
+                (user_id,)
+            ).fetchall()
+        latest = {}
+        for sheet_name, quest_title, status, decided_at in rows:
+            latest[(sheet_name, quest_title)] = (status, decided_at)
+        return latest
+
+    def iter_for_stats(self, chunk=1000):
+        # ไล่ทุกผลทีละชุดด้วย rowid (ไม่โหลดทั้งตารางเข้าหน่วยความจำ) → (user_id, sheet_name, status, reviewer_id)
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT id, user_id, sheet_name, status, reviewer_id FROM decisions WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, chunk)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row[1:]
+            last_id = rows[-1][0]
+
+    def count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM decisions").fetchone()[0]
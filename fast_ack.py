@@ -0,0 +1,119 @@
+import asyncio
+import collections
+import functools
+import logging
+import time
+
+import discord
+
+from metrics import Counter, Histogram
+import tracing
+
+log = logging.getLogger(__name__)
+
+# ⏱️ Discord ให้เวลาตอบรับ interaction ภายใน 3 วินาที
+ACK_DEADLINE = 3.0
+
+
+class AckStats:
+    """เก็บเวลาตั้งแต่ Discord สร้าง interaction จนบอทตอบรับ แยกตาม handler"""
+
+    def __init__(self, maxlen=1000):
+        self.maxlen = maxlen
+        self.samples = {}
+        self.count = collections.Counter()
+        self.late = collections.Counter()
+
+    def record(self, handler, seconds):
+        samples = self.samples.get(handler)
+        if samples is None:
+            samples = self.samples[handler] = collections.deque(maxlen=self.maxlen)
+        samples.append(seconds)
+        self.count[handler] += 1
+        if seconds >= ACK_DEADLINE:
+            self.late[handler] += 1
+
+    def summary(self):
+        result = {}
+        for handler, samples in self.samples.items():
+            ordered = sorted(samples)
+            result[handler] = {
+                "count": self.count[handler],
+                "late": self.late[handler],
+                "p50": _percentile(ordered, 0.50),
+                "p99": _percentile(ordered, 0.99),
+                "max": ordered[-1],
+            }
+        return result
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+ACK_STATS = AckStats()
+
+ACK_LATENCY = Histogram(
+    "deena_interaction_ack_seconds", "Time from interaction creation to acknowledgement", ("handler",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 5.0)
+)
+TASK_LATENCY = Histogram("deena_background_task_seconds", "Background work after an interaction was acknowledged", ("task",))
+TASK_FAILURES = Counter("deena_background_task_failures_total", "Background tasks that raised", ("task",))
+
+# 🧵 งานเบื้องหลังต้องถือ reference ไว้ ไม่อย่างนั้น task อาจถูกเก็บขยะกลางทาง
+_background_tasks = set()
+
+
+def spawn(coro, name=None):
+    task = asyncio.create_task(coro, name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(functools.partial(_on_task_done, time.perf_counter()))
+    return task
+
+
+def _on_task_done(started, task):
+    _background_tasks.discard(task)
+    name = task.get_name()
+    TASK_LATENCY.observe(time.perf_counter() - started, task=name)
+    if not task.cancelled() and task.exception() is not None:
+        TASK_FAILURES.inc(task=name)
+        log.error("❌ งานเบื้องหลัง %s ล้มเหลว: %r", name, task.exception(), exc_info=task.exception())
+
+
+def pending_tasks():
+    return len(_background_tasks)
+
+
+# ✅ ทุก wrapper ผูก trace id ของ interaction ก่อนตอบ งานที่ spawn หลังจากนี้จึงได้ trace เดียวกัน
+
+
+def _record(interaction, handler):
+    # วัดจากเวลาที่ Discord สร้าง interaction (snowflake) จึงรวมเวลาเดินทางมาถึงบอทด้วย
+    elapsed = max((discord.utils.utcnow() - interaction.created_at).total_seconds(), 0.0)
+    ACK_STATS.record(handler, elapsed)
+    ACK_LATENCY.observe(elapsed, handler=handler)
+
+
+async def defer(interaction, handler, **kwargs):
+    tracing.bind(interaction, handler)
+    await interaction.response.defer(**kwargs)
+    _record(interaction, handler)
+
+
+async def send_message(interaction, handler, *args, **kwargs):
+    tracing.bind(interaction, handler)
+    await interaction.response.send_message(*args, **kwargs)
+    _record(interaction, handler)
+
+
+async def edit_message(interaction, handler, **kwargs):
+    tracing.bind(interaction, handler)
+    await interaction.response.edit_message(**kwargs)
+    _record(interaction, handler)
+
+
+async def send_modal(interaction, handler, modal):
+    tracing.bind(interaction, handler)
+    await interaction.response.send_modal(modal)
+    _record(interaction, handler)
+
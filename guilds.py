@@ -0,0 +1,150 @@
+import os
+import threading
+from collections import namedtuple
+
+import gspread
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter
+
+import storage
+from audit_journal import AuditJournal
+from board import PinnedMessage, ReviewBoard
+from decision_store import DecisionStore
+from quest_catalog import QuestCatalog
+from quest_config import ConfigError, ConfigStore, read_file
+from quest_stats import QuestStats
+from role_index import RoleIndex
+from snapshot_store import SnapshotStore
+from submission_guard import PendingIndex
+from submission_store import SubmissionStore
+
+# ✅ ค่าตั้งของกิลด์หนึ่ง: ห้อง panel/แอดมิน/สถิติ, สเปรดชีต + ชีท log, ไฟล์ QUEST_CONFIG และไฟล์ SQLite ของกิลด์
+GuildSettings = namedtuple(
+    "GuildSettings",
+    "guild_id channel_id admin_channel_id stats_channel_id sheet_id sheet_name quest_config db_path"
+)
+
+
+def default_db_path(guild_id, index):
+    # กิลด์แรกใช้ไฟล์เดิม (DEENA_DB_PATH) ข้อมูลของบอทกิลด์เดียวที่มีอยู่แล้วใช้ต่อได้เลย กิลด์อื่นได้ไฟล์ของตัวเองข้างกัน
+    if index == 0:
+        return storage.DB_PATH
+    root, ext = os.path.splitext(storage.DB_PATH)
+    return f"{root}-{guild_id}{ext or '.db'}"
+
+
+def parse_settings(raw):
+    # ✅ ตรวจทุกกิลด์ก่อน ผิดตรงไหนแจ้งทันที (ไม่เริ่มบอทด้วยค่าที่พัง)
+    entries = raw.get("guilds")
+    if not isinstance(entries, list) or not entries:
+        raise ConfigError("guilds ต้องเป็นรายการกิลด์อย่างน้อย 1 กิลด์")
+    settings = []
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            raise ConfigError(f"กิลด์ลำดับ {index + 1} ต้องเป็น object")
+        try:
+            guild_id = int(entry["guild_id"])
+            channel_id = int(entry["channel_id"])
+            admin_channel_id = int(entry["admin_channel_id"])
+            stats_channel_id = int(entry.get("stats_channel_id") or 0)
+        except (KeyError, TypeError, ValueError):
+            raise ConfigError(f"กิลด์ลำดับ {index + 1} ต้องมี guild_id, channel_id และ admin_channel_id เป็นตัวเลข")
+        if guild_id in {s.guild_id for s in settings}:
+            raise ConfigError(f"กิลด์ซ้ำ: {guild_id}")
+        if not entry.get("sheet_id") or not entry.get("sheet_name"):
+            raise ConfigError(f"กิลด์ {guild_id} ต้องมี sheet_id และ sheet_name")
+        settings.append(GuildSettings(
+            guild_id, channel_id, admin_channel_id, stats_channel_id,
+            str(entry["sheet_id"]), str(entry["sheet_name"]),
+            entry.get("quest_config") or None,
+            entry.get("db_path") or default_db_path(guild_id, index),
+        ))
+    return tuple(settings)
+
+
+def load_settings(path, default):
+    # ไม่มีไฟล์ GUILDS_CONFIG = บอทกิลด์เดียวตามค่าเดิม (ค่าคงที่ใน bot.py + .env)
+    if not path:
+        return (default,)
+    return parse_settings(read_file(path))
+
+
+class SheetsPool:
+    """client ของ Google ตัวเดียวใช้ร่วมทุกกิลด์ สร้าง (authorize) ตอนใช้ครั้งแรกเท่านั้น
+    ทุกคำขอใช้ connection pool ของ session เดียวกัน และสเปรดชีตแต่ละไฟล์เปิดครั้งเดียวแล้วจำ handle ไว้
+    กิลด์ที่ใช้สเปรดชีตเดียวกันจึงไม่เปิดซ้ำ"""
+
+    def __init__(self, credentials, timeout=None, pool_size=10):
+        self._credentials = credentials  # ฟังก์ชันคืน Credentials (อ่าน .env ตอนเชื่อมครั้งแรก)
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._client = None
+        self._spreadsheets = {}  # sheet id → Spreadsheet
+        self._lock = threading.Lock()
+        self.opens = 0
+
+    def client(self):
+        # blocking: เรียกใน thread ของ SHEETS เท่านั้น
+        with self._lock:
+            if self._client is None:
+                credentials = self._credentials()
+                session = AuthorizedSession(credentials)
+                # pool เท่าจำนวน thread ของ SHEETS ไม่ให้ urllib3 ทิ้ง connection ที่ใช้ซ้ำได้เมื่อเรียกพร้อมกัน
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                client = gspread.authorize(credentials, session=session)
+                client.set_timeout(self.timeout)
+                self._client = client
+            return self._client
+
+    def open(self, sheet_id):
+        with self._lock:
+            spreadsheet = self._spreadsheets.get(sheet_id)
+        if spreadsheet is not None:
+            return spreadsheet
+        spreadsheet = self.client().open_by_key(sheet_id)
+        with self._lock:
+            self.opens += 1
+            return self._spreadsheets.setdefault(sheet_id, spreadsheet)
+
+    @property
+    def connected(self):
+        return self._client is not None
+
+    def stats(self):
+        return {"connected": self.connected, "spreadsheets": len(self._spreadsheets), "opens": self.opens}
+
+
+class Guild:
+    """ทุกอย่างที่เป็นของกิลด์หนึ่ง: สเปรดชีต/ชีท log, ค่าตั้งหัวข้อ, แคชเควสและดัชนี Role, คำร้อง, journal,
+    ผลพิจารณา, สถิติ และข้อความที่บอทแก้ซ้ำ (panel, กระดาน) ข้อมูลในเครื่องอยู่ในไฟล์ SQLite ของกิลด์เอง
+    ส่วนที่ใช้ร่วมทุกกิลด์ (โควตา Sheets, SheetsPool, แคช Member, คิว DM/งาน) อยู่ใน bot.py"""
+
+    def __init__(self, settings, catalog_ttl=300, pending_ttl=86400.0, review_board=False):
+        self.settings = settings
+        self.id = settings.guild_id
+        self.snapshots = SnapshotStore(storage.connect(settings.db_path))
+        self.config = ConfigStore(settings.quest_config, self.snapshots)
+        self.catalog = QuestCatalog(self.config.current.topic_names, ttl=catalog_ttl)
+        self.role_index = RoleIndex()
+        self.journal = AuditJournal(storage.connect(settings.db_path))
+        self.submissions = SubmissionStore(storage.connect(settings.db_path))
+        self.decisions = DecisionStore(storage.connect(settings.db_path))
+        self.stats = QuestStats()
+        self.pending = PendingIndex(ttl=pending_ttl)
+        self.panel = PinnedMessage(self.snapshots, "quest_panel")
+        self.stats_board = PinnedMessage(self.snapshots, "stats_board")
+        self.stats_board_version = None
+        self.board = ReviewBoard(self.snapshots, "review_board") if review_board else None
+        self.board_updates = None  # Debouncer ของกระดาน (สร้างใน bot.py)
+        self.spreadsheet = None
+        self.sheet = None  # ชีท log
+
+    def connect(self, pool):
+        # เป็น HTTP แบบ blocking ต้องเรียกผ่าน SHEETS.call เท่านั้น (เปิดสเปรดชีตครั้งแรก + worksheet = 2 คำขอ)
+        spreadsheet = pool.open(self.settings.sheet_id)
+        self.sheet = spreadsheet.worksheet(self.settings.sheet_name)
+        self.spreadsheet = spreadsheet
+
+    def __repr__(self):
+        return f"<Guild {self.id}>"
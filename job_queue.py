@@ -0,0 +1,194 @@
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from metrics import Counter
+from sheets_quota import backoff_delay
+
+log = logging.getLogger(__name__)
+
+JOBS_PROCESSED = Counter("deena_jobs_total", "Background jobs handled by workers", ("kind", "outcome"))
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+Job = namedtuple("Job", "id kind group_key payload attempts dedupe_key")
+
+
+class JobQueue:
+    """คิวงานเบื้องหลังใน SQLite ใช้ร่วมกันระหว่างโปรเซส gateway (enqueue) กับ worker (claim)
+    at-least-once: งานที่ worker รับไปแล้วไม่ยืนยันภายใน lease วินาทีจะถูกปล่อยให้ worker อื่นรับใหม่
+    handler จึงต้องทำซ้ำได้โดยไม่เกิดผลซ้ำ (idempotent) และ dedupe_key กันการ enqueue งานเดิมซ้ำ"""
+
+    def __init__(self, conn, max_attempts=5, lease=60.0):
+        self.conn = conn
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self._lock = threading.Lock()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " kind TEXT NOT NULL,"
+            " group_key TEXT,"
+            " payload TEXT NOT NULL,"
+            " dedupe_key TEXT UNIQUE,"
+            " status TEXT NOT NULL DEFAULT 'pending',"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " available_at REAL NOT NULL,"
+            " locked_until REAL,"
+            " worker TEXT,"
+            " last_error TEXT,"
+            " created_at REAL NOT NULL,"
+            " finished_at REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (kind, status, available_at)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        # ผลภายนอกที่เกิดแล้ว (เช่น DM ที่ส่งแล้ว) ตาม dedupe_key ของงาน ใช้ข้ามเมื่องานเดิมถูกรับซ้ำหลัง lease หมด
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_effects (dedupe_key TEXT PRIMARY KEY, applied_at REAL NOT NULL)"
+        )
+
+    def enqueue(self, kind, payload, group_key=None, dedupe_key=None):
+        # ✅ คืน True ถ้าเป็นงานใหม่ (dedupe_key ซ้ำ = เคย enqueue แล้ว ไม่เพิ่มซ้ำ)
+        now = time.time()
+        with self._lock:
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO jobs (kind, group_key, payload, dedupe_key, available_at, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, group_key, json.dumps(payload, ensure_ascii=False), dedupe_key, now, now)
+            )
+        return cur.rowcount == 1
+
+    def claim(self, kind, worker, limit=20):
+        # 🔒 รับงานที่ถึงเวลา (หรือ lease ของ worker อื่นหมดแล้ว) ใน transaction เดียว กันสอง worker รับงานเดียวกัน
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.conn.execute(
+                    "SELECT id, kind, group_key, payload, attempts, dedupe_key FROM jobs WHERE kind = ?"
+                    " AND ((status = ? AND available_at <= ?) OR (status = ? AND locked_until <= ?))"
+                    " ORDER BY id LIMIT ?",
+                    (kind, PENDING, now, RUNNING, now, limit)
+                ).fetchall()
+                if rows:
+                    self.conn.execute(
+                        f"UPDATE jobs SET status = ?, worker = ?, locked_until = ?, attempts = attempts + 1"
+                        f" WHERE id IN ({', '.join('?' * len(rows))})",
+                        (RUNNING, worker, now + self.lease, *(row[0] for row in rows))
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return [Job(job_id, kind, group_key, json.loads(payload), attempts + 1, dedupe_key)
+                for job_id, kind, group_key, payload, attempts, dedupe_key in rows]
+
+    def complete(self, jobs):
+        with self._lock:
+            self.conn.execute(
+                f"UPDATE jobs SET status = ?, finished_at = ?, locked_until = NULL WHERE id IN ({', '.join('?' * len(jobs))})",
+                (DONE, time.time(), *(job.id for job in jobs))
+            )
+
+    def fail(self, jobs, error):
+        # 🔄 ลองใหม่แบบ backoff จนครบ max_attempts แล้วค้างไว้เป็น failed (ดูสาเหตุได้จาก last_error)
+        now = time.time()
+        with self._lock:
+            for job in jobs:
+                give_up = job.attempts >= self.max_attempts
+                self.conn.execute(
+                    "UPDATE jobs SET status = ?, available_at = ?, locked_until = NULL, last_error = ? WHERE id = ?",
+                    (FAILED if give_up else PENDING, now + backoff_delay(job.attempts - 1), str(error)[:500], job.id)
+                )
+
+    def mark_applied(self, jobs):
+        # ✅ บันทึกว่าผลของงานเกิดแล้ว (เรียกหลังทำสำเร็จ ก่อน complete) ถ้าโปรเซสตายหรือ lease หมดก่อนยืนยัน
+        # worker ที่รับงานเดิมไปใหม่จะเห็นใน applied() แล้วข้าม ไม่ส่งซ้ำ
+        keys = [(job.dedupe_key, time.time()) for job in jobs if job.dedupe_key]
+        if keys:
+            with self._lock:
+                self.conn.executemany("INSERT OR IGNORE INTO job_effects (dedupe_key, applied_at) VALUES (?, ?)", keys)
+
+    def applied(self, jobs):
+        keys = [job.dedupe_key for job in jobs if job.dedupe_key]
+        if not keys:
+            return set()
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT dedupe_key FROM job_effects WHERE dedupe_key IN ({', '.join('?' * len(keys))})", keys
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def counts(self):
+        with self._lock:
+            return dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def backlog(self):
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (PENDING, RUNNING)
+            ).fetchone()[0]
+
+    def purge(self, older_than=86400.0):
+        # 🧹 ลบงานที่เสร็จแล้วเก่ากว่า older_than วินาที (dedupe_key ของงานล่าสุดยังกันซ้ำได้)
+        with self._lock:
+            cur = self.conn.execute(
+                "DELETE FROM jobs WHERE status = ? AND finished_at < ?", (DONE, time.time() - older_than)
+            )
+            self.conn.execute("DELETE FROM job_effects WHERE applied_at < ?", (time.time() - older_than,))
+        return cur.rowcount
+
+    def hold_lease(self, name, owner, ttl):
+        # 🔑 งานที่ต้องมีผู้ทำคนเดียว (เช่นส่ง journal ขึ้นชีท) ถือ lease ต่ออายุได้ ถ้าเจ้าของเดิมตายจะหมดอายุเอง
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO job_leases (name, owner, expires_at) VALUES (?, ?, ?)"
+                " ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at"
+                " WHERE job_leases.owner = excluded.owner OR job_leases.expires_at <= ?",
+                (name, owner, now + ttl, now)
+            )
+            row = self.conn.execute("SELECT owner FROM job_leases WHERE name = ?", (name,)).fetchone()
+        return row is not None and row[0] == owner
+
+
+def _group_of(job):
+    # งานที่ไม่มี group_key ทำแยกทีละงาน
+    return job.group_key or f"#{job.id}"
+
+
+async def run_worker(queue, handlers, worker, batch=20, poll=1.0, concurrency=4):
+    """วนรับงานทุกชนิดใน handlers แล้วเรียก handler ทีละกลุ่ม (group_key เดียวกัน = ผู้เล่นคนเดียวกัน)
+    handler รับ list ของ Job ในกลุ่ม จึงรวมงานของคนเดียวกันได้ (เช่น DM หรือแก้ Role ครั้งเดียว)"""
+    slots = asyncio.Semaphore(concurrency)
+
+    async def handle(kind, jobs):
+        async with slots:
+            try:
+                await handlers[kind](jobs)
+            except Exception as e:
+                JOBS_PROCESSED.inc(len(jobs), kind=kind, outcome="retry")
+                log.warning("❗ งาน %s ไม่สำเร็จ (ครั้งที่ %s): %s", kind, max(job.attempts for job in jobs), e)
+                queue.fail(jobs, f"{type(e).__name__}: {e}")
+            else:
+                JOBS_PROCESSED.inc(len(jobs), kind=kind, outcome="done")
+                queue.complete(jobs)
+
+    while True:
+        claimed = 0
+        for kind in handlers:
+            jobs = queue.claim(kind, worker, limit=batch)
+            claimed += len(jobs)
+            groups = itertools.groupby(sorted(jobs, key=_group_of), key=_group_of)
+            await asyncio.gather(*(handle(kind, list(group)) for _, group in groups))
+        if not claimed:
+            await asyncio.sleep(poll)
@@ -0,0 +1,95 @@
+import asyncio
+import collections
+import time
+import weakref
+
+import discord
+
+
+class MemberResolver:
+    """หา Member จาก cache ของ gateway ก่อน → cache TTL/LRU → เรียก REST เป็นทางสุดท้าย
+    Member จาก resolve() อาจเก่าได้ถึง ttl วินาที ใช้กับ DM/การค้นหาเท่านั้น งานที่แก้ Role ต้องใช้ fetch()"""
+
+    def __init__(self, ttl=300, maxsize=1000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._cache = collections.OrderedDict()
+        self._locks = weakref.WeakValueDictionary()  # (กิลด์, ผู้ใช้) → asyncio.Lock หายเองเมื่อไม่มีใครถือ
+
+        # 📊 ตัวนับสำหรับดู hit rate
+        self.gateway_hits = 0
+        self.cache_hits = 0
+        self.rest_calls = 0
+        self.not_found = 0
+
+    def remember(self, member):
+        key = (member.guild.id, member.id)
+        self._cache[key] = (member, time.monotonic() + self.ttl)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def forget(self, guild_id, user_id):
+        self._cache.pop((guild_id, user_id), None)
+
+    def cached(self, guild, user_id):
+        member = guild.get_member(user_id)
+        if member is not None:
+            self.gateway_hits += 1
+            return member
+
+        key = (guild.id, user_id)
+        entry = self._cache.get(key)
+        if entry is not None:
+            member, expires_at = entry
+            if expires_at > time.monotonic():
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return member
+            del self._cache[key]
+        return None
+
+    def lock(self, guild_id, user_id):
+        # 🔒 lock ต่อสมาชิก: ถือไว้ตลอด fetch → คำนวณ → member.edit การแก้ Role ของคนเดียวกันจะไม่ทับกัน
+        key = (guild_id, user_id)
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    async def fetch(self, guild, user_id):
+        # 🎭 ดึงสดจาก REST เสมอ (ไม่ใช้ทั้ง cache ของ gateway และ TTL) สำหรับคำนวณ Role ที่จะแก้
+        # ได้ของสดแล้วเก็บลง cache ให้ DM ผลพิจารณาที่ตามมาไม่ต้อง fetch ซ้ำ
+        self.rest_calls += 1
+        try:
+            member = await guild.fetch_member(user_id)
+        except discord.NotFound:
+            self.not_found += 1
+            return None
+        self.remember(member)
+        return member
+
+    async def resolve(self, guild, user_id):
+        member = self.cached(guild, user_id)
+        if member is not None:
+            return member
+
+        self.rest_calls += 1
+        try:
+            member = await guild.fetch_member(user_id)
+        except discord.NotFound:
+            self.not_found += 1
+            return None
+        self.remember(member)
+        return member
+
+    def stats(self):
+        lookups = self.gateway_hits + self.cache_hits + self.rest_calls
+        return {
+            "size": len(self._cache),
+            "gateway_hits": self.gateway_hits,
+            "cache_hits": self.cache_hits,
+            "rest_calls": self.rest_calls,
+            "not_found": self.not_found,
+            "hit_rate": (self.gateway_hits + self.cache_hits) / lookups if lookups else None,
+        }
@@ -0,0 +1,161 @@
+import bisect
+import time
+
+# 📊 ตัววัดแบบเบาๆ รูปแบบ Prometheus text format (ไม่ต้องพึ่ง prometheus_client)
+# ทุกตัววัดถูกอัปเดตจาก event loop และ /metrics ก็ render ใน event loop เดียวกัน (aiohttp ใน myserver.py)
+# จึงไม่มีการอ่าน/เขียนพร้อมกัน การอัปเดตเป็นแค่ dict lookup + บวกเลข
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_REGISTRY = []
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"')) for name, value in pairs)
+    return "{" + body + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        _REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def samples(self):
+        for key, value in list(self._values.items()):
+            yield self.name, _format_labels(self.labelnames, key), value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        _REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        state = self._values.get(key)
+        if state is None:
+            # [จำนวนต่อ bucket..., +Inf], ผลรวม
+            state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def samples(self):
+        for key, (counts, total) in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), list(counts)):
+                cumulative += count
+                yield self.name + "_bucket", _format_labels(self.labelnames, key, ("le", _format_value(bound))), cumulative
+            yield self.name + "_sum", _format_labels(self.labelnames, key), total
+            yield self.name + "_count", _format_labels(self.labelnames, key), cumulative
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class Gauge:
+    """ค่าที่อ่านตอนถูก scrape: ส่ง callback ที่คืนตัวเลข หรือ dict {labels tuple: ค่า}"""
+
+    def __init__(self, name, help, callback, labelnames=(), kind="gauge"):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+        _REGISTRY.append(self)
+
+    def samples(self):
+        value = self.callback()
+        if value is None:
+            return
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if item is not None:
+                    yield self.name, _format_labels(self.labelnames, key), item
+        else:
+            yield self.name, "", value
+
+
+def render():
+    lines = []
+    for metric in list(_REGISTRY):
+        try:
+            samples = list(metric.samples())
+        except Exception as e:
+            lines.append(f"# {metric.name} error: {e!r}")
+            continue
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in samples:
+            lines.append(f"{name}{labels} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ✅ นับทุกการเรียก Discord REST (รวมการตอบ interaction) โดยหุ้ม HTTPClient.request ของ discord.py
+DISCORD_REQUESTS = Counter("deena_discord_requests_total", "Discord REST requests", ("route", "status"))
+DISCORD_LATENCY = Histogram("deena_discord_request_seconds", "Discord REST request latency", ("route",))
+
+
+def instrument_discord_http(http):
+    original = http.request
+
+    async def request(route, **kwargs):
+        # route.path เป็นแม่แบบ เช่น /guilds/{guild_id}/members/{user_id} จึงไม่ทำให้ label บวม
+        name = f"{route.method} {route.path}"
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            return await original(route, **kwargs)
+        except Exception as e:
+            status = str(getattr(e, "status", type(e).__name__))
+            raise
+        finally:
+            DISCORD_LATENCY.observe(time.perf_counter() - started, route=name)
+            DISCORD_REQUESTS.inc(route=name, status=status)
+
+    http.request = request
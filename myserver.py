@@ -1,15 +1,47 @@
-from flask import Flask
-from threading import Thread
+import logging
 
-app = Flask('')
+from aiohttp import web
 
-@app.route('/')
-def home():
-    return "Server is running!!"
+from metrics import render
 
-def run():
-    app.run(host='0.0.0.0',port=8080)
+log = logging.getLogger(__name__)
 
-def server_on():
-    t = Thread(target=run)
-    t.start()
\ No newline at end of file
+# ✅ เว็บเซิร์ฟเวอร์ keep-alive/health รันใน event loop เดียวกับบอท (ไม่ต้องแยก thread)
+
+
+async def home(request):
+    return web.Response(text="Server is running!!")
+
+
+async def healthz(request):
+    return web.json_response({"status": "ok"})
+
+
+async def readyz(request):
+    # readiness จริงจากสถานะบอท: gateway เชื่อมต่อ, แคชเควสโหลดแล้ว, journal ไม่ค้างเกินกำหนด
+    readiness = request.app["readiness"]
+    report = readiness() if readiness else {"checks": {}}
+    ready = all(report.get("checks", {}).values())
+    return web.json_response({"ready": ready, **report}, status=200 if ready else 503)
+
+
+async def metrics(request):
+    return web.Response(body=render().encode("utf-8"), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+def make_app(readiness=None):
+    app = web.Application()
+    app["readiness"] = readiness
+    app.router.add_get("/", home)
+    app.router.add_get("/healthz", healthz)
+    app.router.add_get("/readyz", readyz)
+    app.router.add_get("/metrics", metrics)
+    return app
+
+
+async def server_on(readiness=None, host="0.0.0.0", port=8080):
+    runner = web.AppRunner(make_app(readiness), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    log.info("✅ Health server ออนไลน์ที่พอร์ต %s", port)
+    return runner
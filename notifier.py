@@ -0,0 +1,138 @@
+import asyncio
+import collections
+import json
+import logging
+import threading
+import time
+
+import discord
+
+from metrics import Counter, Histogram
+from sheets_quota import TokenBucket, backoff_delay
+
+log = logging.getLogger(__name__)
+
+DM_SENT = Counter("deena_dm_total", "Result DMs by delivery outcome", ("outcome",))
+DM_MERGED = Counter("deena_dm_merged_total", "Decisions folded into another decision's DM")
+DM_DELAY = Histogram(
+    "deena_dm_delay_seconds", "Time from the first queued decision to DM delivery",
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+)
+
+# ผลพิจารณาหนึ่งรายการที่ต้องแจ้งผู้เล่น (guild_id ใช้หา Member ตอนส่ง)
+Notice = collections.namedtuple("Notice", "guild_id status sheet_name quest_title")
+
+
+# DM หนึ่งข้อความมาจากกิลด์ของผลแรก (ผลที่รวมกันส่วนใหญ่มาจากกิลด์เดียวกัน)
+_GUILD_FILTER = " WHERE json_extract(notices, '$[0].guild_id') = ?"
+
+
+class MemberMissing(Exception):
+    """ผู้เล่นออกจากเซิร์ฟเวอร์ไปแล้ว ไม่ต้องลองส่งใหม่"""
+
+
+class DMDispatcher:
+    """ส่ง DM ผลพิจารณาเบื้องหลัง แทนการรอ member.send ใน handler ของปุ่ม
+    ผลของผู้เล่นคนเดียวกันที่มาภายใน window วินาทีรวมเป็น DM เดียว ส่งพร้อมกันไม่เกิน concurrency คน
+    และไม่เกิน per_minute ข้อความต่อนาที DM ที่ส่งไม่สำเร็จบันทึกลง SQLite ให้แอดมินตามแจ้งเอง"""
+
+    def __init__(self, conn, deliver, window=3.0, concurrency=2, per_minute=30, max_attempts=3):
+        self.conn = conn
+        self.deliver = deliver  # async (user_id, [Notice]) → ส่ง DM หนึ่งข้อความ
+        self.window = window
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._queued = {}  # user id → [Notice] ที่รอรวมกันอยู่
+        self._first_at = {}
+        self._timers = {}
+        self._tasks = set()
+        self._slots = asyncio.Semaphore(concurrency)
+        self._quota = TokenBucket(per_minute, capacity=concurrency)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS dm_failures ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " user_id INTEGER NOT NULL,"
+            " notices TEXT NOT NULL,"
+            " error TEXT NOT NULL,"
+            " failed_at REAL NOT NULL)"
+        )
+
+    def enqueue(self, user_id, notice):
+        # ✅ คืนทันที (ไม่มี I/O) ผลแรกของผู้เล่นตั้งเวลาส่ง ผลถัดมาใน window ต่อท้ายรายการเดิม
+        notices = self._queued.get(user_id)
+        if notices is not None:
+            notices.append(notice)
+            DM_MERGED.inc()
+            return
+        self._queued[user_id] = [notice]
+        self._first_at[user_id] = time.monotonic()
+        self._timers[user_id] = asyncio.get_running_loop().call_later(self.window, self._dispatch, user_id)
+
+    def _dispatch(self, user_id):
+        self._timers.pop(user_id, None)
+        notices = self._queued.pop(user_id, None)
+        if not notices:
+            return
+        task = asyncio.create_task(self._send(user_id, notices, self._first_at.pop(user_id)), name=f"dm:{user_id}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, user_id, notices, first_at):
+        async with self._slots:
+            for attempt in range(self.max_attempts):
+                await self._quota.acquire()
+                try:
+                    await self.deliver(user_id, notices)
+                except (discord.Forbidden, MemberMissing) as e:
+                    # ❗ ปิดรับ DM / ออกจากเซิร์ฟเวอร์ ส่งใหม่ก็ไม่ผ่าน
+                    return self.record_failure(user_id, notices, e)
+                except (discord.HTTPException, OSError) as e:
+                    # 🔄 429 ที่หลุดจาก discord.py / Discord ล่มชั่วคราว → รอตาม retry_after หรือ backoff แล้วลองใหม่
+                    if attempt + 1 == self.max_attempts:
+                        return self.record_failure(user_id, notices, e)
+                    await asyncio.sleep(getattr(e, "retry_after", None) or backoff_delay(attempt))
+                except Exception as e:
+                    return self.record_failure(user_id, notices, e)
+                else:
+                    DM_SENT.inc(outcome="sent")
+                    DM_DELAY.observe(time.monotonic() - first_at)
+                    return
+
+    def record_failure(self, user_id, notices, error):
+        DM_SENT.inc(outcome="failed")
+        log.warning("❗ ส่ง DM ผลพิจารณาให้ %s ไม่สำเร็จ (%s รายการ): %s", user_id, len(notices), error)
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO dm_failures (user_id, notices, error, failed_at) VALUES (?, ?, ?, ?)",
+                (user_id, json.dumps([n._asdict() for n in notices], ensure_ascii=False),
+                 f"{type(error).__name__}: {error}", time.time())
+            )
+
+    def failures(self, limit=10, guild_id=None):
+        # 📋 DM ที่ส่งไม่สำเร็จล่าสุด (เฉพาะกิลด์ถ้าระบุ guild_id) → [(user_id, [Notice], error, failed_at)]
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT user_id, notices, error, failed_at FROM dm_failures"
+                f"{_GUILD_FILTER if guild_id is not None else ''} ORDER BY id DESC LIMIT ?",
+                (*(() if guild_id is None else (guild_id,)), limit)
+            ).fetchall()
+        return [(user_id, [Notice(**n) for n in json.loads(notices)], error, failed_at)
+                for user_id, notices, error, failed_at in rows]
+
+    def failure_count(self, guild_id=None):
+        with self._lock:
+            if guild_id is None:
+                return self.conn.execute("SELECT COUNT(*) FROM dm_failures").fetchone()[0]
+            return self.conn.execute(f"SELECT COUNT(*) FROM dm_failures{_GUILD_FILTER}", (guild_id,)).fetchone()[0]
+
+    def queued(self):
+        return sum(map(len, self._queued.values()))
+
+    async def flush(self):
+        # ส่งที่รอรวมอยู่ทันที (ไม่รอครบ window) แล้วรอจนส่งเสร็จ ใช้ตอนปิดบอทและใน bench
+        for timer in self._timers.values():
+            timer.cancel()
+        for user_id in list(self._queued):
+            self._dispatch(user_id)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
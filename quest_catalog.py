@@ -0,0 +1,219 @@
+import bisect
+import re
+import threading
+import time
+import zlib
+
+def a1_range(sheet_name, cells):
+    # ชื่อชีทที่มีช่องว่าง/จุด ต้องครอบด้วย ' และ escape ' ภายในชื่อ
+    return "'{}'!{}".format(sheet_name.replace("'", "''"), cells)
+
+
+def _title_tag(title):
+    # ลายเซ็นสั้นของชื่อเควส ใช้ตรวจว่า ref ยังชี้เควสเดิม
+    return format(zlib.crc32(title.encode("utf-8")), "08x")
+
+
+def _normalize(text):
+    return " ".join(text.casefold().split())
+
+
+class QuestSearchIndex:
+    """ดัชนีค้นหาชื่อเควส: prefix ของชื่อ/คำ ด้วย bisect และ substring ด้วย trigram"""
+
+    def __init__(self, quests_by_sheet):
+        # entries[i] = (sheet_name, position ในชีท, ชื่อเควส)
+        self.entries = []
+        self.normalized = []
+        for sheet_name, quests in quests_by_sheet.items():
+            for position, title in enumerate(quests):
+                self.entries.append((sheet_name, position, title))
+                self.normalized.append(_normalize(title))
+
+        self._titles = sorted((text, i) for i, text in enumerate(self.normalized))
+        self._words = sorted(
+            (text[word.start():], i)
+            for i, text in enumerate(self.normalized)
+            for word in re.finditer(r"\w+", text)
+        )
+        self._trigrams = {}
+        for i, text in enumerate(self.normalized):
+            for gram in {text[j:j + 3] for j in range(len(text) - 2)}:
+                self._trigrams.setdefault(gram, []).append(i)
+
+    @staticmethod
+    def _prefix(sorted_pairs, query):
+        start = bisect.bisect_left(sorted_pairs, (query,))
+        for text, i in sorted_pairs[start:]:
+            if not text.startswith(query):
+                break
+            yield i
+
+    def _substring(self, query):
+        if len(query) < 3:
+            return
+        grams = {query[j:j + 3] for j in range(len(query) - 2)}
+        postings = [self._trigrams.get(gram) for gram in grams]
+        if not all(postings):
+            return
+        postings.sort(key=len)
+        for i in postings[0]:
+            if query in self.normalized[i]:
+                yield i
+
+    def search(self, query, limit=25):
+        # ✅ เรียงผล: ขึ้นต้นด้วยคำค้น → มีคำที่ขึ้นต้นด้วยคำค้น → มีคำค้นอยู่ตรงไหนก็ได้
+        query = _normalize(query)
+        if not query:
+            candidates = iter(range(len(self.entries)))
+        else:
+            candidates = _chain(self._prefix(self._titles, query), self._prefix(self._words, query), self._substring(query))
+
+        results = []
+        seen = set()
+        for i in candidates:
+            if i in seen:
+                continue
+            seen.add(i)
+            results.append(self.entries[i])
+            if len(results) >= limit:
+                break
+        return results
+
+
+def _chain(*iterables):
+    for iterable in iterables:
+        yield from iterable
+
+
+class QuestCatalog:
+    """แคชรายการเควสของทุกชีทไว้ในหน่วยความจำ โหลดด้วย batchGet ครั้งเดียว"""
+
+    def __init__(self, sheet_names, ttl=300):
+        self.sheet_names = list(sheet_names)
+        self.ttl = ttl
+        self._quests = {}
+        self._index = QuestSearchIndex({})
+        self._sheet_indexes = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        # ✅ True = ข้อมูลมาจากสำเนาในเครื่อง (ตอนเริ่มบอท) ยังไม่ได้อ่านจากชีทจริง
+        self.from_snapshot = False
+
+        # 📊 ตัวนับสำหรับดูประสิทธิภาพแคช
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    @property
+    def loaded(self):
+        return self._loaded_at is not None
+
+    def is_stale(self):
+        return not self.loaded or self.from_snapshot or time.monotonic() - self._loaded_at >= self.ttl
+
+    def load(self, spreadsheet):
+        # 🔄 อ่านคอลัมน์ A ของทุกชีทในคำขอเดียว (values:batchGet)
+        ranges = [a1_range(name, "A:A") for name in self.sheet_names]
+        try:
+            result = spreadsheet.values_batch_get(ranges)
+        except Exception:
+            self.refresh_errors += 1
+            raise
+
+        quests = {}
+        for name, value_range in zip(self.sheet_names, result.get("valueRanges", [])):
+            values = value_range.get("values", [])
+            quests[name] = [row[0] for row in values[1:] if row and row[0].strip()]
+
+        self._apply(quests)
+        self.refreshes += 1
+        return quests
+
+    def restore(self, quests):
+        # 💾 โหลดจากสำเนาที่บันทึกไว้ ใช้ให้บริการไปก่อนจนกว่าจะอ่านชีทจริงได้ (is_stale() เป็น True เสมอ)
+        self._apply({name: list(quests[name]) for name in self.sheet_names if name in quests}, from_snapshot=True)
+
+    def snapshot(self):
+        return dict(self._quests)
+
+    def set_sheets(self, sheet_names):
+        # 🔄 รายชื่อชีทเปลี่ยนตามค่าตั้ง: ถือว่าแคชหมดอายุ รอบรีเฟรชถัดไปจะอ่านชุดใหม่
+        sheet_names = list(sheet_names)
+        if sheet_names == self.sheet_names:
+            return False
+        self.sheet_names = sheet_names
+        if self.loaded:
+            self._loaded_at = time.monotonic() - self.ttl
+        return True
+
+    def _apply(self, quests, from_snapshot=False):
+        index = QuestSearchIndex(quests)
+        sheet_indexes = {name: QuestSearchIndex({name: q}) for name, q in quests.items()}
+        with self._lock:
+            self._quests = quests
+            self._index = index
+            self._sheet_indexes = sheet_indexes
+            self._loaded_at = time.monotonic()
+            self.from_snapshot = from_snapshot
+
+    def get(self, sheet_name):
+        quests = self._quests.get(sheet_name)
+        if quests is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return quests
+
+    def put(self, sheet_name, quests):
+        # ใช้ตอนแคชพลาด แล้วไปอ่านชีทนั้นตรงๆ มาแทน
+        with self._lock:
+            self._quests = {**self._quests, sheet_name: list(quests)}
+            self._index = QuestSearchIndex(self._quests)
+            self._sheet_indexes = {**self._sheet_indexes, sheet_name: QuestSearchIndex({sheet_name: quests})}
+
+    def search(self, query, sheet_name=None, limit=25):
+        # 🔍 ค้นเฉพาะหัวข้อใช้ดัชนีของชีทนั้น ไม่ต้องกรองผลจากทุกชีท
+        index = self._index if sheet_name is None else self._sheet_indexes.get(sheet_name)
+        return index.search(query, limit) if index else []
+
+    def quest_ref(self, sheet_name, position):
+        # 🔖 อ้างอิงเควสแบบสั้น "ลำดับชีท:ลำดับแถว:ลายเซ็นชื่อ" ให้พอดีกับ value ของ Discord (≤ 100 ตัวอักษร)
+        # ชีทที่ไม่อยู่ในค่าตั้งแล้ว (put() จาก panel เก่า / หลัง set_sheets) อ้างอิงไม่ได้ คืน None
+        if sheet_name not in self.sheet_names:
+            return None
+        try:
+            title = self._quests[sheet_name][position]
+        except (KeyError, IndexError):
+            return None
+        return f"{self.sheet_names.index(sheet_name)}:{position}:{_title_tag(title)}"
+
+    def resolve_ref(self, ref):
+        # ✅ ลำดับแถวอาจเลื่อนหลังโหลดแคชใหม่: ใช้ได้เมื่อชื่อตรงกับลายเซ็นเท่านั้น ถ้าเลื่อนก็หาชื่อเดิมในชีทเดียวกัน
+        try:
+            sheet_pos, position, tag = ref.split(":")
+            sheet_name = self.sheet_names[int(sheet_pos)]
+            quests = self._quests[sheet_name]
+            position = int(position)
+        except (ValueError, IndexError, KeyError):
+            return None
+        if 0 <= position < len(quests) and _title_tag(quests[position]) == tag:
+            return sheet_name, quests[position]
+        for title in quests:
+            if _title_tag(title) == tag:
+                return sheet_name, title
+        return None
+
+    def stats(self):
+        age = None if self._loaded_at is None else time.monotonic() - self._loaded_at
+        return {
+            "sheets": len(self._quests),
+            "quests": sum(len(q) for q in self._quests.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "age_seconds": age,
+            "from_snapshot": self.from_snapshot,
+        }
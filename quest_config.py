@@ -0,0 +1,178 @@
+import json
+import os
+import threading
+import types
+from collections import namedtuple
+
+try:
+    import yaml  # ไม่บังคับ: ใช้เมื่ออยากเขียนไฟล์ตั้งค่าเป็น YAML
+except ImportError:
+    yaml = None
+
+from role_index import ROLE_RULES_PATH, load_rules, validate_rules
+
+# ✅ หัวข้อเควสเริ่มต้น (ตรงกับแผงเดิม) ใช้เมื่อไม่มีไฟล์ตั้งค่า หรือไฟล์ไม่ได้กำหนด topics
+DEFAULT_TOPICS = [
+    {"name": "BeginnerQuests", "label": "🧭 เควสเริ่มต้น", "style": "primary", "row": 0},
+    {"name": "ProcessQuests", "label": "⚙️ PROCESS", "style": "danger", "row": 1},
+    {"name": "LaborQuests_Lv1", "label": "🔧 อาชีพ Lv.1", "style": "success", "row": 3},
+    {"name": "LaborQuests_Lv2", "label": "🔨 อาชีพ Lv.2", "style": "success", "row": 3},
+    {"name": "LaborQuests_Lv3", "label": "⛏️ อาชีพ Lv.3", "style": "success", "row": 3},
+    {"name": "MOONLOCK Lv.1", "label": "🌕 MOONLOCK Lv.1", "style": "secondary", "row": 2},
+]
+
+STYLES = ("primary", "secondary", "success", "danger")
+
+Topic = namedtuple("Topic", "name label style row")
+
+
+class ConfigError(ValueError):
+    pass
+
+
+class QuestConfig:
+    """ค่าตั้งที่ตรวจแล้ว อยู่ในรูปตารางอ่านอย่างเดียว (tuple / MappingProxyType) สลับทั้งก้อนได้โดยไม่ต้องล็อกตอนอ่าน
+    quests/roles เป็น None ถ้าแหล่งตั้งค่าไม่มีข้อมูลส่วนนั้น (ใช้จากชีทอย่างเดียว)"""
+
+    def __init__(self, topics, quests, roles, supersede, source):
+        self.topics = topics
+        self.topic_names = tuple(topic.name for topic in topics)
+        self.by_name = types.MappingProxyType({topic.name: topic for topic in topics})
+        self.quests = quests
+        self.roles = roles
+        self.supersede = supersede
+        self.source = source
+
+    def stats(self):
+        return {
+            "source": self.source,
+            "topics": len(self.topics),
+            "quests": sum(map(len, self.quests.values())) if self.quests is not None else None,
+            "roles": sum(map(len, self.roles.values())) if self.roles is not None else None,
+        }
+
+
+def compile_config(raw, source="default"):
+    # ✅ ตรวจความถูกต้องทั้งหมดก่อน (ผิดตรงไหนแจ้งทันที ไม่สลับไปใช้ค่าที่พัง) แล้วแปลงเป็นตารางอ่านอย่างเดียว
+    topics = []
+    rows = {}
+    for entry in raw.get("topics") or DEFAULT_TOPICS:
+        name = entry.get("name")
+        if not name or not isinstance(name, str):
+            raise ConfigError(f"หัวข้อต้องมี name: {entry}")
+        if name in {topic.name for topic in topics}:
+            raise ConfigError(f"หัวข้อซ้ำ: {name}")
+        if len(f"sheet_{name}") > 100:
+            raise ConfigError(f"ชื่อหัวข้อยาวเกินไป: {name}")
+        label = entry.get("label") or name
+        if len(label) > 80:
+            raise ConfigError(f"label ของ {name} ยาวเกิน 80 ตัวอักษร")
+        style = entry.get("style", "primary")
+        if style not in STYLES:
+            raise ConfigError(f"style ของ {name} ต้องเป็นหนึ่งใน {', '.join(STYLES)}")
+        row = entry.get("row")
+        if row is not None:
+            if not isinstance(row, int) or not 0 <= row <= 4:
+                raise ConfigError(f"row ของ {name} ต้องอยู่ระหว่าง 0-4")
+            rows[row] = rows.get(row, 0) + 1
+            if rows[row] > 5:
+                raise ConfigError(f"แถว {row} มีปุ่มเกิน 5 ปุ่ม")
+        topics.append(Topic(name, label, style, row))
+    if len(topics) > 25:
+        raise ConfigError("หัวข้อเกิน 25 หัวข้อ (แผงหนึ่งข้อความมีปุ่มได้ไม่เกิน 25 ปุ่ม)")
+
+    quests = raw.get("quests")
+    if quests is not None:
+        if not isinstance(quests, dict) or not all(isinstance(titles, list) for titles in quests.values()):
+            raise ConfigError("quests ต้องเป็น {หัวข้อ: [ชื่อเควส, ...]}")
+        quests = types.MappingProxyType({
+            name: tuple(str(title) for title in titles if str(title).strip()) for name, titles in quests.items()
+        })
+
+    roles = raw.get("roles")
+    if roles is not None:
+        if not isinstance(roles, dict):
+            raise ConfigError("roles ต้องเป็น {\"Role_xxx\": [[ชื่อเควส, role id], ...]}")
+        for title, entries in roles.items():
+            if not isinstance(entries, list) or not all(isinstance(entry, (list, tuple)) for entry in entries):
+                raise ConfigError(f"แถว Role ใน {title} ต้องเป็น [ชื่อเควส, role id]")
+        # แถวที่ role id ผิดรูปแบบ RoleIndex ข้ามพร้อมเตือน (เหมือนตอนอ่านจากชีท)
+        roles = types.MappingProxyType({title: tuple(tuple(map(str, entry)) for entry in entries) for title, entries in roles.items()})
+
+    supersede = raw.get("supersede")
+    if supersede is None:
+        supersede = load_rules(ROLE_RULES_PATH)
+    else:
+        validate_rules(supersede)
+    return QuestConfig(tuple(topics), quests, roles, supersede, source)
+
+
+def read_file(path):
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise ConfigError("ไฟล์ตั้งค่า YAML ต้องติดตั้ง PyYAML (pip install pyyaml)")
+            raw = yaml.safe_load(f) or {}
+        else:
+            raw = json.load(f)
+    if not isinstance(raw, dict):
+        raise ConfigError(f"{path}: ไฟล์ตั้งค่าต้องเป็น object")
+    return raw
+
+
+class ConfigStore:
+    """ที่อยู่ของค่าตั้งปัจจุบัน โหลดจากไฟล์ (QUEST_CONFIG) ทับสำเนาชีทล่าสุดใน SnapshotStore
+    load() ไม่มี network I/O เรียกซ้ำเมื่อไฟล์เปลี่ยนเพื่อสลับค่าใหม่ทั้งก้อนโดยไม่ต้องรีสตาร์ท"""
+
+    def __init__(self, path=None, snapshots=None):
+        self.path = path
+        self.snapshots = snapshots
+        self.current = compile_config({})
+        self._mtime = None
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def _raw(self):
+        # 💾 ชั้นล่าง: สำเนาชีทเควส/Role ที่บันทึกไว้ → ชั้นบน: ไฟล์ตั้งค่า (คีย์ที่มีในไฟล์ชนะ)
+        raw, source = {}, "default"
+        if self.snapshots is not None:
+            quests, _ = self.snapshots.load("quest_catalog")
+            roles, _ = self.snapshots.load("role_sheets")
+            if quests:
+                raw["quests"] = quests
+                source = "snapshot"
+            if roles:
+                raw["roles"] = roles
+                source = "snapshot"
+        if self.path:
+            raw.update(read_file(self.path))
+            source = self.path
+        return raw, source
+
+    def load(self):
+        with self._lock:
+            mtime = os.path.getmtime(self.path) if self.path else None
+            raw, source = self._raw()
+            self.current = compile_config(raw, source)
+            self._mtime = mtime
+            self.reloads += 1
+        return self.current
+
+    def changed(self):
+        # ตรวจแค่เวลาแก้ไขไฟล์ (os.stat) เรียกถี่ได้
+        if not self.path:
+            return False
+        try:
+            return os.path.getmtime(self.path) != self._mtime
+        except OSError:
+            return False
+
+
+def export_config(config, quests, roles):
+    # 📤 ค่าตั้งปัจจุบัน + ข้อมูลเควส/Role ล่าสุดจากชีท ใช้เป็นไฟล์ QUEST_CONFIG ได้ทันที
+    return {
+        "topics": [topic._asdict() for topic in config.topics],
+        "quests": {name: list(titles) for name, titles in quests.items()},
+        "roles": {title: [list(row) for row in rows] for title, rows in roles.items()},
+        "supersede": config.supersede,
+    }
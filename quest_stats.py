@@ -0,0 +1,65 @@
+import collections
+import heapq
+import threading
+
+from submission_store import APPROVED, REJECTED
+
+
+class QuestStats:
+    """สถิติสะสมของผลพิจารณา อัปเดต O(1) ต่อหนึ่งผล (นับเพิ่มใน dict) ไม่ต้องไล่ชีท log ใหม่ทุกครั้ง
+    สร้างใหม่ทั้งหมดได้ด้วยการไล่ผลพิจารณาครั้งเดียว (rebuild รับ iterable จึงไม่ต้องโหลดทั้งชีทค้างไว้)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.totals = collections.Counter()                      # status → จำนวน
+        self.by_topic = collections.defaultdict(collections.Counter)  # ชีท → status → จำนวน
+        self.by_player = collections.Counter()                   # user id → เควสที่ผ่าน
+        self.by_reviewer = collections.Counter()                 # user id แอดมิน → จำนวนที่พิจารณา
+        self.version = 0
+
+    def add(self, user_id, sheet_name, status, reviewer_id=None):
+        with self._lock:
+            self.totals[status] += 1
+            self.by_topic[sheet_name][status] += 1
+            if status == APPROVED:
+                self.by_player[user_id] += 1
+            if reviewer_id:
+                self.by_reviewer[reviewer_id] += 1
+            self.version += 1
+
+    def rebuild(self, decisions):
+        # 🔄 decisions = iterable ของ (user_id, sheet_name, status, reviewer_id) สร้างชุดใหม่แล้วสลับทีเดียว
+        fresh = QuestStats()
+        for user_id, sheet_name, status, reviewer_id in decisions:
+            fresh.add(user_id, sheet_name, status, reviewer_id)
+        with self._lock:
+            self.totals = fresh.totals
+            self.by_topic = fresh.by_topic
+            self.by_player = fresh.by_player
+            self.by_reviewer = fresh.by_reviewer
+            self.version += 1
+        return fresh.decided()
+
+    def decided(self):
+        return self.totals[APPROVED] + self.totals[REJECTED]
+
+    def approval_rate(self, counts=None):
+        counts = self.totals if counts is None else counts
+        decided = counts[APPROVED] + counts[REJECTED]
+        return counts[APPROVED] / decided if decided else None
+
+    def top_players(self, n=10):
+        # heapq.nlargest: O(ผู้เล่น · log n) เฉพาะตอนมีคนเรียกดู ไม่ใช่ตอนบันทึก
+        with self._lock:
+            return heapq.nlargest(n, self.by_player.items(), key=lambda item: item[1])
+
+    def top_reviewers(self, n=10):
+        with self._lock:
+            return heapq.nlargest(n, self.by_reviewer.items(), key=lambda item: item[1])
+
+    def topics(self):
+        with self._lock:
+            return {sheet_name: collections.Counter(counts) for sheet_name, counts in self.by_topic.items()}
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from quest_catalog import a1_range
+
+log = logging.getLogger(__name__)
+
+ROLE_SHEET_PREFIX = "Role_"
+
+# ✅ กฎการลบ Role เก่าเมื่อได้รับ Role ใหม่ อ่านจากไฟล์ (เช่น Lv3 ทับ Lv1/Lv2, No_5 ทับ No_1-No_4)
+ROLE_RULES_PATH = os.getenv("ROLE_RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "role_rules.json"))
+
+
+def quest_key(title):
+    # "No_1 (ชื่อเควส)" → "No_1"
+    return title.split("(")[0].strip()
+
+
+def load_rules(path=ROLE_RULES_PATH):
+    with open(path, encoding="utf-8") as f:
+        return validate_rules(json.load(f).get("supersede", []))
+
+
+def validate_rules(rules):
+    for rule in rules:
+        if "role_sheet" not in rule or not rule.get("removes"):
+            raise ValueError(f"กฎ Role ไม่ครบ (ต้องมี role_sheet และ removes): {rule}")
+        for target in rule["removes"]:
+            if "role_sheet" not in target:
+                raise ValueError(f"กฎ Role ไม่ครบ (removes ต้องมี role_sheet): {rule}")
+    return rules
+
+
+def _matches(selector, key):
+    prefix = selector.get("quest_prefix")
+    exclude = selector.get("exclude_prefix")
+    if prefix and not key.startswith(prefix):
+        return False
+    if exclude and key.startswith(exclude):
+        return False
+    return True
+
+
+class _RoleSnapshot:
+    def __init__(self, role_by_key, superseded, digest, sheets=None):
+        self.role_by_key = role_by_key
+        self.superseded = superseded
+        self.digest = digest
+        self.sheets = sheets or {}
+
+
+class RoleIndex:
+    """ดัชนี quest → role id และชุด Role ที่ถูกแทนที่ สร้างครั้งเดียวจากชีท Role_*"""
+
+    def __init__(self, rules=None):
+        self.rules = load_rules() if rules is None else rules
+        self._snapshot = _RoleSnapshot({}, {}, None)
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+        self.from_snapshot = False
+
+    @property
+    def loaded(self):
+        return self._snapshot.digest is not None
+
+    def rebuild(self, spreadsheet):
+        # 🔄 อ่านทุกชีท Role_* ด้วย batchGet ครั้งเดียว
+        titles = [ws.title for ws in spreadsheet.worksheets() if ws.title.startswith(ROLE_SHEET_PREFIX)]
+        result = spreadsheet.values_batch_get([a1_range(title, "A:B") for title in titles])
+        sheets = {}
+        for title, value_range in zip(titles, result.get("valueRanges", [])):
+            sheets[title] = value_range.get("values", [])[1:]
+        changed = self.build(sheets)
+        self.from_snapshot = False
+        return changed
+
+    def restore(self, sheets):
+        # 💾 สร้างดัชนีจากสำเนาชีท Role ที่บันทึกไว้ (ใช้ตอนเริ่มบอทก่อนอ่านชีทจริงได้)
+        self.build(sheets)
+        self.from_snapshot = True
+
+    def snapshot(self):
+        return self._snapshot.sheets
+
+    def set_rules(self, rules):
+        # 🔄 เปลี่ยนกฎแทนที่ Role (จากไฟล์ตั้งค่า) แล้วสร้างดัชนีใหม่จากข้อมูลชีทชุดเดิม
+        self.rules = rules
+        if self.loaded:
+            self.build(self._snapshot.sheets)
+
+    def build(self, sheets):
+        # sheets = {"Role_xxx": [[quest, role_id], ...]} เรียงตามลำดับชีทใน Spreadsheet
+        digest = hashlib.sha1(json.dumps([self.rules, sheets]).encode("utf-8")).hexdigest()
+        if digest == self._snapshot.digest:
+            return False
+
+        role_by_key = {}
+        roles_by_sheet = {}
+        for title, rows in sheets.items():
+            entries = []
+            for row in rows:
+                if len(row) < 2:
+                    continue
+                try:
+                    role_id = int(row[1])
+                except ValueError:
+                    log.warning("❗ อ่าน Role ID ผิดพลาดจาก %s: %r", title, row[1])
+                    continue
+                key = quest_key(row[0])
+                entries.append((key, role_id))
+                # ✅ ชีทแรกที่เจอชนะ (เหมือนการไล่หาแบบเดิม)
+                role_by_key.setdefault(key, role_id)
+            roles_by_sheet[title] = entries
+
+        superseded = {}
+        for rule in self.rules:
+            old_ids = {
+                role_id
+                for target in rule["removes"]
+                for key, role_id in roles_by_sheet.get(target["role_sheet"], [])
+                if _matches(target, key)
+            }
+            for key, role_id in roles_by_sheet.get(rule["role_sheet"], []):
+                if _matches(rule, key):
+                    superseded.setdefault(role_id, set()).update(old_ids - {role_id})
+
+        snapshot = _RoleSnapshot(
+            role_by_key,
+            {role_id: frozenset(ids) for role_id, ids in superseded.items()},
+            digest,
+            sheets
+        )
+        # ✅ สลับทั้งก้อนในครั้งเดียว ผู้อ่านจะไม่เห็นดัชนีที่สร้างไม่เสร็จ
+        with self._lock:
+            self._snapshot = snapshot
+            self.rebuilds += 1
+        return True
+
+    def lookup(self, quest_title):
+        return self._snapshot.role_by_key.get(quest_key(quest_title))
+
+    def superseded_by(self, role_id):
+        return self._snapshot.superseded.get(role_id, frozenset())
+
+    def final_roles(self, member_roles, new_roles):
+        # ✅ คำนวณชุด Role สุดท้ายของสมาชิก (ลบ Role ที่ถูกแทนที่ + เพิ่ม Role ใหม่) ใช้กับ member.edit ครั้งเดียว
+        # member_roles ต้องเป็นของสด (ดู bot.edit_member_roles) คืน None ถ้าไม่มีอะไรเปลี่ยน จะได้ไม่ต้องเรียก API
+        new_ids = {role.id for role in new_roles}
+        removed = set()
+        for role in new_roles:
+            removed |= self.superseded_by(role.id)
+        removed -= new_ids
+
+        current = [role for role in member_roles if not role.is_default()]
+        final = [role for role in current if role.id not in removed]
+        final_ids = {role.id for role in final}
+        final += [role for role in new_roles if role.id not in final_ids]
+        if len(final) == len(current) and {role.id for role in final} == {role.id for role in current}:
+            return None
+        return final
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "quests": len(snapshot.role_by_key),
+            "superseding_roles": len(snapshot.superseded),
+            "rebuilds": self.rebuilds,
+        }
@@ -0,0 +1,131 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import Counter, Histogram
+from sheets_quota import (
+    TokenBucket, CircuitBreaker, backoff_delay, LANES, RETRYABLE_CODES, OPEN,
+    PRIORITY_WRITE, PRIORITY_READ
+)
+
+SHEETS_CALLS = Counter("deena_sheets_calls_total", "Google Sheets calls", ("op", "outcome"))
+SHEETS_LATENCY = Histogram("deena_sheets_call_seconds", "Google Sheets call latency", ("op",))
+SHEETS_RETRIES = Counter("deena_sheets_retries_total", "Google Sheets calls retried after a transient error", ("op",))
+SHEETS_QUOTA_WAIT = Histogram(
+    "deena_sheets_quota_wait_seconds", "Time spent waiting for a Sheets quota token", ("lane",),
+    buckets=(0.01, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+SHEETS_REJECTED = Counter("deena_sheets_rejected_total", "Sheets calls refused while the circuit breaker was open", ("lane",))
+
+
+class SheetsTimeout(Exception):
+    pass
+
+
+class SheetsUnavailable(Exception):
+    """วงจรเปิดอยู่ (Sheets ล้มเหลวติดกัน) ผู้เรียกควรใช้ข้อมูลในแคชแทน"""
+
+
+def is_transient(error):
+    # โควตาเต็ม / Google ล่มชั่วคราว / เครือข่ายหลุด / หมดเวลา → นับเป็น Sheets ไม่พร้อม
+    if isinstance(error, (SheetsTimeout, OSError)):
+        return True
+    return getattr(error, "code", None) in RETRYABLE_CODES
+
+
+class AsyncSheets:
+    """เรียก gspread (HTTP แบบ blocking) ผ่าน thread pool ที่จำกัดขนาด เพื่อไม่ให้ event loop ค้าง
+    ทุกคำขอผ่านตัวคุมโควตา: token bucket แยกอ่าน/เขียน, ลองใหม่แบบ backoff และ circuit breaker"""
+
+    def __init__(self, max_workers=4, timeout=15.0, reads_per_minute=60, writes_per_minute=60,
+                 max_retries=4, breaker_threshold=5, breaker_cooldown=30.0):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sheets")
+        self.in_flight = 0
+        self.read_quota = TokenBucket(reads_per_minute)
+        self.write_quota = TokenBucket(writes_per_minute)
+        self.max_retries = max_retries
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+
+    @property
+    def healthy(self):
+        return self.breaker.state != OPEN
+
+    async def call(self, func, *args, timeout=None, priority=PRIORITY_READ, cost=1, **kwargs):
+        # 🚦 priority: PRIORITY_WRITE ใช้โควตาเขียน ที่เหลือใช้โควตาอ่าน (คิวเรียงตามความสำคัญ)
+        # cost: จำนวนคำขอ HTTP ที่ func ยิงจริง (เช่น worksheets() + batchGet = 2)
+        op = getattr(func, "__name__", "call")
+        lane = LANES.get(priority, "read")
+        quota = self.write_quota if priority == PRIORITY_WRITE else self.read_quota
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                SHEETS_REJECTED.inc(lane=lane)
+                raise SheetsUnavailable(f"Google Sheets ไม่พร้อมชั่วคราว (ลองใหม่ใน {self.breaker.retry_after():.0f} วินาที)")
+            started = time.perf_counter()
+            try:
+                await quota.acquire(priority, cost)
+                SHEETS_QUOTA_WAIT.observe(time.perf_counter() - started, lane=lane)
+                result = await self._run(op, func, args, kwargs, timeout)
+            except asyncio.CancelledError:
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                if not is_transient(e):
+                    self.breaker.success()  # Sheets ตอบกลับปกติ แค่คำขอผิด (เช่นไม่พบชีท)
+                    raise
+                self.breaker.failure()
+                # ⏱️ หมดเวลาไม่ลองซ้ำ: thread เดิมอาจยังเขียนอยู่ และผู้เรียกรอมานานพอแล้ว
+                if isinstance(e, SheetsTimeout) or attempt >= self.max_retries:
+                    raise
+                SHEETS_RETRIES.inc(op=op)
+                await asyncio.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+            self.breaker.success()
+            return result
+
+    async def _run(self, op, func, args, kwargs, timeout):
+        # ⏱️ timeout ฝั่ง asyncio: ผู้เรียกเลิกรอได้ แต่ thread จะทำงานต่อจนจบ
+        # (ตั้ง HTTP timeout ของ gspread ให้ใกล้เคียงกันด้วย client.set_timeout)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+        self.in_flight += 1
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            return await asyncio.wait_for(future, timeout or self.timeout)
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise SheetsTimeout(f"{op} ใช้เวลาเกิน {timeout or self.timeout} วินาที") from None
+        except Exception as e:
+            outcome = str(getattr(e, "code", "error"))
+            raise
+        finally:
+            self.in_flight -= 1
+            SHEETS_LATENCY.observe(time.perf_counter() - started, op=op)
+            SHEETS_CALLS.inc(op=op, outcome=outcome)
+
+    # ✅ ทางลัดสำหรับคำสั่งที่บอทใช้บ่อย
+    async def append_row(self, worksheet, values):
+        return await self.call(worksheet.append_row, values, priority=PRIORITY_WRITE)
+
+    async def append_rows(self, worksheet, rows):
+        return await self.call(worksheet.append_rows, rows, priority=PRIORITY_WRITE)
+
+    async def col_values(self, worksheet, col):
+        return await self.call(worksheet.col_values, col)
+
+    async def worksheet(self, spreadsheet, title):
+        return await self.call(spreadsheet.worksheet, title)
+
+    async def worksheets(self, spreadsheet):
+        return await self.call(spreadsheet.worksheets)
+
+    async def get_all_values(self, worksheet):
+        return await self.call(worksheet.get_all_values)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,129 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+
+# 🚦 ลำดับความสำคัญของคำขอ (เลขน้อยได้ก่อน): เขียน log > อ่านตามคำขอผู้ใช้ > รีเฟรชเบื้องหลัง
+PRIORITY_WRITE = 0
+PRIORITY_READ = 1
+PRIORITY_REFRESH = 2
+
+LANES = {PRIORITY_WRITE: "write", PRIORITY_READ: "read", PRIORITY_REFRESH: "refresh"}
+
+# error code ที่ลองใหม่ได้ (โควตาเต็ม / ฝั่ง Google มีปัญหาชั่วคราว)
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """โควตาต่อนาทีของ Google Sheets ฝั่ง client: เติม rate_per_minute โทเคนต่อนาที สะสมได้ไม่เกิน capacity
+    คำขอที่รอถูกปล่อยตามลำดับความสำคัญ (heap) ไม่ใช่ตามลำดับที่มาถึง"""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._waiters = []
+        self._seq = itertools.count()
+        self._timer = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, priority=PRIORITY_READ, cost=1):
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), min(cost, self.capacity), future))
+        self._wake()
+        await future
+
+    def available(self):
+        self._refill()
+        return self.tokens
+
+    def waiting(self):
+        return sum(1 for *_, future in self._waiters if not future.done())
+
+    def _wake(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._refill()
+        while self._waiters:
+            priority, seq, cost, future = self._waiters[0]
+            if future.done():  # ผู้รอถูกยกเลิก (timeout/cancel) ไปแล้ว
+                heapq.heappop(self._waiters)
+                continue
+            if self.tokens < cost:
+                break
+            heapq.heappop(self._waiters)
+            self.tokens -= cost
+            future.set_result(None)
+        if self._waiters:
+            # ⏱️ ตั้งเวลาปลุกครั้งเดียวตอนโทเคนพอสำหรับคำขอแรกในคิว
+            delay = max(0.0, (self._waiters[0][2] - self.tokens) / self.rate)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._wake)
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """ตัดวงจรเมื่อ Sheets ล้มเหลวติดกันหลายครั้ง: ระหว่างเปิดวงจรจะปฏิเสธทันทีโดยไม่ยิง API
+    ครบ cooldown แล้วปล่อยคำขอทดลองทีละหนึ่ง ถ้าผ่านก็ปิดวงจร"""
+
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trips = 0
+        self._probing = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return CLOSED
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return HALF_OPEN
+        return OPEN
+
+    def allow(self):
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def retry_after(self):
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def abandon(self):
+        # ผู้เรียกยกเลิกกลางทาง: ไม่นับเป็นผลสำเร็จหรือล้มเหลว แค่ปล่อยสิทธิ์ทดลองคืน
+        self._probing = False
+
+    def failure(self):
+        self.failures += 1
+        # คำขอทดลองล้มเหลว หรือเพิ่งล้มครบเกณฑ์ → เปิดวงจร (เริ่มนับ cooldown ใหม่)
+        if self._probing or (self.opened_at is None and self.failures >= self.threshold):
+            self.opened_at = time.monotonic()
+            self.trips += 1
+        self._probing = False
+
+
+def backoff_delay(attempt, base=1.0, cap=32.0):
+    # exponential backoff แบบ full jitter: สุ่ม 0 ถึง base * 2^attempt (ไม่เกิน cap)
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
@@ -0,0 +1,33 @@
+import json
+import threading
+import time
+
+
+class SnapshotStore:
+    """เก็บสำเนาล่าสุดของข้อมูลที่อ่านจากชีท (รายการเควส, ชีท Role) ไว้ใน SQLite
+    ตอนเริ่มบอทจะได้ให้บริการจากสำเนานี้ได้ทันที แม้ Google Sheets ยังตอบช้าหรือล่ม"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._lock = threading.Lock()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            " name TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " saved_at REAL NOT NULL)"
+        )
+
+    def save(self, name, data):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO snapshots (name, data, saved_at) VALUES (?, ?, ?)",
+                (name, json.dumps(data, ensure_ascii=False), time.time())
+            )
+
+    def load(self, name):
+        # คืน (data, saved_at) หรือ (None, None) ถ้ายังไม่เคยบันทึก
+        with self._lock:
+            row = self.conn.execute("SELECT data, saved_at FROM snapshots WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None, None
+        return json.loads(row[0]), row[1]
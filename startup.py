@@ -0,0 +1,51 @@
+import time
+
+from metrics import Gauge
+
+
+class StartupTracker:
+    """จับเวลาแต่ละขั้นตอนตอนเริ่มบอท (เชื่อม Google, โหลดเควส, ดัชนี Role ฯลฯ)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.finished_at = None
+
+    async def stage(self, name, coro):
+        # ✅ ขั้นที่ล้มเหลวถูกบันทึกไว้แล้วโยนต่อ ผู้เรียกเลือกเองว่าจะไปต่อหรือหยุด
+        started = time.perf_counter()
+        try:
+            result = await coro
+        except Exception as e:
+            self.stages[name] = {"seconds": time.perf_counter() - started, "ok": False, "error": repr(e)}
+            raise
+        self.stages[name] = {"seconds": time.perf_counter() - started, "ok": True}
+        return result
+
+    def record(self, name, seconds, ok=True):
+        self.stages[name] = {"seconds": seconds, "ok": ok}
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+
+    @property
+    def done(self):
+        return self.finished_at is not None
+
+    def summary(self):
+        total = (self.finished_at or time.perf_counter()) - self.started
+        return {"done": self.done, "total_seconds": round(total, 3), "stages": {
+            name: {**stage, "seconds": round(stage["seconds"], 3)} for name, stage in self.stages.items()
+        }}
+
+
+STARTUP = StartupTracker()
+
+Gauge(
+    "deena_startup_stage_seconds", "Duration of each startup stage",
+    lambda: {(name,): stage["seconds"] for name, stage in STARTUP.stages.items()}, ("stage",)
+)
+Gauge(
+    "deena_startup_stage_ok", "Whether each startup stage succeeded",
+    lambda: {(name,): int(stage["ok"]) for name, stage in STARTUP.stages.items()}, ("stage",)
+)
@@ -0,0 +1,14 @@
+import os
+import sqlite3
+
+# ✅ ไฟล์ฐานข้อมูลในเครื่อง ใช้ร่วมกันทุกส่วน (journal, คำร้อง ฯลฯ)
+DB_PATH = os.getenv("DEENA_DB_PATH", "deena.db")
+
+
+def connect(path=None):
+    conn = sqlite3.connect(path or DB_PATH, isolation_level=None, check_same_thread=False)
+    # WAL: เขียนต่อท้ายเร็ว อ่านพร้อมเขียนได้ และไม่เสียข้อมูลเมื่อโปรเซสตาย
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
@@ -0,0 +1,74 @@
+import collections
+import time
+
+
+class PendingIndex:
+    """คำร้องที่ยังรอพิจารณา จับคู่ด้วย (user id, ชีท, เควส) ไว้กันการส่งซ้ำ
+    ตรวจ/จอง/ปล่อย เป็น O(1) ขนาดจำกัดที่ maxsize (LRU) และหมดอายุเองหลัง ttl วินาที"""
+
+    def __init__(self, ttl=86400, maxsize=10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = collections.OrderedDict()
+        self.duplicates = 0
+
+    @staticmethod
+    def key(user_id, sheet_name, quest_title):
+        return (user_id, sheet_name, quest_title)
+
+    def claim(self, key, created_at=None):
+        # ✅ คืน False ถ้ามีคำร้องเดียวกันค้างอยู่ (ยังไม่หมดอายุ) ไม่อย่างนั้นจองไว้แล้วคืน True
+        now = time.time()
+        expires_at = self._entries.get(key)
+        if expires_at is not None and expires_at > now:
+            self.duplicates += 1
+            return False
+        self._entries[key] = (created_at or now) + self.ttl
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return True
+
+    def release(self, key):
+        # ปล่อยเมื่อคำร้องถูกพิจารณาแล้ว หรือส่งต่อไม่สำเร็จ
+        self._entries.pop(key, None)
+
+    def load(self, pending):
+        # 🔄 เติมจากคำร้อง pending ใน SQLite ตอนเริ่มบอท (ไม่นับเป็นการส่งซ้ำ)
+        for user_id, sheet_name, quest_title, created_at in pending:
+            self._entries[self.key(user_id, sheet_name, quest_title)] = created_at + self.ttl
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class UserThrottle:
+    """จำกัดความถี่การส่งคำร้องต่อผู้ใช้ด้วย token bucket (burst ครั้งติดกัน แล้วเติม 1 ครั้งทุก interval วินาที)
+    เก็บเฉพาะผู้ใช้ที่เพิ่งส่ง (LRU ไม่เกิน maxsize) ถังที่เต็มแล้วลบทิ้งได้เพราะไม่ต่างจากผู้ใช้ใหม่"""
+
+    def __init__(self, burst=3, interval=20.0, maxsize=10000):
+        self.burst = burst
+        self.interval = interval
+        self.maxsize = maxsize
+        self._buckets = collections.OrderedDict()
+        self.throttled = 0
+
+    def acquire(self, user_id):
+        # ✅ คืน 0 ถ้าส่งได้ ไม่อย่างนั้นคืนจำนวนวินาทีที่ต้องรอ
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(user_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) / self.interval)
+        if tokens < 1:
+            self.throttled += 1
+            self._buckets[user_id] = (tokens, now)
+            return (1 - tokens) * self.interval
+        self._buckets[user_id] = (tokens - 1, now)
+        self._buckets.move_to_end(user_id)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return 0.0
+
+    def __len__(self):
+        return len(self._buckets)
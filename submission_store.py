@@ -0,0 +1,165 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+PENDING = "pending"
+APPROVED = "approved"
+REJECTED = "rejected"
+
+
+@dataclass
+class Submission:
+    id: int
+    user_id: int
+    submitted_by: str
+    player_name: str
+    sheet_name: str
+    quest_title: str
+    status: str
+    created_at: float
+    reviewer_id: Optional[int] = None
+    decided_at: Optional[float] = None
+    channel_id: Optional[int] = None
+    message_id: Optional[int] = None
+
+
+_COLUMNS = ", ".join(Submission.__dataclass_fields__)
+
+
+class SubmissionStore:
+    """เก็บคำร้องส่งเควสลง SQLite ปุ่มอนุมัติเก็บแค่ id ในตัว custom_id จึงรอดการรีสตาร์ท"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._lock = threading.Lock()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS submissions ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " user_id INTEGER NOT NULL,"
+            " submitted_by TEXT NOT NULL,"
+            " player_name TEXT NOT NULL,"
+            " sheet_name TEXT NOT NULL,"
+            " quest_title TEXT NOT NULL,"
+            " status TEXT NOT NULL DEFAULT 'pending',"
+            " created_at REAL NOT NULL,"
+            " reviewer_id INTEGER,"
+            " decided_at REAL,"
+            " channel_id INTEGER,"
+            " message_id INTEGER)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS submissions_status ON submissions (status)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS submissions_user ON submissions (user_id, status)")
+
+    def create(self, user_id, submitted_by, player_name, sheet_name, quest_title):
+        created_at = time.time()
+        with self._lock:
+            cur = self.conn.execute(
+                "INSERT INTO submissions (user_id, submitted_by, player_name, sheet_name, quest_title, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (user_id, submitted_by, player_name, sheet_name, quest_title, created_at)
+            )
+        return Submission(cur.lastrowid, user_id, submitted_by, player_name, sheet_name, quest_title, PENDING, created_at)
+
+    def discard(self, submission_id):
+        # 🧹 ลบคำร้องที่ส่งเข้าห้องแอดมินไม่สำเร็จ (ยังไม่มีใครเห็น) ไม่ให้ค้าง pending โดยไม่มีข้อความให้กด
+        with self._lock:
+            cur = self.conn.execute("DELETE FROM submissions WHERE id = ? AND status = ?", (submission_id, PENDING))
+        return cur.rowcount == 1
+
+    def get(self, submission_id):
+        with self._lock:
+            row = self.conn.execute(f"SELECT {_COLUMNS} FROM submissions WHERE id = ?", (submission_id,)).fetchone()
+        return Submission(*row) if row else None
+
+    def set_message(self, submission_id, channel_id, message_id):
+        with self._lock:
+            self.conn.execute(
+                "UPDATE submissions SET channel_id = ?, message_id = ? WHERE id = ?",
+                (channel_id, message_id, submission_id)
+            )
+
+    def decide(self, submission_id, status, reviewer_id):
+        # ✅ เปลี่ยนสถานะได้ครั้งเดียว (pending → approved/rejected) กันแอดมินสองคนกดพร้อมกัน
+        with self._lock:
+            cur = self.conn.execute(
+                "UPDATE submissions SET status = ?, reviewer_id = ?, decided_at = ? WHERE id = ? AND status = ?",
+                (status, reviewer_id, time.time(), submission_id, PENDING)
+            )
+        return cur.rowcount == 1
+
+    def pending_keys(self):
+        # (user_id, sheet_name, quest_title, created_at) ของคำร้องที่รอพิจารณา ใช้เติม PendingIndex ตอนเริ่มบอท
+        with self._lock:
+            return self.conn.execute(
+                "SELECT user_id, sheet_name, quest_title, created_at FROM submissions WHERE status = ?", (PENDING,)
+            ).fetchall()
+
+    def pending_for(self, user_id):
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT {_COLUMNS} FROM submissions WHERE user_id = ? AND status = ? ORDER BY id", (user_id, PENDING)
+            ).fetchall()
+        return [Submission(*row) for row in rows]
+
+    def pending_page(self, offset, limit):
+        # คำร้องที่รอพิจารณาเรียงตามลำดับที่ส่ง (เก่าสุดก่อน) สำหรับกระดานคิวในห้องแอดมิน
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT {_COLUMNS} FROM submissions WHERE status = ? ORDER BY id LIMIT ? OFFSET ?", (PENDING, limit, offset)
+            ).fetchall()
+        return [Submission(*row) for row in rows]
+
+    def pending_matching(self, sheet_name=None, quest_title=None, ids=None, limit=100):
+        # คำร้องที่รอพิจารณาตามเงื่อนไข (หัวข้อ / เควส / เลขคำร้อง) สำหรับคำสั่งพิจารณาหลายรายการ
+        where, params = ["status = ?"], [PENDING]
+        if sheet_name:
+            where.append("sheet_name = ?")
+            params.append(sheet_name)
+        if quest_title:
+            where.append("quest_title = ?")
+            params.append(quest_title)
+        if ids:
+            where.append(f"id IN ({', '.join('?' * len(ids))})")
+            params.extend(ids)
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT {_COLUMNS} FROM submissions WHERE {' AND '.join(where)} ORDER BY id LIMIT ?", (*params, limit)
+            ).fetchall()
+        return [Submission(*row) for row in rows]
+
+    def pending_quests(self):
+        # (sheet_name, quest_title, จำนวน, id คำร้องเก่าสุด) ของเควสที่มีคำร้องค้าง ใช้ทำ autocomplete
+        with self._lock:
+            return self.conn.execute(
+                "SELECT sheet_name, quest_title, COUNT(*), MIN(id) FROM submissions WHERE status = ?"
+                " GROUP BY sheet_name, quest_title ORDER BY COUNT(*) DESC", (PENDING,)
+            ).fetchall()
+
+    def decide_many(self, submission_ids, status, reviewer_id):
+        # ✅ เหมือน decide แต่ทำทีละหลายคำร้องใน transaction เดียว คืน id ที่เปลี่ยนได้จริง
+        # (คำร้องที่แอดมินคนอื่นกดไปก่อนแล้วจะไม่อยู่ในผลลัพธ์)
+        if not submission_ids:
+            return set()
+        placeholders = ", ".join("?" * len(submission_ids))
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                claimed = {row[0] for row in self.conn.execute(
+                    f"SELECT id FROM submissions WHERE status = ? AND id IN ({placeholders})", (PENDING, *submission_ids)
+                )}
+                if claimed:
+                    self.conn.execute(
+                        f"UPDATE submissions SET status = ?, reviewer_id = ?, decided_at = ?"
+                        f" WHERE id IN ({', '.join('?' * len(claimed))})",
+                        (status, reviewer_id, time.time(), *claimed)
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return claimed
+
+    def pending_count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM submissions WHERE status = ?", (PENDING,)).fetchone()[0]
@@ -0,0 +1,109 @@
+import contextlib
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+
+# 🧵 trace id ของ interaction ปัจจุบัน: asyncio.create_task คัดลอก context ให้ งานเบื้องหลังจึงได้ trace เดียวกัน
+TRACE_ID = contextvars.ContextVar("trace_id", default=None)
+HANDLER = contextvars.ContextVar("handler", default=None)
+
+_listener = None
+
+
+def bind(interaction, handler):
+    # ใช้ interaction.id (snowflake) เป็น trace id ค้นย้อนกับฝั่ง Discord ได้
+    TRACE_ID.set(str(interaction.id))
+    HANDLER.set(handler)
+
+
+@contextlib.contextmanager
+def span(name, logger=None, **fields):
+    """จับเวลาขั้นตอนหนึ่ง (ใช้ได้ทั้งรอบโค้ด sync และ await) แล้วบันทึกเป็น record เดียวตอนจบ"""
+    logger = logger or logging.getLogger("deena.span")
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield fields
+    except BaseException as e:
+        status = type(e).__name__
+        raise
+    finally:
+        fields.update(span=name, ms=round((time.perf_counter() - started) * 1000, 2), status=status)
+        logger.info("⏱️ %s", name, extra={"fields": fields})
+
+
+class _TraceFilter(logging.Filter):
+    # เติม trace id ตอนสร้าง record (ยังอยู่ใน task ของ interaction) ก่อนส่งเข้าคิว
+    def filter(self, record):
+        record.trace_id = TRACE_ID.get()
+        record.handler = HANDLER.get()
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # คิวอยู่ในโปรเซสเดียวกัน ไม่ต้อง format/pickle บน event loop ปล่อยให้ thread ของ listener ทำ
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "trace_id", None):
+            entry["trace"] = record.trace_id
+        if getattr(record, "handler", None):
+            entry["handler"] = record.handler
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s%(trace)s %(message)s%(extras)s")
+
+    def format(self, record):
+        record.trace = f" [{record.trace_id}]" if getattr(record, "trace_id", None) else ""
+        fields = getattr(record, "fields", None)
+        # ชื่อ span อยู่ในข้อความแล้ว ไม่ต้องซ้ำในส่วน key=value
+        record.extras = "".join(f" {k}={v}" for k, v in fields.items() if k != "span") if fields else ""
+        return super().format(record)
+
+
+def setup_logging(level="INFO", fmt="text", stream=None):
+    """ติดตั้ง pipeline: logger → คิว (ไม่บล็อก) → thread ของ QueueListener → stdout"""
+    global _listener
+    if _listener is not None:
+        return _listener
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    handler = _QueueHandler(log_queue)
+    handler.addFilter(_TraceFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    # ส่ง record ที่ค้างในคิวออกให้หมดก่อนโปรเซสจบ
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+
+import discord
+
+import bot as deena
+import storage
+import tracing
+from job_queue import JobQueue, run_worker
+from myserver import server_on
+from notifier import Notice, DM_SENT
+from sheets_quota import TokenBucket, PRIORITY_REFRESH
+from tracing import span
+
+# 🏗️ โปรเซส worker สำหรับ PROCESS_MODE=gateway: รับงานจากคิว JOBS ใน SQLite (ไฟล์เดียวกับ gateway)
+# ไม่เชื่อม gateway ของ Discord ใช้แค่ REST (login ด้วย token) รันหลายโปรเซสพร้อมกันได้
+#   python worker.py
+log = logging.getLogger("deena.worker")
+
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+GUILD_TTL = float(os.getenv("WORKER_GUILD_TTL", "300"))
+JOURNAL_FLUSH_INTERVAL = float(os.getenv("JOURNAL_FLUSH_INTERVAL", "5"))
+
+
+class Worker:
+    def __init__(self, client, jobs):
+        self.client = client
+        self.jobs = jobs
+        self.dm_quota = TokenBucket(int(os.getenv("DM_PER_MINUTE", "30")), capacity=int(os.getenv("DM_CONCURRENCY", "2")))
+        self._guilds = {}  # guild id → (Guild จาก REST พร้อมรายการ Role, เวลาหมดอายุ)
+
+    async def guild(self, guild_id):
+        entry = self._guilds.get(guild_id)
+        if entry is None or entry[1] <= time.monotonic():
+            entry = self._guilds[guild_id] = (await self.client.fetch_guild(guild_id), time.monotonic() + GUILD_TTL)
+        return entry[0]
+
+    async def role_sync(self, jobs):
+        # 🎭 ทุกงานในกลุ่มเป็นของสมาชิกคนเดียวกัน รวมเป็น member.edit ครั้งเดียว
+        payloads = [job.payload for job in jobs]
+        guild = await self.guild(payloads[0]["guild_id"])
+        user_id = payloads[0]["user_id"]
+        with span("job_role_sync", jobs=len(payloads)):
+            new_roles = deena.quest_roles(guild, [quest for payload in payloads for quest in payload["quests"]])
+            if not new_roles:
+                return
+            # ดึงสด + แก้ใต้ lock ต่อสมาชิก (งานของคนเดียวกันมี group_key เดียวกัน จึงมาเป็นกลุ่มเดียวต่อรอบ)
+            # ✅ idempotent: ถ้าเคยทำสำเร็จแล้ว (worker ตายก่อนยืนยันงาน) Role ครบอยู่แล้ว ไม่เรียก member.edit ซ้ำ
+            member, removed = await deena.edit_member_roles(guild, user_id, new_roles, f"อนุมัติเควส {len(new_roles)} รายการ")
+            if member is None:
+                log.warning("❗ ไม่พบสมาชิก %s (ออกจากเซิร์ฟเวอร์แล้ว)", user_id)
+                return
+            if removed is None:
+                return
+            log.info("✅ เพิ่ม Role %s ให้ %s", ", ".join(role.name for role in new_roles), member.display_name)
+
+    async def dm(self, jobs):
+        # 📬 ผลของผู้เล่นคนเดียวกันที่ค้างในคิวรอบนี้รวมเป็น DM เดียว
+        # DM ย้อนคืนไม่ได้: ข้ามงานที่เคยส่งแล้ว (lease หมดหลังส่งแต่ก่อนยืนยันงาน) ผู้เล่นจะไม่ได้ DM ซ้ำ
+        sent = self.jobs.applied(jobs)
+        jobs = [job for job in jobs if job.dedupe_key not in sent]
+        if not jobs:
+            return
+        payloads = [job.payload for job in jobs]
+        user_id = payloads[0]["user_id"]
+        notices = [Notice(p["guild_id"], p["status"], p["sheet_name"], p["quest_title"]) for p in payloads]
+        await self.dm_quota.acquire()
+        with span("job_dm", jobs=len(payloads)):
+            try:
+                user = await self.client.fetch_user(user_id)
+                await user.send(embed=deena.result_embed(notices))
+            except (discord.Forbidden, discord.NotFound) as e:
+                # ปิดรับ DM / ไม่พบผู้ใช้: ลองใหม่ก็ไม่ผ่าน บันทึกให้แอดมินดูใน /dm_failures แล้วถือว่างานจบ
+                deena.NOTIFIER.record_failure(user_id, notices, e)
+                self.jobs.mark_applied(jobs)
+                return
+        self.jobs.mark_applied(jobs)
+        DM_SENT.inc(outcome="sent")
+
+    async def flush_journal(self):
+        # 📤 ส่ง journal ขึ้นชีทได้ทีละ worker (ถือ lease ใน SQLite) กันหลายตัวส่งแถวเดียวกันซ้ำ
+        while True:
+            await asyncio.sleep(JOURNAL_FLUSH_INTERVAL)
+            if self.jobs.hold_lease("journal_flush", WORKER_ID, ttl=JOURNAL_FLUSH_INTERVAL * 6):
+                await deena.flush_journal()
+
+    async def maintain_guild(self, guild):
+        if guild.config.changed():
+            try:
+                deena.apply_config(guild, guild.config.load())
+            except Exception as e:
+                log.warning("❗ ไฟล์ตั้งค่าของกิลด์ %s ไม่ถูกต้อง ยังใช้ค่าเดิม: %s", guild.id, e)
+        try:
+            if guild.spreadsheet is None:
+                await deena.SHEETS.call(deena.connect_sheets, guild, cost=2)
+            if deena.SHEETS.healthy:
+                await deena.SHEETS.call(deena.reload_role_index, guild, priority=PRIORITY_REFRESH, cost=2)
+        except Exception as e:
+            log.warning("❗ กิลด์ %s เชื่อม/อ่าน Google Sheet ไม่สำเร็จ: %s", guild.id, e)
+
+    async def maintain(self):
+        # 🔄 เชื่อม Google / รีเฟรชดัชนี Role / โหลดค่าตั้งเมื่อไฟล์เปลี่ยน (ทุกกิลด์) / ล้างงานเก่า
+        while True:
+            await asyncio.gather(*(self.maintain_guild(guild) for guild in deena.GUILDS.values()))
+            purged = self.jobs.purge()
+            if purged:
+                log.info("🧹 ลบงานที่เสร็จแล้ว %s รายการ", purged)
+            await asyncio.sleep(deena.CATALOG_TTL)
+
+
+def readiness(jobs):
+    def check():
+        return {
+            "checks": {"sheets_connected": all(guild.spreadsheet is not None for guild in deena.GUILDS.values())},
+            "worker": WORKER_ID,
+            "sheets_breaker": deena.SHEETS.breaker.state,
+            "journal_backlog": {str(guild.id): guild.journal.backlog() for guild in deena.GUILDS.values()},
+            "jobs": jobs.counts(),
+        }
+    return check
+
+
+async def main():
+    # 💾 ดัชนี Role / ค่าตั้งจากเครื่องก่อน งานแรกทำได้ทันทีแม้ Google ยังไม่ตอบ
+    for guild in deena.GUILDS.values():
+        deena.apply_config(guild, guild.config.load())
+    jobs = JobQueue(
+        storage.connect(),
+        max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "5")),
+        lease=float(os.getenv("JOB_LEASE", "60"))
+    )
+    client = discord.Client(intents=discord.Intents.none())
+    await client.login(deena.TOKEN)  # REST อย่างเดียว ไม่เปิด gateway
+    worker = Worker(client, jobs)
+    web_runner = None
+    if os.getenv("WORKER_PORT"):
+        web_runner = await server_on(readiness(jobs), port=int(os.getenv("WORKER_PORT")))
+    log.info("🏗️ worker %s เริ่มรับงาน", WORKER_ID)
+    try:
+        await asyncio.gather(
+            run_worker(
+                jobs, {"role_sync": worker.role_sync, "dm": worker.dm}, WORKER_ID,
+                poll=float(os.getenv("JOB_POLL_INTERVAL", "1")),
+                concurrency=int(os.getenv("JOB_CONCURRENCY", "4"))
+            ),
+            worker.flush_journal(),
+            worker.maintain(),
+        )
+    finally:
+        if web_runner:
+            await web_runner.cleanup()
+        await client.close()
+        deena.SHEETS.shutdown()
+
+
+if __name__ == "__main__":
+    tracing.setup_logging(os.getenv("LOG_LEVEL", "INFO"), os.getenv("LOG_FORMAT", "text"))
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tracing.shutdown_logging()